@@ -0,0 +1,113 @@
+import contextlib
+import io
+import os
+import queue
+import signal
+import time
+
+DEFAULT_BACKEND_TIMEOUT = 60.0
+POLL_INTERVAL = 0.05
+
+def score_content(content):
+    """
+    Score extracted text by its number of non-whitespace characters
+    """
+    if not content:
+        return 0
+    return len("".join(str(content).split()))
+
+def _backend_worker(name, func, docx_path, results):
+    # Own process group, so backends that shell out can be killed as a whole
+    if hasattr(os, "setpgrp"):
+        os.setpgrp()
+    started = time.perf_counter()
+    captured = io.StringIO()
+    content = None
+    try:
+        with contextlib.redirect_stdout(captured):
+            content = func(docx_path)
+    except Exception as e:
+        captured.write(str(e))
+    results.put((name, content, time.perf_counter() - started, captured.getvalue().strip()))
+
+def _kill(process):
+    if not process.is_alive():
+        return
+    if hasattr(os, "killpg"):
+        with contextlib.suppress(OSError):
+            os.killpg(process.pid, signal.SIGKILL)
+    process.kill()
+    process.join(1)
+
+def race_backends(docx_path, backends, timeout=DEFAULT_BACKEND_TIMEOUT, wait_for_best=False, stagger=0.0):
+    """
+    Run extraction backends concurrently in worker processes
+
+    Backends are started in the given order, stagger seconds apart. By
+    default the first backend to return non-empty content wins and the
+    others are cancelled; with wait_for_best every backend gets to finish
+    (or time out) and the highest scoring content wins.
+
+    Returns (winner_name, content, outcomes) where outcomes maps each
+    backend name to a dict with status ("ok", "empty", "timeout",
+    "crashed" or "cancelled"), seconds, score and any message the
+    backend printed.
+    """
+    # Imported here so sequential runs do not pay for multiprocessing at startup
+    import multiprocessing
+
+    context = multiprocessing.get_context()
+    results = context.Queue()
+    waiting = list(backends)
+    running = {}
+    outcomes = {}
+    winner = None
+    best_content = None
+    race_started = time.monotonic()
+    launched = 0
+
+    try:
+        while waiting or running:
+            now = time.monotonic()
+            while waiting and now >= race_started + launched * stagger:
+                name, func = waiting.pop(0)
+                process = context.Process(target=_backend_worker, args=(name, func, docx_path, results), daemon=True)
+                process.start()
+                running[name] = (process, now)
+                launched += 1
+
+            for name, (process, started) in list(running.items()):
+                if now - started > timeout:
+                    _kill(process)
+                    del running[name]
+                    outcomes[name] = {"status": "timeout", "seconds": now - started, "score": 0, "message": ""}
+                elif process.exitcode not in (None, 0):
+                    # Died without reporting, e.g. a crash inside a native library
+                    del running[name]
+                    outcomes[name] = {"status": "crashed", "seconds": now - started, "score": 0,
+                                      "message": f"exit code {process.exitcode}"}
+
+            try:
+                name, content, seconds, message = results.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                continue
+
+            process, _ = running.pop(name, (None, None))
+            if process is not None:
+                process.join()
+            score = score_content(content)
+            outcomes[name] = {"status": "ok" if score else "empty", "seconds": seconds, "score": score,
+                              "message": message}
+            if score and (winner is None or score > outcomes[winner]["score"]):
+                winner, best_content = name, content
+            if winner is not None and not wait_for_best:
+                break
+    finally:
+        for name, (process, started) in running.items():
+            _kill(process)
+            outcomes[name] = {"status": "cancelled", "seconds": time.monotonic() - started, "score": 0,
+                              "message": ""}
+        for name, _ in waiting:
+            outcomes[name] = {"status": "cancelled", "seconds": 0.0, "score": 0, "message": ""}
+
+    return winner, best_content, outcomes
@@ -0,0 +1,113 @@
+import contextlib
+import hashlib
+import importlib.util
+import json
+import os
+import sys
+
+from markdown_writer import atomic_write
+
+AVAILABILITY_CACHE_FILE = ".backend_availability.json"
+BACKEND_STATS_FILE = ".backend_stats.json"
+
+def environment_fingerprint():
+    """
+    Identify the interpreter and its import path contents
+
+    Installing or removing a package changes the modification time of its
+    site-packages directory, which invalidates cached probe results. The
+    script directory (sys.path[0]) is left out so writing outputs next to
+    the script does not.
+    """
+    parts = [sys.executable, sys.version]
+    for entry in sys.path[1:]:
+        try:
+            parts.append(f"{entry}:{os.stat(entry).st_mtime_ns}")
+        except OSError:
+            parts.append(entry)
+    return hashlib.sha256("\n".join(parts).encode("utf-8")).hexdigest()
+
+def _probe(module_name):
+    try:
+        return importlib.util.find_spec(module_name) is not None
+    except (ImportError, ValueError):
+        return False
+
+def probe_modules(module_names, cache_path=AVAILABILITY_CACHE_FILE):
+    """
+    Return {module_name: available} without importing anything
+
+    Results are cached on disk per environment fingerprint, so repeated
+    CLI invocations skip the import system search entirely.
+    """
+    module_names = list(module_names)
+    fingerprint = environment_fingerprint()
+    cached = {}
+    with contextlib.suppress(OSError, ValueError):
+        with open(cache_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("fingerprint") == fingerprint:
+            cached = data.get("modules", {})
+
+    missing = [name for name in module_names if name not in cached]
+    if missing:
+        for name in missing:
+            cached[name] = _probe(name)
+        with contextlib.suppress(OSError):
+            with atomic_write(cache_path) as f:
+                json.dump({"fingerprint": fingerprint, "modules": cached}, f, indent=2, sort_keys=True)
+
+    return {name: cached[name] for name in module_names}
+
+def document_profile(docx_path):
+    """
+    Bucket a document by size so backend timings are compared like for like
+    """
+    size_kb = max(1, os.path.getsize(docx_path) // 1024)
+    return f"le_{1 << size_kb.bit_length()}kb"
+
+def load_backend_stats(stats_path=BACKEND_STATS_FILE):
+    """
+    Load the persistent per-profile backend record, or an empty one
+    """
+    try:
+        with open(stats_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_backend_stats(stats, stats_path=BACKEND_STATS_FILE):
+    """
+    Atomically write the backend record
+    """
+    with atomic_write(stats_path) as f:
+        json.dump(stats, f, indent=2, sort_keys=True)
+
+def record_backend_result(stats, profile, name, succeeded, seconds):
+    """
+    Add one backend outcome to the record for a document profile
+    """
+    entry = stats.setdefault(profile, {}).setdefault(name, {"runs": 0, "successes": 0, "success_seconds": 0.0})
+    entry["runs"] += 1
+    if succeeded:
+        entry["successes"] += 1
+        entry["success_seconds"] += seconds
+
+def rank_backends(backends, stats, profile):
+    """
+    Order (name, func) backends by success rate, then by mean time to succeed
+
+    Backends without history keep their original relative order and sit
+    between reliable and unreliable ones.
+    """
+    history = stats.get(profile, {})
+
+    def sort_key(item):
+        entry = history.get(item[0])
+        if not entry or not entry["runs"]:
+            return (-0.5, float("inf"))
+        rate = entry["successes"] / entry["runs"]
+        mean = entry["success_seconds"] / entry["successes"] if entry["successes"] else float("inf")
+        return (-rate, mean)
+
+    return sorted(backends, key=sort_key)
@@ -0,0 +1,288 @@
+import argparse
+import contextlib
+import glob
+import io
+import json
+import os
+import signal
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+import conversion_cache
+from convert_docx_to_md import convert_docx_to_markdown, convert_docx_to_markdown_streaming
+from improved_converter import convert_docx_to_markdown_improved
+
+CONVERTERS = {
+    "basic": convert_docx_to_markdown,
+    "streaming": convert_docx_to_markdown_streaming,
+    "improved": convert_docx_to_markdown_improved,
+}
+
+DEFAULT_CHUNK_SIZE = 8
+
+class ConversionTimeout(BaseException):
+    """
+    Raised inside a worker when a file exceeds its time budget
+
+    Derives from BaseException so the converters' own ``except Exception``
+    handlers cannot swallow it.
+    """
+
+def _raise_timeout(signum, frame):
+    raise ConversionTimeout()
+
+def positive_int(value):
+    """
+    argparse type for counts that must be at least 1
+    """
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return number
+
+def find_docx_files(inputs):
+    """
+    Expand files, directories and glob patterns into a sorted list of .docx paths
+    """
+    found = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            candidates = glob.glob(os.path.join(item, "**", "*.docx"), recursive=True)
+        elif glob.has_magic(item):
+            candidates = glob.glob(item, recursive=True)
+        else:
+            candidates = [item]
+
+        for path in candidates:
+            name = os.path.basename(path)
+            # Skip Word lock files such as "~$report.docx"
+            if name.startswith("~$") or not name.lower().endswith(".docx"):
+                continue
+            found.add(os.path.abspath(path))
+    return sorted(found)
+
+def plan_outputs(docx_files, output_dir=None):
+    """
+    Pair each input with its Markdown output path
+
+    With an output directory, the input tree below the inputs' common
+    directory is mirrored so files with the same name do not collide.
+    """
+    if not docx_files:
+        return []
+    if output_dir is None:
+        return [(path, str(Path(path).with_suffix(".md"))) for path in docx_files]
+
+    root = os.path.commonpath([os.path.dirname(path) for path in docx_files])
+    tasks = []
+    for path in docx_files:
+        relative = Path(os.path.relpath(path, root)).with_suffix(".md")
+        tasks.append((path, os.path.join(output_dir, str(relative))))
+    return tasks
+
+def _new_record(docx_path, output_path, error=None):
+    return {
+        "input": docx_path,
+        "output": output_path,
+        "ok": False,
+        "cached": False,
+        "error": error,
+        "seconds": 0.0,
+        "input_bytes": 0,
+        "output_bytes": 0,
+    }
+
+def convert_one(converter_name, docx_path, output_path, timeout=None, cache_dir=None, link=False, media_dir=None):
+    """
+    Convert a single file and return a result record
+
+    With a cache_dir, unchanged documents are served from the conversion
+    cache without being parsed. With a media_dir, pictures are extracted
+    into it, stored once per distinct content across the whole batch.
+    """
+    converter = CONVERTERS[converter_name]
+    use_alarm = bool(timeout) and hasattr(signal, "SIGALRM")
+    captured = io.StringIO()
+    started = time.perf_counter()
+    record = _new_record(docx_path, output_path)
+
+    try:
+        record["input_bytes"] = os.path.getsize(docx_path)
+        os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+        if use_alarm:
+            previous = signal.signal(signal.SIGALRM, _raise_timeout)
+            signal.setitimer(signal.ITIMER_REAL, timeout)
+        try:
+            with contextlib.redirect_stdout(captured):
+                if media_dir:
+                    # Image links depend on where the output sits, which the cache key does not cover
+                    record["ok"] = bool(converter(docx_path, output_path, media_dir=media_dir))
+                elif cache_dir:
+                    record["ok"], record["cached"] = conversion_cache.cached_convert(
+                        converter, converter_name, docx_path, output_path, cache_dir, link=link)
+                else:
+                    record["ok"] = bool(converter(docx_path, output_path))
+        finally:
+            if use_alarm:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+                signal.signal(signal.SIGALRM, previous)
+
+        if record["ok"]:
+            record["output_bytes"] = os.path.getsize(output_path)
+        else:
+            record["error"] = captured.getvalue().strip() or "Converter reported failure"
+    except ConversionTimeout:
+        # The converters' MarkdownWriter discards its temporary file; the previous output stays intact
+        record["error"] = f"Timed out after {timeout} seconds"
+    except Exception as e:
+        record["error"] = str(e)
+
+    record["seconds"] = time.perf_counter() - started
+    return record
+
+def _convert_chunk(converter_name, chunk, timeout, cache_dir, link, media_dir):
+    return [convert_one(converter_name, docx_path, output_path, timeout, cache_dir, link, media_dir)
+            for docx_path, output_path in chunk]
+
+def run_batch(tasks, converter_name="improved", workers=None, chunk_size=DEFAULT_CHUNK_SIZE,
+              timeout=None, progress=True, cache_dir=None, link=False, media_dir=None):
+    """
+    Convert (docx_path, output_path) pairs over a process pool
+
+    Tasks are submitted in chunks and only a bounded number of chunks is in
+    flight at once, so very large batches do not queue every file up front.
+    If a worker process dies, the files of the chunks that were in flight
+    are recorded as failed and the rest of the batch runs on a new pool.
+    Returns the list of per-file result records.
+    """
+    workers = workers or os.cpu_count() or 1
+    chunk_size = max(1, chunk_size)
+    chunks = [tasks[i:i + chunk_size] for i in range(0, len(tasks), chunk_size)]
+    max_in_flight = workers * 2
+    results = []
+
+    executor = ProcessPoolExecutor(max_workers=workers)
+    try:
+        pending = {}
+        next_chunk = 0
+        broken = False
+        while next_chunk < len(chunks) or pending:
+            while not broken and next_chunk < len(chunks) and len(pending) < max_in_flight:
+                future = executor.submit(_convert_chunk, converter_name, chunks[next_chunk], timeout,
+                                         cache_dir, link, media_dir)
+                pending[future] = chunks[next_chunk]
+                next_chunk += 1
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                chunk = pending.pop(future)
+                try:
+                    records = future.result()
+                except BrokenProcessPool:
+                    broken = True
+                    records = [_new_record(docx_path, output_path, "Worker process died")
+                               for docx_path, output_path in chunk]
+                for record in records:
+                    results.append(record)
+                    if progress:
+                        status = ("✓ (cached)" if record["cached"] else "✓") if record["ok"] else "✗"
+                        print(f"[{len(results)}/{len(tasks)}] {status} {record['input']}")
+
+            # Every other chunk in flight fails with the pool; collect them before replacing it
+            if broken and not pending:
+                executor.shutdown(wait=True)
+                executor = ProcessPoolExecutor(max_workers=workers)
+                broken = False
+    finally:
+        executor.shutdown(wait=True)
+
+    return results
+
+def write_failure_manifest(results, manifest_path):
+    """
+    Write the failed conversions to a JSON manifest
+
+    Nothing is written when every conversion succeeded.
+    """
+    failures = [
+        {"input": r["input"], "output": r["output"], "error": r["error"], "seconds": round(r["seconds"], 3)}
+        for r in results if not r["ok"]
+    ]
+    if failures:
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump({"failed": len(failures), "failures": failures}, f, indent=2)
+    return failures
+
+def throughput_report(results, elapsed, workers):
+    """
+    Aggregate per-file results into a throughput summary
+    """
+    succeeded = [r for r in results if r["ok"]]
+    input_bytes = sum(r["input_bytes"] for r in results)
+    busy = sum(r["seconds"] for r in results)
+    return {
+        "files": len(results),
+        "succeeded": len(succeeded),
+        "failed": len(results) - len(succeeded),
+        "cache_hits": sum(1 for r in results if r["cached"]),
+        "workers": workers,
+        "elapsed_seconds": round(elapsed, 3),
+        "files_per_second": round(len(results) / elapsed, 2) if elapsed else 0.0,
+        "input_mb_per_second": round(input_bytes / 1e6 / elapsed, 2) if elapsed else 0.0,
+        "output_bytes": sum(r["output_bytes"] for r in succeeded),
+        "worker_utilisation": round(busy / (elapsed * workers), 2) if elapsed else 0.0,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert many .docx files to Markdown in parallel")
+    parser.add_argument("inputs", nargs="+", help="Files, directories or glob patterns")
+    parser.add_argument("-o", "--output-dir", help="Directory for the .md files (default: next to each input)")
+    parser.add_argument("-c", "--converter", choices=sorted(CONVERTERS), default="improved")
+    parser.add_argument("-j", "--workers", type=positive_int, default=os.cpu_count(), help="Worker processes")
+    parser.add_argument("--chunk-size", type=positive_int, default=DEFAULT_CHUNK_SIZE, help="Files per submitted task")
+    parser.add_argument("--timeout", type=float, help="Per-file timeout in seconds")
+    parser.add_argument("--manifest", default="batch-failures.json", help="Where to write the failure manifest if any file fails")
+    parser.add_argument("--cache-dir", help="Reuse conversions of unchanged documents from this cache")
+    parser.add_argument("--cache-max-mb", type=float,
+                        default=conversion_cache.DEFAULT_MAX_BYTES / (1024 * 1024),
+                        help="Evict least recently used cache entries beyond this size")
+    parser.add_argument("--link", action="store_true", help="Hardlink cached outputs instead of copying")
+    parser.add_argument("--media-dir", help="Extract embedded pictures here, once per distinct image, and link them")
+    parser.add_argument("--quiet", action="store_true", help="Do not print per-file progress")
+    args = parser.parse_args(argv)
+
+    docx_files = find_docx_files(args.inputs)
+    if not docx_files:
+        print("No .docx files found!")
+        return 1
+
+    tasks = plan_outputs(docx_files, args.output_dir)
+    if args.media_dir and args.cache_dir:
+        print("Note: --cache-dir is not used together with --media-dir")
+    print(f"Converting {len(tasks)} files with '{args.converter}' on {args.workers} workers...")
+
+    started = time.perf_counter()
+    results = run_batch(tasks, args.converter, args.workers, args.chunk_size, args.timeout,
+                        progress=not args.quiet, cache_dir=args.cache_dir, link=args.link,
+                        media_dir=args.media_dir)
+    elapsed = time.perf_counter() - started
+
+    if args.cache_dir:
+        conversion_cache.evict(args.cache_dir, int(args.cache_max_mb * 1024 * 1024))
+
+    failures = write_failure_manifest(results, args.manifest)
+    report = throughput_report(results, elapsed, args.workers)
+
+    print("\n=== BATCH SUMMARY ===")
+    for key, value in report.items():
+        print(f"{key}: {value}")
+    if failures:
+        print(f"Failure manifest written to '{args.manifest}'")
+
+    return 1 if failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+import argparse
+import contextlib
+import hashlib
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import synthetic_docx
+
+# Named synthetic documents; each overrides synthetic_docx.DEFAULT_OPTIONS
+SCENARIOS = {
+    "small": {"paragraphs": 200},
+    "medium": {"paragraphs": 5000},
+    "dense_runs": {"paragraphs": 2000, "runs_per_paragraph": 20, "words_per_run": 2},
+    "big_tables": {"paragraphs": 200, "tables": 4, "table_rows": 500, "table_columns": 8},
+    "deep_lists": {"paragraphs": 2000, "list_every": 2, "list_length": 12, "list_depth": 6},
+    "many_sections": {"paragraphs": 2000, "sections": 50},
+}
+DEFAULT_SCENARIOS = ["small", "medium", "big_tables"]
+
+DEFAULT_THRESHOLD = 0.15
+
+# Differences below these are measurement noise, whatever the ratio
+NOISE_FLOOR = {"wall_seconds": 0.005, "peak_bytes": 64 * 1024}
+
+class CountingSink(io.TextIOBase):
+    """
+    Text stream that only counts the bytes written to it
+    """
+    def __init__(self):
+        self.bytes = 0
+
+    def writable(self):
+        return True
+
+    def write(self, text):
+        self.bytes += len(text.encode("utf-8"))
+        return len(text)
+
+def _run_basic(docx_path, output_path):
+    from convert_docx_to_md import convert_docx_to_markdown
+    return convert_docx_to_markdown(docx_path, output_path), None
+
+def _run_streaming(docx_path, output_path):
+    from convert_docx_to_md import convert_docx_to_markdown_streaming
+    return convert_docx_to_markdown_streaming(docx_path, output_path), None
+
+def _run_improved(docx_path, output_path):
+    from improved_converter import convert_docx_to_markdown_improved
+    return convert_docx_to_markdown_improved(docx_path, output_path), None
+
+def _run_enhanced(docx_path, output_path):
+    from robust_converter import try_python_docx_enhanced
+    content = try_python_docx_enhanced(docx_path)
+    return bool(content), len(content.encode("utf-8")) if content else 0
+
+def _run_deep_analyze(docx_path, output_path):
+    from deep_analyzer import deep_analyze_docx
+    # Its output is the printed analysis, which the caller counts
+    return deep_analyze_docx(docx_path) is not None, None
+
+TARGETS = {
+    "basic": _run_basic,
+    "streaming": _run_streaming,
+    "improved": _run_improved,
+    "enhanced": _run_enhanced,
+    "deep_analyze": _run_deep_analyze,
+}
+
+def scenario_document(name, options, work_dir):
+    """
+    Path of the synthetic document for a scenario, generating it if needed
+    """
+    key = json.dumps(options, sort_keys=True).encode("utf-8")
+    path = os.path.join(work_dir, f"{name}-{hashlib.sha256(key).hexdigest()[:12]}.docx")
+    if not os.path.exists(path):
+        synthetic_docx.generate_docx(path, **options)
+    return path
+
+def _call(target, docx_path, output_path):
+    sink = CountingSink()
+    with contextlib.redirect_stdout(sink):
+        ok, size = target(docx_path, output_path)
+    if size is None:
+        size = os.path.getsize(output_path) if os.path.exists(output_path) else sink.bytes
+    return bool(ok), size
+
+def measure(target, docx_path, output_path, repeat=3):
+    """
+    Time a target over repeat runs, then measure its peak memory in one more
+
+    Timed runs are made without tracemalloc, which slows allocation-heavy
+    code considerably; only the separate memory run is traced.
+    """
+    # Warm-up run: imports and first-call caches are not what is measured
+    ok, output_bytes = _call(target, docx_path, output_path)
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        ok, output_bytes = _call(target, docx_path, output_path)
+        times.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    try:
+        _call(target, docx_path, output_path)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "ok": ok,
+        "wall_seconds": round(statistics.median(times), 6),
+        "wall_min_seconds": round(min(times), 6),
+        "peak_bytes": peak,
+        "output_bytes": output_bytes,
+    }
+
+def run_benchmarks(scenarios, targets, repeat=3, work_dir=None):
+    """
+    Measure every target on every scenario and return a results document
+    """
+    work_dir = work_dir or os.path.join(tempfile.gettempdir(), "docx-benchmark")
+    os.makedirs(work_dir, exist_ok=True)
+    results = {}
+    for scenario in scenarios:
+        options = SCENARIOS[scenario] if isinstance(scenario, str) else scenario
+        name = scenario if isinstance(scenario, str) else "custom"
+        docx_path = scenario_document(name, options, work_dir)
+        results[name] = {"options": options, "docx_bytes": os.path.getsize(docx_path), "targets": {}}
+        for target_name in targets:
+            output_path = os.path.join(work_dir, f"{name}.{target_name}.out")
+            try:
+                result = measure(TARGETS[target_name], docx_path, output_path, repeat)
+            except Exception as e:
+                result = {"ok": False, "error": str(e)}
+            results[name]["targets"][target_name] = result
+            print(f"{name:>14} {target_name:>12}: " + (
+                f"{result['wall_seconds'] * 1000:9.1f} ms  {result['peak_bytes'] / 1048576:8.1f} MiB  "
+                f"{result['output_bytes']:>10} B" if "wall_seconds" in result else f"failed: {result['error']}"))
+    return {
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "scenarios": results,
+    }
+
+def compare_results(baseline, current, threshold=DEFAULT_THRESHOLD):
+    """
+    List (scenario, target, metric, old, new, change) rows beyond threshold
+
+    Time and memory count as regressions only when they grow; a change in
+    output size in either direction is reported as well, since it means the
+    converters now produce different content.
+    """
+    rows = []
+    for scenario, entry in current["scenarios"].items():
+        old_entry = baseline["scenarios"].get(scenario)
+        if old_entry is None or old_entry.get("options") != entry.get("options"):
+            continue
+        for target, result in entry["targets"].items():
+            old = old_entry["targets"].get(target)
+            if not old or "wall_seconds" not in old or "wall_seconds" not in result:
+                continue
+            for metric in ("wall_seconds", "peak_bytes", "output_bytes"):
+                before, after = old[metric], result[metric]
+                if before == after:
+                    continue
+                if abs(after - before) < NOISE_FLOOR.get(metric, 0):
+                    continue
+                change = (after - before) / before if before else float("inf")
+                if change > threshold or (metric == "output_bytes" and abs(change) > threshold):
+                    rows.append((scenario, target, metric, before, after, change))
+    return rows
+
+def _load(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the .docx converters on synthetic documents")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Measure converters and save the results as JSON")
+    run.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                     help=f"May be repeated (default: {', '.join(DEFAULT_SCENARIOS)})")
+    run.add_argument("--set", action="append", default=[], metavar="OPTION=VALUE",
+                     help="Benchmark one custom document instead, e.g. --set paragraphs=50000")
+    run.add_argument("--target", action="append", choices=sorted(TARGETS),
+                     help="May be repeated (default: all)")
+    run.add_argument("--repeat", type=int, default=3)
+    run.add_argument("--work-dir", help="Where synthetic documents and outputs are kept")
+    run.add_argument("-o", "--output", default="benchmark-results.json")
+
+    compare = commands.add_parser("compare", help="Flag regressions between two result files")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                         help="Relative change that counts as a regression (default: 0.15)")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        if args.set:
+            options = {}
+            for item in args.set:
+                key, _, value = item.partition("=")
+                default = synthetic_docx.DEFAULT_OPTIONS.get(key)
+                if default is None:
+                    parser.error(f"Unknown option '{key}'")
+                options[key] = value.lower() in ("1", "true", "yes", "on") if isinstance(default, bool) else int(value)
+            scenarios = [options]
+        else:
+            scenarios = args.scenario or DEFAULT_SCENARIOS
+        results = run_benchmarks(scenarios, args.target or list(TARGETS), args.repeat, args.work_dir)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to '{args.output}'")
+        return 0
+
+    rows = compare_results(_load(args.baseline), _load(args.current), args.threshold)
+    if not rows:
+        print(f"No changes beyond {args.threshold:.0%}")
+        return 0
+    for scenario, target, metric, before, after, change in rows:
+        print(f"{scenario:>14} {target:>12} {metric:>13}: {before} -> {after} ({change:+.1%})")
+    print(f"{len(rows)} regression(s) beyond {args.threshold:.0%}")
+    return 1
+
+if __name__ == "__main__":
+    sys.exit(main())
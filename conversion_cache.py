@@ -0,0 +1,182 @@
+import argparse
+import contextlib
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+
+from markdown_writer import atomic_write
+
+DEFAULT_CACHE_DIR = ".docx_cache"
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+
+# Bump when converter output changes so stale entries are never reused
+CACHE_FORMAT_VERSION = 6
+
+ENTRY_SUFFIX = ".md"
+
+def file_digest(path, chunk_size=1024 * 1024):
+    """
+    SHA-256 of a file's content, read in chunks
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def cache_key(content_hash, converter_name, options=None):
+    """
+    Key for a conversion of a given document by a given converter variant
+    """
+    payload = json.dumps({
+        "version": CACHE_FORMAT_VERSION,
+        "content": content_hash,
+        "converter": converter_name,
+        "options": options or {},
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def entry_path(cache_dir, key):
+    """
+    Location of a cache entry, fanned out over 256 subdirectories
+    """
+    return os.path.join(cache_dir, key[:2], key + ENTRY_SUFFIX)
+
+def lookup(cache_dir, key):
+    """
+    Return the path of a cached Markdown file, or None on a miss
+
+    A hit refreshes the entry's modification time, which is what the LRU
+    eviction orders by.
+    """
+    path = entry_path(cache_dir, key)
+    try:
+        os.utime(path)
+    except OSError:
+        return None
+    return path
+
+def materialize(cached_path, output_path, link=False):
+    """
+    Place a cached Markdown file at output_path, hardlinking when asked
+
+    Hardlinked outputs share storage with the cache entry, so they must not
+    be rewritten in place; cached_convert unlinks them before converting.
+    """
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(output_path)
+    if link:
+        try:
+            os.link(cached_path, output_path)
+            return
+        except OSError:
+            pass
+    shutil.copyfile(cached_path, output_path)
+
+def store(cache_dir, key, output_path):
+    """
+    Copy a freshly converted Markdown file into the cache
+    """
+    path = entry_path(cache_dir, key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(output_path, "rb") as src, atomic_write(path, "wb") as f:
+        shutil.copyfileobj(src, f)
+    return path
+
+def cached_convert(converter, converter_name, docx_path, output_path, cache_dir=DEFAULT_CACHE_DIR,
+                   options=None, link=False):
+    """
+    Run a converter through the cache
+
+    Returns (success, hit). On a hit the document is not parsed at all.
+    """
+    key = cache_key(file_digest(docx_path), converter_name, options)
+    cached_path = lookup(cache_dir, key)
+    if cached_path is not None:
+        materialize(cached_path, output_path, link)
+        return True, True
+
+    # Converters rename a new file into place, so an old output hardlinked into the cache is never written through
+    success = bool(converter(docx_path, output_path, **(options or {})))
+    if success:
+        store(cache_dir, key, output_path)
+    return success, False
+
+def _iter_entries(cache_dir):
+    for directory, _, files in os.walk(cache_dir):
+        for name in files:
+            if name.endswith(ENTRY_SUFFIX):
+                path = os.path.join(directory, name)
+                try:
+                    yield path, os.stat(path)
+                except FileNotFoundError:
+                    continue
+
+def evict(cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+    """
+    Remove least recently used entries until the cache fits in max_bytes
+
+    Returns (entries_removed, bytes_removed).
+    """
+    entries = sorted(_iter_entries(cache_dir), key=lambda item: item[1].st_mtime)
+    total = sum(st.st_size for _, st in entries)
+    removed = 0
+    removed_bytes = 0
+    for path, st in entries:
+        if total <= max_bytes:
+            break
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(path)
+            removed += 1
+            removed_bytes += st.st_size
+        total -= st.st_size
+    return removed, removed_bytes
+
+def cache_stats(cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Summarize the entries currently held in the cache
+    """
+    sizes = []
+    oldest = newest = None
+    for _, st in _iter_entries(cache_dir):
+        sizes.append(st.st_size)
+        oldest = st.st_mtime if oldest is None else min(oldest, st.st_mtime)
+        newest = st.st_mtime if newest is None else max(newest, st.st_mtime)
+
+    def fmt(timestamp):
+        return time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp)) if timestamp else None
+
+    return {
+        "cache_dir": os.path.abspath(cache_dir),
+        "entries": len(sizes),
+        "total_bytes": sum(sizes),
+        "largest_entry_bytes": max(sizes) if sizes else 0,
+        "least_recently_used": fmt(oldest),
+        "most_recently_used": fmt(newest),
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect and maintain the conversion cache")
+    parser.add_argument("command", choices=["stats", "evict", "clear"])
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--max-mb", type=float, default=DEFAULT_MAX_BYTES / (1024 * 1024),
+                        help="Size limit used by 'evict'")
+    args = parser.parse_args(argv)
+
+    if args.command == "stats":
+        for key, value in cache_stats(args.cache_dir).items():
+            print(f"{key}: {value}")
+    elif args.command == "evict":
+        removed, removed_bytes = evict(args.cache_dir, int(args.max_mb * 1024 * 1024))
+        print(f"Evicted {removed} entries ({removed_bytes} bytes)")
+    elif args.command == "clear":
+        shutil.rmtree(args.cache_dir, ignore_errors=True)
+        print(f"Cleared '{args.cache_dir}'")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
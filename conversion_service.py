@@ -0,0 +1,385 @@
+import argparse
+import asyncio
+import collections
+import contextlib
+import io
+import json
+import os
+import signal
+import statistics
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from email.parser import BytesParser
+from email.policy import HTTP
+from urllib.parse import urlsplit
+
+import docx_ir
+from batch_convert import ConversionTimeout
+from deep_analyzer import extract_raw_text, summarize_document
+from improved_converter import convert_docx_to_markdown_improved
+
+DEFAULT_PORT = 8765
+DEFAULT_QUEUE_SIZE = 16
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_MAX_UPLOAD = 50 * 1024 * 1024
+
+# Extra time the server waits for a worker after its own alarm should have fired
+TIMEOUT_GRACE = 2.0
+HEADER_TIMEOUT = 10.0
+MAX_HEADERS = 100
+LATENCY_WINDOW = 1000
+
+CONTENT_TYPES = {
+    "markdown": "text/markdown; charset=utf-8",
+    "text": "text/plain; charset=utf-8",
+    "analysis": "application/json",
+}
+
+REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+    411: "Length Required", 413: "Payload Too Large", 422: "Unprocessable Entity",
+    500: "Internal Server Error", 503: "Service Unavailable", 504: "Gateway Timeout",
+}
+
+def _raise_timeout(signum, frame):
+    raise ConversionTimeout()
+
+def _init_worker():
+    # Ctrl+C is handled by the server, which shuts the pool down itself
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+def _warm_up(_):
+    return os.getpid()
+
+def upload_bytes(body, content_type):
+    """
+    The .docx bytes of a request body, raw or the first file of a multipart form
+    """
+    if not content_type.lower().startswith("multipart/form-data"):
+        return body
+    message = BytesParser(policy=HTTP).parsebytes(
+        b"Content-Type: " + content_type.encode("latin-1") + b"\r\n\r\n" + body)
+    for part in message.iter_parts():
+        if part.get_filename() is not None:
+            return part.get_payload(decode=True)
+    raise ValueError("No file in multipart upload")
+
+def convert_upload(body, content_type, output_format, timeout):
+    """
+    Convert one uploaded document in a worker process
+
+    Returns (ok, payload bytes, worker seconds); on failure the payload is
+    the error message. The conversion is interrupted after timeout seconds.
+    """
+    started = time.perf_counter()
+    use_alarm = bool(timeout) and hasattr(signal, "SIGALRM")
+    captured = io.StringIO()
+    try:
+        if use_alarm:
+            signal.signal(signal.SIGALRM, _raise_timeout)
+            signal.setitimer(signal.ITIMER_REAL, timeout)
+        try:
+            with tempfile.TemporaryDirectory(prefix="docx-service-") as work_dir:
+                docx_path = os.path.join(work_dir, "upload.docx")
+                with open(docx_path, "wb") as f:
+                    f.write(upload_bytes(body, content_type))
+
+                with contextlib.redirect_stdout(captured):
+                    document = docx_ir.load_document(docx_path)
+                    if output_format == "markdown":
+                        output_path = os.path.join(work_dir, "upload.md")
+                        if not convert_docx_to_markdown_improved(docx_path, output_path, document):
+                            raise ValueError("Markdown conversion failed")
+                        with open(output_path, "rb") as f:
+                            payload = f.read()
+                    elif output_format == "text":
+                        payload = extract_raw_text(docx_path, document).encode("utf-8")
+                    else:
+                        # The summary comes straight from the IR; deep_analyze_docx would print every run
+                        summary = summarize_document(document)
+                        summary["source"] = None
+                        payload = json.dumps({"summary": summary}, ensure_ascii=False).encode("utf-8")
+        finally:
+            if use_alarm:
+                signal.setitimer(signal.ITIMER_REAL, 0)
+        return True, payload, time.perf_counter() - started
+    except ConversionTimeout:
+        return False, f"Timed out after {timeout:.1f} seconds".encode("utf-8"), time.perf_counter() - started
+    except Exception as e:
+        return False, str(e).encode("utf-8"), time.perf_counter() - started
+
+class ConversionService:
+    """
+    HTTP front end for the converters, backed by a warm process pool
+
+    At most `workers` documents are in the pool at once; up to queue_size
+    more wait for a worker and anything beyond that is refused with 503,
+    so a burst of uploads cannot pile up unbounded work or memory. Each
+    request has a deadline covering both its wait and its conversion.
+    """
+    def __init__(self, workers=None, queue_size=DEFAULT_QUEUE_SIZE, timeout=DEFAULT_TIMEOUT,
+                 max_upload=DEFAULT_MAX_UPLOAD):
+        self.workers = workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.timeout = timeout
+        self.max_upload = max_upload
+        self.pool = None
+        self.slots = None
+        self.started = time.time()
+        self.queued = 0
+        self.running = 0
+        self.peak_queued = 0
+        self.counters = collections.Counter()
+        self.latencies = collections.deque(maxlen=LATENCY_WINDOW)
+        self.worker_seconds = collections.deque(maxlen=LATENCY_WINDOW)
+
+    def start_pool(self):
+        """
+        Start the worker processes and wait until each has imported the converters
+        """
+        self.pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        pids = set(self.pool.map(_warm_up, range(self.workers)))
+        print(f"Started {len(pids)} worker processes")
+
+    def restart_pool(self, broken):
+        """
+        Replace a broken pool with a warmed-up one, once; returns the current pool
+        """
+        if self.pool is broken:
+            broken.shutdown(wait=False)
+            self.start_pool()
+        return self.pool
+
+    def metrics(self):
+        latencies = sorted(self.latencies)
+
+        def percentile(fraction):
+            return round(latencies[min(len(latencies) - 1, int(fraction * len(latencies)))], 4) if latencies else None
+
+        return {
+            "uptime_seconds": round(time.time() - self.started, 1),
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "running": self.running,
+            "queued": self.queued,
+            "peak_queued": self.peak_queued,
+            "requests": dict(self.counters),
+            "latency_seconds": {
+                "p50": percentile(0.5),
+                "p95": percentile(0.95),
+                "p99": percentile(0.99),
+                "max": round(latencies[-1], 4) if latencies else None,
+            },
+            "mean_worker_seconds": round(statistics.fmean(self.worker_seconds), 4) if self.worker_seconds else None,
+        }
+
+    async def convert(self, body, content_type, output_format, deadline):
+        """
+        Run one admitted, queued conversion; returns (status, content type, payload)
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            await asyncio.wait_for(self.slots.acquire(), deadline - loop.time())
+        except asyncio.TimeoutError:
+            self.counters["timed_out"] += 1
+            return 504, None, b"Timed out waiting for a worker"
+        finally:
+            self.queued -= 1
+
+        self.running += 1
+        remaining = max(deadline - loop.time(), 0.001)
+        pool = self.pool
+        try:
+            try:
+                future = loop.run_in_executor(pool, convert_upload, body, content_type, output_format, remaining)
+            except BrokenProcessPool:
+                # The pool broke while idle, e.g. an OOM-killed worker; nothing of this request has run yet
+                pool = self.restart_pool(pool)
+                future = loop.run_in_executor(pool, convert_upload, body, content_type, output_format, remaining)
+        except BrokenProcessPool:
+            self.running -= 1
+            self.slots.release()
+            self.counters["failed"] += 1
+            return 500, None, b"Worker pool could not be restarted"
+        except BaseException:
+            self.running -= 1
+            self.slots.release()
+            raise
+
+        def finished(_):
+            # The slot is only freed once the worker is really done
+            self.running -= 1
+            self.slots.release()
+
+        future.add_done_callback(finished)
+        try:
+            ok, payload, seconds = await asyncio.wait_for(asyncio.shield(future), remaining + TIMEOUT_GRACE)
+        except asyncio.TimeoutError:
+            self.counters["timed_out"] += 1
+            return 504, None, b"Conversion did not finish in time"
+        except BrokenProcessPool:
+            self.counters["failed"] += 1
+            with contextlib.suppress(BrokenProcessPool):
+                self.restart_pool(pool)
+            return 500, None, b"Worker process died; the pool was restarted"
+
+        self.worker_seconds.append(seconds)
+        if not ok:
+            timed_out = payload.startswith(b"Timed out")
+            self.counters["timed_out" if timed_out else "failed"] += 1
+            return (504 if timed_out else 422), None, payload
+        self.counters["converted"] += 1
+        return 200, CONTENT_TYPES[output_format], payload
+
+    async def respond(self, writer, status, content_type, payload, extra_headers=None, keep_alive=True):
+        if content_type is None:
+            content_type = "application/json"
+            payload = json.dumps({"error": payload.decode("utf-8", "replace")}).encode("utf-8")
+        headers = [
+            f"HTTP/1.1 {status} {REASONS.get(status, 'Unknown')}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(payload)}",
+            f"Connection: {'keep-alive' if keep_alive else 'close'}",
+        ]
+        for name, value in (extra_headers or {}).items():
+            headers.append(f"{name}: {value}")
+        writer.write(("\r\n".join(headers) + "\r\n\r\n").encode("latin-1") + payload)
+        await writer.drain()
+
+    async def read_request(self, reader):
+        """
+        (method, target, headers) of the next request, or None at end of stream
+        """
+        request_line = await asyncio.wait_for(reader.readline(), HEADER_TIMEOUT)
+        if not request_line.strip():
+            return None
+        parts = request_line.decode("latin-1").split()
+        if len(parts) != 3:
+            raise ValueError("Malformed request line")
+        headers = {}
+        while True:
+            line = await asyncio.wait_for(reader.readline(), HEADER_TIMEOUT)
+            if line in (b"\r\n", b"\n", b""):
+                break
+            if len(headers) >= MAX_HEADERS:
+                raise ValueError("Too many headers")
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        return parts[0].upper(), parts[1], headers
+
+    async def handle(self, reader, writer):
+        """
+        Serve requests on one connection until it is closed
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                try:
+                    request = await self.read_request(reader)
+                except (ValueError, asyncio.LimitOverrunError) as e:
+                    await self.respond(writer, 400, None, str(e).encode("utf-8"), keep_alive=False)
+                    return
+                if request is None:
+                    return
+                method, target, headers = request
+                received = loop.time()
+                keep_alive = headers.get("connection", "").lower() != "close"
+                path = urlsplit(target).path.rstrip("/") or "/"
+
+                if path in ("/health", "/metrics"):
+                    if method != "GET":
+                        await self.respond(writer, 405, None, b"Use GET", keep_alive=keep_alive)
+                    else:
+                        payload = self.metrics() if path == "/metrics" else {"status": "ok"}
+                        await self.respond(writer, 200, "application/json",
+                                           json.dumps(payload).encode("utf-8"), keep_alive=keep_alive)
+                    continue
+
+                output_format = path.lstrip("/")
+                if output_format not in CONTENT_TYPES:
+                    await self.respond(writer, 404, None, b"Use POST /markdown, /text or /analysis",
+                                       keep_alive=False)
+                    return
+                if method != "POST":
+                    await self.respond(writer, 405, None, b"Use POST", keep_alive=False)
+                    return
+                if "content-length" not in headers:
+                    await self.respond(writer, 411, None, b"Content-Length is required", keep_alive=False)
+                    return
+                length = headers["content-length"].strip()
+                if not (length.isascii() and length.isdigit()):
+                    await self.respond(writer, 400, None, b"Invalid Content-Length", keep_alive=False)
+                    return
+                length = int(length)
+                if length > self.max_upload:
+                    await self.respond(writer, 413, None, b"Upload too large", keep_alive=False)
+                    return
+
+                self.counters["received"] += 1
+                if self.running + self.queued >= self.workers + self.queue_size:
+                    # Refuse before reading the body, so overload costs almost nothing
+                    self.counters["rejected"] += 1
+                    await self.respond(writer, 503, None, b"Server busy, retry later",
+                                       {"Retry-After": "1"}, keep_alive=False)
+                    return
+
+                self.queued += 1
+                self.peak_queued = max(self.peak_queued, self.queued)
+                deadline = received + self.timeout
+                try:
+                    body = await asyncio.wait_for(reader.readexactly(length), self.timeout)
+                except BaseException:
+                    self.queued -= 1
+                    raise
+                status, content_type, payload = await self.convert(
+                    body, headers.get("content-type", ""), output_format, deadline)
+                self.latencies.append(loop.time() - received)
+                await self.respond(writer, status, content_type, payload,
+                                   {"X-Conversion-Seconds": f"{loop.time() - received:.4f}"}, keep_alive)
+                if not keep_alive:
+                    return
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except Exception as e:
+            print(f"Error handling request: {str(e)}")
+        finally:
+            writer.close()
+            with contextlib.suppress(Exception):
+                await writer.wait_closed()
+
+    async def serve(self, host, port):
+        self.slots = asyncio.Semaphore(self.workers)
+        self.start_pool()
+        server = await asyncio.start_server(self.handle, host, port)
+        print(f"Serving on http://{host}:{port} "
+              f"({self.workers} workers, queue {self.queue_size}, timeout {self.timeout:.0f}s)")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve .docx to Markdown, text and analysis conversions over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count(), help="Worker processes")
+    parser.add_argument("--queue-size", type=int, default=DEFAULT_QUEUE_SIZE,
+                        help="Requests that may wait for a worker before new ones get 503")
+    parser.add_argument("--timeout", type=float, default=DEFAULT_TIMEOUT, help="Per-request timeout in seconds")
+    parser.add_argument("--max-upload-mb", type=float, default=DEFAULT_MAX_UPLOAD / (1024 * 1024))
+    args = parser.parse_args(argv)
+
+    service = ConversionService(args.workers, args.queue_size, args.timeout,
+                                int(args.max_upload_mb * 1024 * 1024))
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("\nStopped")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
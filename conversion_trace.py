@@ -0,0 +1,240 @@
+import functools
+import json
+import os
+import signal
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+
+TRACE_ENV = "DOCX_TRACE"
+PROFILE_ENV = "DOCX_PROFILE"
+PROFILERS = ("cprofile", "sample")
+DEFAULT_SAMPLE_INTERVAL = 0.005
+PROFILE_TOP = 30
+
+class _Stage:
+    __slots__ = ("trace", "name", "started")
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.trace.path.append(self.name)
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.started
+        trace = self.trace
+        trace.add_time("/".join(trace.path), elapsed)
+        trace.path.pop()
+        return False
+
+class Trace:
+    """
+    Named stage timers and counters for one document conversion
+
+    Stages nest: a "body" stage entered inside "load" is recorded as
+    "load/body". With profiler="cprofile" the whole trace runs under
+    cProfile; with profiler="sample" the current function and stage are
+    sampled on a CPU-time timer (Unix main thread only). close() stops the
+    profiler and writes the JSON trace when an output path was given.
+    """
+    enabled = True
+
+    def __init__(self, name, source=None, output_path=None, profiler=None,
+                 sample_interval=DEFAULT_SAMPLE_INTERVAL):
+        if profiler not in (None,) + PROFILERS:
+            raise ValueError(f"Unknown profiler '{profiler}', expected one of {', '.join(PROFILERS)}")
+        self.name = name
+        self.source = str(source) if source is not None else None
+        self.output_path = output_path
+        self.stages = {}
+        self.counters = Counter()
+        self.path = []
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.total_seconds = None
+        self.profiler = profiler
+        self.sample_interval = sample_interval
+        self.samples = Counter()
+        self._profile = None
+        self._previous_handler = None
+
+        if profiler == "cprofile":
+            import cProfile
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        elif profiler == "sample":
+            self._start_sampling()
+
+    def stage(self, name):
+        """
+        Context manager timing one stage
+        """
+        return _Stage(self, name)
+
+    def add_time(self, name, seconds, calls=1):
+        """
+        Record time measured elsewhere under a stage name
+        """
+        entry = self.stages.get(name)
+        if entry is None:
+            self.stages[name] = [seconds, calls]
+        else:
+            entry[0] += seconds
+            entry[1] += calls
+
+    def count(self, name, amount=1):
+        self.counters[name] += amount
+
+    def _start_sampling(self):
+        if not hasattr(signal, "setitimer") or threading.current_thread() is not threading.main_thread():
+            self.profiler = None
+            return
+        self._previous_handler = signal.signal(signal.SIGPROF, self._sample)
+        signal.setitimer(signal.ITIMER_PROF, self.sample_interval, self.sample_interval)
+
+    def _sample(self, signum, frame):
+        if frame is not None:
+            code = frame.f_code
+            location = f"{os.path.basename(code.co_filename)}:{code.co_name}"
+            self.samples[("/".join(self.path) or "-", location)] += 1
+
+    def _stop_profiling(self):
+        if self._profile is not None:
+            self._profile.disable()
+        elif self.profiler == "sample":
+            signal.setitimer(signal.ITIMER_PROF, 0, 0)
+            signal.signal(signal.SIGPROF, self._previous_handler or signal.SIG_DFL)
+
+    def _profile_rows(self):
+        import pstats
+        stats = pstats.Stats(self._profile)
+        rows = []
+        for (filename, line, function), (_, calls, own, cumulative, _) in stats.stats.items():
+            rows.append({
+                "function": f"{os.path.basename(filename)}:{line}:{function}",
+                "calls": calls,
+                "own_seconds": round(own, 6),
+                "cumulative_seconds": round(cumulative, 6),
+            })
+        rows.sort(key=lambda row: -row["cumulative_seconds"])
+        return rows[:PROFILE_TOP]
+
+    def close(self):
+        """
+        Stop timing and profiling, and save the trace if it has an output path
+        """
+        if self.total_seconds is not None:
+            return
+        self.total_seconds = time.perf_counter() - self.started
+        self._stop_profiling()
+        if self.output_path:
+            try:
+                self.save(self.output_path)
+            except OSError as e:
+                print(f"Error writing trace: {str(e)}")
+
+    def as_dict(self):
+        total = self.total_seconds if self.total_seconds is not None else time.perf_counter() - self.started
+        data = {
+            "name": self.name,
+            "source": self.source,
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started_at)),
+            "total_seconds": round(total, 6),
+            "stages": {name: {"seconds": round(seconds, 6), "calls": calls}
+                       for name, (seconds, calls) in self.stages.items()},
+            "counters": dict(self.counters),
+        }
+        if self._profile is not None:
+            data["profile"] = self._profile_rows()
+        elif self.profiler == "sample":
+            data["samples"] = [{"stage": stage, "function": location, "samples": count,
+                                "seconds": round(count * self.sample_interval, 6)}
+                               for (stage, location), count in self.samples.most_common(PROFILE_TOP)]
+        return data
+
+    def save(self, path):
+        """
+        Write the trace as JSON; a directory gets <document>.<name>.trace.json
+        """
+        if os.path.isdir(path):
+            stem = Path(self.source).stem if self.source else "trace"
+            path = os.path.join(path, f"{stem}.{self.name}.trace.json")
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.as_dict(), f, indent=2)
+        return path
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+class NullTrace:
+    """
+    Trace stand-in that records nothing, used when tracing is off
+    """
+    enabled = False
+    _stage = _NullStage()
+
+    def stage(self, name):
+        return self._stage
+
+    def add_time(self, name, seconds, calls=1):
+        pass
+
+    def count(self, name, amount=1):
+        pass
+
+    def close(self):
+        pass
+
+NULL_TRACE = NullTrace()
+
+_warned_profilers = set()
+
+def trace_from_environment(name, source=None):
+    """
+    A Trace when DOCX_TRACE names an output file or directory, else NULL_TRACE
+
+    DOCX_PROFILE may be set to 'cprofile' or 'sample' to add a profile.
+    Any other value is reported once and ignored, so a typo never breaks
+    a conversion.
+    """
+    output_path = os.environ.get(TRACE_ENV)
+    if not output_path:
+        return NULL_TRACE
+    profiler = os.environ.get(PROFILE_ENV) or None
+    if profiler not in (None,) + PROFILERS:
+        if profiler not in _warned_profilers:
+            _warned_profilers.add(profiler)
+            print(f"Warning: ignoring {PROFILE_ENV}='{profiler}', expected one of {', '.join(PROFILERS)}")
+        profiler = None
+    return Trace(name, source, output_path, profiler)
+
+def traced(name):
+    """
+    Give a converter taking a document path a trace keyword argument
+
+    Callers may pass their own trace; otherwise one is taken from the
+    environment for the duration of the call and closed afterwards.
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(docx_path, *args, trace=None, **kwargs):
+            if trace is not None:
+                return func(docx_path, *args, trace=trace, **kwargs)
+            trace = trace_from_environment(name, docx_path)
+            try:
+                return func(docx_path, *args, trace=trace, **kwargs)
+            finally:
+                trace.close()
+        return wrapper
+    return decorate
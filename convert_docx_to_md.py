@@ -1,11 +1,130 @@
-import docx
 import os
 import re
 from pathlib import Path
 
-def convert_docx_to_markdown(docx_path, output_path=None):
+import docx_ir
+import docx_package
+from docx_media import document_media, with_images
+from conversion_trace import traced
+from markdown_writer import MarkdownWriter, preview_text
+
+LIST_PREFIXES = ('•', '-', '*', '1.', '2.', '3.', '4.', '5.', '6.', '7.', '8.', '9.')
+
+def format_list_line(line):
+    """
+    Normalize bullet and numbered list markers to Markdown list syntax
+    """
+    # Check for bullet points or numbered lists
+    if line.strip().startswith(LIST_PREFIXES):
+        # Convert to markdown list format
+        line = re.sub(r'^[\s]*[•\-*]\s*', '- ', line)
+        line = re.sub(r'^[\s]*(\d+)\.\s*', r'\1. ', line)
+    return line
+
+def markdown_list_item(item, text):
+    """
+    Render a numbered or bulleted IR list item at its nesting level
+    """
+    if item.ordered:
+        return "   " * item.level + "1. " + text
+    return "  " * item.level + "- " + text
+
+def markdown_table_row(cells):
+    """
+    Render one row of cell texts as a Markdown table row
+    """
+    return "| " + " | ".join(cells) + " |"
+
+class MarkdownBlockRenderer:
+    """
+    Single-pass Markdown rendering of IR blocks in document order
+
+    Every block is handed to write_line as soon as it is rendered. Tables
+    stay where they appear in the document and list markers are normalized
+    inline, so there is no second pass over paragraphs, tables or output.
+    With a docx_media.DocumentMedia, pictures are linked after their
+    paragraph's text.
+    """
+    def __init__(self, write_line, media=None):
+        self.write_line = write_line
+        self.media = media
+        self.in_list = False
+        self.list_num_id = None
+        self.header_written = False
+    
+    def block(self, block):
+        if isinstance(block, docx_ir.Table):
+            self.table_start()
+            for row in block.rows:
+                self.table_row(row)
+            self.table_end()
+        else:
+            self.paragraph(block)
+    
+    def paragraph(self, paragraph):
+        text = paragraph.text.strip()
+        images = self.media.markdown(paragraph) if self.media is not None else ""
+        if not text:
+            if images:
+                # A picture on its own is a paragraph of its own
+                self._close_list()
+                self.write_line(images)
+                self.write_line("")
+            return
+        
+        if isinstance(paragraph, docx_ir.ListItem):
+            if paragraph.level == 0 and paragraph.num_id != self.list_num_id:
+                # A different top-level list starts a new Markdown list
+                self._close_list()
+            self.write_line(with_images(markdown_list_item(paragraph, text), images))
+            self.in_list = True
+            self.list_num_id = paragraph.num_id
+            return
+        
+        self._close_list()
+        if isinstance(paragraph, docx_ir.Heading):
+            self.write_line(with_images("#" * paragraph.level + " " + text, images))
+        else:
+            # Regular paragraph, possibly with a typed list marker
+            self.write_line(with_images(format_list_line(text), images))
+        self.write_line("")  # Add empty line for spacing
+    
+    def table_start(self):
+        self._close_list()
+        self.header_written = False
+        self.write_line("")  # Add spacing before table
+    
+    def table_row(self, row):
+        row = [cell_text.strip() for cell_text in row]
+        self.write_line(markdown_table_row(row))
+        if not self.header_written:
+            # Separator after the header row
+            self.write_line(markdown_table_row(["-" * max(len(cell_text), 3) for cell_text in row]))
+            self.header_written = True
+    
+    def table_end(self):
+        self.write_line("")  # Add spacing after table
+    
+    def finish(self):
+        self._close_list()
+    
+    def _close_list(self):
+        if self.in_list:
+            self.write_line("")
+            self.in_list = False
+            self.list_num_id = None
+
+
+@traced("basic")
+def convert_docx_to_markdown(docx_path, output_path=None, document=None, media_dir=None, trace=None):
     """
     Convert a .docx file to Markdown format with 100% content preservation
+
+    Pass an already parsed DocumentIR as document to skip parsing. Blocks
+    are written as they are rendered and the output only appears once it is
+    complete. With media_dir, embedded pictures are extracted there and
+    linked. Returns a MarkdownOutput (truthy) on success, False on failure.
+    Time is traced in "load" and "render" stages.
     """
     try:
         # Check if file exists
@@ -14,94 +133,83 @@ def convert_docx_to_markdown(docx_path, output_path=None):
             return False
         
         # Open the document
-        doc = docx.Document(docx_path)
+        if document is None:
+            with trace.stage("load"):
+                document = docx_ir.load_document(docx_path, trace)
         
-        # Initialize markdown content
-        md_content = []
+        # Determine output path
+        if output_path is None:
+            base_name = Path(docx_path).stem
+            output_path = f"{base_name}.md"
         
-        # Process paragraphs
-        for paragraph in doc.paragraphs:
-            text = paragraph.text.strip()
-            if not text:
-                continue
-                
-            # Check paragraph style for headers
-            style_name = paragraph.style.name.lower()
-            
-            if 'heading' in style_name or 'title' in style_name:
-                # Determine heading level
-                if 'heading 1' in style_name or 'title' in style_name:
-                    md_content.append(f"# {text}")
-                elif 'heading 2' in style_name:
-                    md_content.append(f"## {text}")
-                elif 'heading 3' in style_name:
-                    md_content.append(f"### {text}")
-                elif 'heading 4' in style_name:
-                    md_content.append(f"#### {text}")
-                elif 'heading 5' in style_name:
-                    md_content.append(f"##### {text}")
-                elif 'heading 6' in style_name:
-                    md_content.append(f"###### {text}")
-                else:
-                    md_content.append(f"# {text}")
-            else:
-                # Regular paragraph
-                md_content.append(text)
-            
-            md_content.append("")  # Add empty line for spacing
+        # Render every block once, in document order, straight to the file
+        with trace.stage("render"):
+            with MarkdownWriter(output_path) as writer, document_media(docx_path, output_path, media_dir) as media:
+                renderer = MarkdownBlockRenderer(writer.write_line, media)
+                for block in document.blocks:
+                    renderer.block(block)
+                renderer.finish()
+        trace.count("output_chars", writer.chars)
         
-        # Process tables
-        for table in doc.tables:
-            md_content.append("")  # Add spacing before table
-            
-            # Create table header
-            header_row = []
-            separator_row = []
-            
-            for cell in table.rows[0].cells:
-                cell_text = cell.text.strip()
-                header_row.append(cell_text)
-                separator_row.append("-" * max(len(cell_text), 3))
-            
-            md_content.append("| " + " | ".join(header_row) + " |")
-            md_content.append("| " + " | ".join(separator_row) + " |")
-            
-            # Add data rows
-            for row in table.rows[1:]:
-                row_data = []
-                for cell in row.cells:
-                    row_data.append(cell.text.strip())
-                md_content.append("| " + " | ".join(row_data) + " |")
-            
-            md_content.append("")  # Add spacing after table
+        print(f"Successfully converted '{docx_path}' to '{output_path}'")
+        print(f"Content preserved: {writer.chars} characters")
         
-        # Process lists (basic detection)
-        # This is a simplified approach - you might need to enhance based on your document structure
-        processed_content = []
-        for line in md_content:
-            # Check for bullet points or numbered lists
-            if line.strip().startswith(('•', '-', '*', '1.', '2.', '3.', '4.', '5.', '6.', '7.', '8.', '9.')):
-                # Convert to markdown list format
-                line = re.sub(r'^[\s]*[•\-*]\s*', '- ', line)
-                line = re.sub(r'^[\s]*(\d+)\.\s*', r'\1. ', line)
-            processed_content.append(line)
+        return writer.result
         
-        # Join all content
-        final_md_content = '\n'.join(processed_content)
+    except Exception as e:
+        print(f"Error converting file: {str(e)}")
+        return False
+
+@traced("streaming")
+def convert_docx_to_markdown_streaming(docx_path, output_path=None, media_dir=None, trace=None):
+    """
+    Convert a .docx file to Markdown by streaming word/document.xml
+
+    Produces the same output as convert_docx_to_markdown without building
+    the whole document in memory. Paragraphs and table rows are written as
+    they are parsed, so memory stays flat. Parsing, rendering and writing
+    are interleaved, so they share one "stream" stage. media_dir works as
+    for convert_docx_to_markdown. Returns a MarkdownOutput on success,
+    False on failure.
+    """
+    try:
+        # Check if file exists
+        if not os.path.exists(docx_path):
+            print(f"Error: File '{docx_path}' not found.")
+            return False
         
         # Determine output path
         if output_path is None:
             base_name = Path(docx_path).stem
             output_path = f"{base_name}.md"
         
-        # Write to markdown file
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(final_md_content)
+        with docx_package.open_package(docx_path) as package, MarkdownWriter(output_path) as writer, \
+                document_media(docx_path, output_path, media_dir) as media:
+            with trace.stage("package"):
+                document_part = docx_package.find_document_part(package)
+                relationships = docx_package.read_relationships(package, document_part)
+                reader = docx_ir.ParagraphReader(package, relationships)
+            
+            renderer = MarkdownBlockRenderer(writer.write_line, media)
+            grid = None
+            with trace.stage("stream"):
+                for event, value in docx_package.iter_body(package, document_part):
+                    if event == "paragraph":
+                        renderer.paragraph(reader.read(value))
+                    elif event == "table":
+                        renderer.table_start()
+                        grid = docx_package.TableGrid(value)
+                    elif event == "row":
+                        renderer.table_row(grid.add_row(value))
+                    elif event == "end_table":
+                        renderer.table_end()
+                renderer.finish()
+        trace.count("output_chars", writer.chars)
         
         print(f"Successfully converted '{docx_path}' to '{output_path}'")
-        print(f"Content preserved: {len(final_md_content)} characters")
+        print(f"Content preserved: {writer.chars} characters")
         
-        return True
+        return writer.result
         
     except Exception as e:
         print(f"Error converting file: {str(e)}")
@@ -113,22 +221,17 @@ def main():
     output_file = "eduphilo-website-requirements.md"
     
     print("Converting .docx to Markdown...")
-    success = convert_docx_to_markdown(docx_file, output_file)
+    output = convert_docx_to_markdown(docx_file, output_file)
     
-    if success:
+    if output:
         print(f"\nConversion completed!")
         print(f"Output file: {output_file}")
         
-        # Show preview of the converted content
-        try:
-            with open(output_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-                print(f"\nPreview (first 500 characters):")
-                print("-" * 50)
-                print(content[:500] + "..." if len(content) > 500 else content)
-                print("-" * 50)
-        except Exception as e:
-            print(f"Error reading output file: {str(e)}")
+        # Show preview of the converted content, kept while it was written
+        print(f"\nPreview (first 500 characters):")
+        print("-" * 50)
+        print(preview_text(output, 500))
+        print("-" * 50)
     else:
         print("Conversion failed!")
 
@@ -0,0 +1,436 @@
+import argparse
+import contextlib
+import os
+import sqlite3
+import sys
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+
+import docx_ir
+from batch_convert import find_docx_files, positive_int
+from conversion_cache import file_digest
+from deep_analyzer import block_kind, summarize_document
+
+DEFAULT_DATABASE = "corpus.sqlite"
+# Bump when the stored metrics change; the parser's IR version is part of it too
+ANALYZER_VERSION = f"1.{docx_ir.IR_VERSION}"
+COMMIT_EVERY = 200
+DEFAULT_CHUNK_SIZE = 8
+# Paragraphs this short are the heading candidates worth reporting on
+SHORT_PARAGRAPH_CHARS = 80
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    content_hash TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    analyzer_version TEXT NOT NULL,
+    analyzed_at REAL NOT NULL,
+    error TEXT,
+    sections INTEGER,
+    styles_defined INTEGER,
+    paragraphs INTEGER,
+    headings INTEGER,
+    list_items INTEGER,
+    tables INTEGER,
+    empty_paragraphs INTEGER,
+    characters INTEGER,
+    runs INTEGER,
+    bold_runs INTEGER,
+    italic_runs INTEGER,
+    max_runs_per_paragraph INTEGER
+);
+CREATE INDEX IF NOT EXISTS documents_content_hash ON documents (content_hash);
+
+CREATE TABLE IF NOT EXISTS style_usage (
+    document_id INTEGER NOT NULL REFERENCES documents (id) ON DELETE CASCADE,
+    style_name TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    level INTEGER NOT NULL,
+    paragraphs INTEGER NOT NULL,
+    empty_paragraphs INTEGER NOT NULL,
+    short_paragraphs INTEGER NOT NULL,
+    all_bold_paragraphs INTEGER NOT NULL,
+    outlined_paragraphs INTEGER NOT NULL,
+    characters INTEGER NOT NULL,
+    runs INTEGER NOT NULL,
+    bold_runs INTEGER NOT NULL,
+    italic_runs INTEGER NOT NULL,
+    sized_paragraphs INTEGER NOT NULL,
+    font_size_total REAL NOT NULL,
+    PRIMARY KEY (document_id, style_name, kind, level)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS style_usage_style ON style_usage (style_name, kind);
+CREATE INDEX IF NOT EXISTS style_usage_kind ON style_usage (kind, level);
+
+CREATE TABLE IF NOT EXISTS table_metrics (
+    document_id INTEGER NOT NULL REFERENCES documents (id) ON DELETE CASCADE,
+    block_index INTEGER NOT NULL,
+    rows INTEGER NOT NULL,
+    columns INTEGER NOT NULL,
+    cells INTEGER NOT NULL,
+    empty_cells INTEGER NOT NULL,
+    merged_cells INTEGER NOT NULL,
+    characters INTEGER NOT NULL,
+    PRIMARY KEY (document_id, block_index)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS table_metrics_shape ON table_metrics (columns, rows);
+"""
+
+DOCUMENT_COLUMNS = ("sections", "styles_defined", "paragraphs", "headings", "list_items", "tables",
+                    "empty_paragraphs", "characters", "runs", "bold_runs", "italic_runs", "max_runs_per_paragraph")
+STYLE_COLUMNS = ("style_name", "kind", "level", "paragraphs", "empty_paragraphs", "short_paragraphs",
+                 "all_bold_paragraphs", "outlined_paragraphs", "characters", "runs", "bold_runs", "italic_runs",
+                 "sized_paragraphs", "font_size_total")
+TABLE_COLUMNS = ("block_index", "rows", "columns", "cells", "empty_cells", "merged_cells", "characters")
+
+REPORTS = {
+    "styles": (
+        "Most used styles",
+        """SELECT style_name, kind, COUNT(DISTINCT document_id) AS documents, SUM(paragraphs) AS paragraphs,
+                  ROUND(1.0 * SUM(characters) / SUM(paragraphs), 1) AS mean_chars,
+                  ROUND(1.0 * SUM(bold_runs) / MAX(SUM(runs), 1), 3) AS bold_run_share,
+                  ROUND(SUM(font_size_total) / NULLIF(SUM(sized_paragraphs), 0), 1) AS mean_font_size
+           FROM style_usage GROUP BY style_name, kind ORDER BY paragraphs DESC LIMIT :limit""",
+    ),
+    "headings": (
+        "Heading styles by level",
+        """SELECT level, style_name, COUNT(DISTINCT document_id) AS documents, SUM(paragraphs) AS paragraphs,
+                  ROUND(SUM(font_size_total) / NULLIF(SUM(sized_paragraphs), 0), 1) AS mean_font_size,
+                  ROUND(1.0 * SUM(all_bold_paragraphs) / SUM(paragraphs), 3) AS all_bold_share
+           FROM style_usage WHERE kind = 'heading'
+           GROUP BY level, style_name ORDER BY level, paragraphs DESC LIMIT :limit""",
+    ),
+    "candidates": (
+        "Body styles that look like headings (short, all-bold or outlined paragraphs)",
+        """SELECT style_name, COUNT(DISTINCT document_id) AS documents, SUM(paragraphs) AS paragraphs,
+                  SUM(short_paragraphs) AS short, SUM(all_bold_paragraphs) AS all_bold,
+                  SUM(outlined_paragraphs) AS outlined,
+                  ROUND(SUM(font_size_total) / NULLIF(SUM(sized_paragraphs), 0), 1) AS mean_font_size
+           FROM style_usage WHERE kind = 'paragraph'
+           GROUP BY style_name
+           HAVING SUM(outlined_paragraphs) > 0 OR SUM(all_bold_paragraphs) * 2 > SUM(paragraphs - empty_paragraphs)
+           ORDER BY paragraphs DESC LIMIT :limit""",
+    ),
+    "tables": (
+        "Table shapes",
+        """SELECT columns, COUNT(*) AS tables, COUNT(DISTINCT document_id) AS documents,
+                  ROUND(AVG(rows), 1) AS mean_rows, MAX(rows) AS max_rows,
+                  ROUND(1.0 * SUM(empty_cells) / MAX(SUM(cells), 1), 3) AS empty_share,
+                  ROUND(1.0 * SUM(merged_cells) / MAX(SUM(cells), 1), 3) AS merged_share
+           FROM table_metrics GROUP BY columns ORDER BY tables DESC LIMIT :limit""",
+    ),
+    "documents": (
+        "Corpus totals",
+        """SELECT COUNT(*) AS documents, SUM(error IS NOT NULL) AS failed, SUM(paragraphs) AS paragraphs,
+                  SUM(headings) AS headings, SUM(list_items) AS list_items, SUM(tables) AS tables,
+                  SUM(characters) AS characters, ROUND(AVG(paragraphs), 1) AS mean_paragraphs
+           FROM documents""",
+    ),
+}
+
+def connect(path=DEFAULT_DATABASE):
+    """
+    Open the analysis database, creating the schema if needed
+    """
+    connection = sqlite3.connect(path)
+    connection.execute("PRAGMA journal_mode = WAL")
+    connection.execute("PRAGMA synchronous = NORMAL")
+    connection.execute("PRAGMA foreign_keys = ON")
+    connection.executescript(SCHEMA)
+    return connection
+
+def style_rows(document):
+    """
+    Per-style metrics of a document, one row per (style, block kind, level)
+    """
+    groups = defaultdict(lambda: [0] * (len(STYLE_COLUMNS) - 3))
+    for block in document.blocks:
+        if isinstance(block, docx_ir.Table):
+            continue
+        level = getattr(block, "level", 0)
+        counters = groups[(block.style_name, block_kind(block), level)]
+        text = block.text.strip()
+        text_runs = [run for run in block.runs if run.text.strip()]
+        counters[0] += 1
+        counters[1] += not text
+        counters[2] += bool(text) and len(text) <= SHORT_PARAGRAPH_CHARS
+        counters[3] += bool(text_runs) and all(run.bold for run in text_runs)
+        counters[4] += block.outline_level is not None
+        counters[5] += len(block.text)
+        counters[6] += len(block.runs)
+        counters[7] += sum(1 for run in block.runs if run.bold)
+        counters[8] += sum(1 for run in block.runs if run.italic)
+        if block.font_size is not None:
+            counters[9] += 1
+            counters[10] += block.font_size
+    return [key + tuple(counters) for key, counters in groups.items()]
+
+def table_rows(document):
+    """
+    Per-table metrics of a document, keyed by the table's block index
+    """
+    rows = []
+    for index, block in enumerate(document.blocks):
+        if not isinstance(block, docx_ir.Table):
+            continue
+        cells = empty = characters = 0
+        for row in block.rows:
+            for cell in row:
+                cells += 1
+                characters += len(cell)
+                if not cell.strip():
+                    empty += 1
+        # Grid cells covered by a gridSpan or vMerge, as resolved when the table was read
+        rows.append((index, len(block.rows), block.column_count, cells, empty, block.merged_cells, characters))
+    return rows
+
+def analyze_file(path):
+    """
+    Parse one document and compute its metrics; runs in a worker process
+
+    Returns (path, document values, style rows, table rows, error).
+    """
+    try:
+        document = docx_ir.load_document(path)
+        summary = summarize_document(document)
+        blocks = summary["blocks"]
+        values = (
+            summary["sections"], summary["styles_defined"], summary["paragraphs"], blocks.get("heading", 0),
+            blocks.get("list_item", 0), blocks.get("table", 0), summary["empty_paragraphs"],
+            summary["characters"], summary["runs"], summary["bold_runs"], summary["italic_runs"],
+            summary["runs_per_paragraph"]["max"],
+        )
+        return path, values, style_rows(document), table_rows(document), None
+    except Exception as e:
+        return path, None, [], [], str(e) or type(e).__name__
+
+def _analyze_chunk(paths):
+    return [analyze_file(path) for path in paths]
+
+def plan_updates(connection, paths, force=False):
+    """
+    Split paths into those to analyze and those already current
+
+    A file whose size and modification time match its row is current
+    without being read. Otherwise it is hashed: a matching hash only
+    refreshes the stored signature, and a hash already analyzed under
+    another path is copied from that row instead of being parsed again.
+    Files sharing a hash that is not stored yet are analyzed once: the
+    first is parsed and the others are copied from it afterwards.
+    Returns ({path: (hash, size, mtime_ns)} to analyze, current count,
+    [(path, signature, source document id)] to copy, and
+    [(path, signature, source path)] to copy once the source is stored).
+    """
+    known = {row[0]: row[1:] for row in connection.execute(
+        "SELECT path, id, content_hash, size, mtime_ns, analyzer_version FROM documents")}
+    to_analyze = {}
+    to_copy = []
+    duplicates = []
+    first_paths = {}
+    current = 0
+    for path in paths:
+        st = os.stat(path)
+        row = known.get(path)
+        fresh = row is not None and row[4] == ANALYZER_VERSION and not force
+        if fresh and (row[2], row[3]) == (st.st_size, st.st_mtime_ns):
+            current += 1
+            continue
+        content_hash = file_digest(path)
+        signature = (content_hash, st.st_size, st.st_mtime_ns)
+        if fresh and row[1] == content_hash:
+            connection.execute("UPDATE documents SET size = ?, mtime_ns = ? WHERE id = ?",
+                               (st.st_size, st.st_mtime_ns, row[0]))
+            current += 1
+            continue
+        if not force:
+            duplicate = connection.execute(
+                "SELECT id FROM documents WHERE content_hash = ? AND analyzer_version = ? AND path != ? LIMIT 1",
+                (content_hash, ANALYZER_VERSION, path)).fetchone()
+            if duplicate:
+                to_copy.append((path, signature, duplicate[0]))
+                continue
+        if content_hash in first_paths:
+            duplicates.append((path, signature, first_paths[content_hash]))
+            continue
+        first_paths[content_hash] = path
+        to_analyze[path] = signature
+    return to_analyze, current, to_copy, duplicates
+
+def _insert_document(connection, path, signature, values, error):
+    connection.execute("DELETE FROM documents WHERE path = ?", (path,))
+    columns = ("path", "content_hash", "size", "mtime_ns", "analyzer_version", "analyzed_at", "error") + \
+        DOCUMENT_COLUMNS
+    cursor = connection.execute(
+        f"INSERT INTO documents ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+        (path,) + tuple(signature) + (ANALYZER_VERSION, time.time(), error) +
+        (tuple(values) if values else (None,) * len(DOCUMENT_COLUMNS)))
+    return cursor.lastrowid
+
+def store_result(connection, signature, result):
+    """
+    Replace a document's rows with freshly computed metrics, using bulk inserts
+    """
+    path, values, styles, tables, error = result
+    document_id = _insert_document(connection, path, signature, values, error)
+    connection.executemany(
+        f"INSERT INTO style_usage (document_id, {', '.join(STYLE_COLUMNS)}) "
+        f"VALUES ({', '.join('?' * (len(STYLE_COLUMNS) + 1))})",
+        [(document_id,) + row for row in styles])
+    connection.executemany(
+        f"INSERT INTO table_metrics (document_id, {', '.join(TABLE_COLUMNS)}) "
+        f"VALUES ({', '.join('?' * (len(TABLE_COLUMNS) + 1))})",
+        [(document_id,) + row for row in tables])
+
+def copy_document(connection, path, signature, source_id):
+    """
+    Store a document identical to an already analyzed one by copying its rows
+    """
+    values = connection.execute(f"SELECT {', '.join(DOCUMENT_COLUMNS)}, error FROM documents WHERE id = ?",
+                                (source_id,)).fetchone()
+    document_id = _insert_document(connection, path, signature, values[:-1], values[-1])
+    connection.execute(
+        f"INSERT INTO style_usage (document_id, {', '.join(STYLE_COLUMNS)}) "
+        f"SELECT ?, {', '.join(STYLE_COLUMNS)} FROM style_usage WHERE document_id = ?", (document_id, source_id))
+    connection.execute(
+        f"INSERT INTO table_metrics (document_id, {', '.join(TABLE_COLUMNS)}) "
+        f"SELECT ?, {', '.join(TABLE_COLUMNS)} FROM table_metrics WHERE document_id = ?", (document_id, source_id))
+
+def prune_missing(connection):
+    """
+    Delete the rows of documents whose file no longer exists
+    """
+    missing = [(path,) for (path,) in connection.execute("SELECT path FROM documents")
+               if not os.path.exists(path)]
+    connection.executemany("DELETE FROM documents WHERE path = ?", missing)
+    return len(missing)
+
+def update_corpus(inputs, database=DEFAULT_DATABASE, workers=None, chunk_size=DEFAULT_CHUNK_SIZE, force=False,
+                  progress=True):
+    """
+    Bring the database up to date with the documents found under inputs
+
+    Only new or changed files are parsed, over a process pool; the main
+    process does every write, committing every COMMIT_EVERY documents so
+    an interrupted run keeps its progress. Returns counts of analyzed,
+    copied, current, failed and pruned documents.
+    """
+    paths = find_docx_files(inputs)
+    connection = connect(database)
+    try:
+        with connection:
+            to_analyze, current, to_copy, duplicates = plan_updates(connection, paths, force)
+            for path, signature, source_id in to_copy:
+                copy_document(connection, path, signature, source_id)
+            pruned = prune_missing(connection)
+
+        counts = {"analyzed": 0, "copied": len(to_copy) + len(duplicates), "current": current, "failed": 0,
+                  "pruned": pruned}
+        pending = list(to_analyze)
+        chunks = [pending[i:i + chunk_size] for i in range(0, len(pending), chunk_size)]
+        workers = min(workers or os.cpu_count() or 1, max(len(chunks), 1))
+
+        def results():
+            if workers > 1:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    for chunk_results in executor.map(_analyze_chunk, chunks):
+                        yield from chunk_results
+            else:
+                for chunk in chunks:
+                    yield from _analyze_chunk(chunk)
+
+        uncommitted = 0
+        connection.execute("BEGIN")
+        for result in results():
+            store_result(connection, to_analyze[result[0]], result)
+            counts["analyzed"] += 1
+            if result[4]:
+                counts["failed"] += 1
+            if progress:
+                status = "✗" if result[4] else "✓"
+                print(f"[{counts['analyzed']}/{len(pending)}] {status} {result[0]}")
+            uncommitted += 1
+            if uncommitted >= COMMIT_EVERY:
+                connection.commit()
+                connection.execute("BEGIN")
+                uncommitted = 0
+        for path, signature, source_path in duplicates:
+            (source_id,) = connection.execute("SELECT id FROM documents WHERE path = ?", (source_path,)).fetchone()
+            copy_document(connection, path, signature, source_id)
+        connection.commit()
+        return counts
+    finally:
+        connection.close()
+
+def run_report(database, name, limit=20):
+    """
+    Column names and rows of one of the named REPORTS
+    """
+    with contextlib.closing(sqlite3.connect(f"file:{database}?mode=ro", uri=True)) as connection:
+        cursor = connection.execute(REPORTS[name][1], {"limit": limit})
+        return [column[0] for column in cursor.description], cursor.fetchall()
+
+def run_query(database, sql):
+    """
+    Column names and rows of an ad-hoc query, on a read-only connection
+    """
+    with contextlib.closing(sqlite3.connect(f"file:{database}?mode=ro", uri=True)) as connection:
+        cursor = connection.execute(sql)
+        return [column[0] for column in cursor.description or ()], cursor.fetchall()
+
+def print_table(columns, rows):
+    """
+    Print query results as aligned columns
+    """
+    cells = [[("" if value is None else str(value)) for value in row] for row in rows]
+    widths = [max([len(column)] + [len(row[i]) for row in cells]) for i, column in enumerate(columns)]
+    print("  ".join(column.ljust(width) for column, width in zip(columns, widths)))
+    print("  ".join("-" * width for width in widths))
+    for row in cells:
+        print("  ".join(value.ljust(width) for value, width in zip(row, widths)))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Store structure and style metrics of a .docx corpus in SQLite")
+    parser.add_argument("inputs", nargs="*", help="Files, directories or glob patterns to analyze")
+    parser.add_argument("-d", "--database", default=DEFAULT_DATABASE)
+    parser.add_argument("-j", "--workers", type=positive_int, default=os.cpu_count(), help="Worker processes")
+    parser.add_argument("--chunk-size", type=positive_int, default=DEFAULT_CHUNK_SIZE, help="Files per worker task")
+    parser.add_argument("--force", action="store_true", help="Re-analyze every file")
+    parser.add_argument("-q", "--quiet", action="store_true", help="No per-file progress lines")
+    parser.add_argument("--report", nargs="*", choices=sorted(REPORTS), metavar="NAME",
+                        help=f"Print aggregate reports ({', '.join(REPORTS)}; default: all)")
+    parser.add_argument("--limit", type=int, default=20, help="Rows per report")
+    parser.add_argument("--sql", help="Run a read-only query against the database")
+    args = parser.parse_args(argv)
+
+    if args.inputs:
+        started = time.perf_counter()
+        try:
+            counts = update_corpus(args.inputs, args.database, args.workers, args.chunk_size, args.force,
+                                   not args.quiet)
+        except (OSError, sqlite3.Error) as e:
+            print(f"Error updating corpus: {str(e)}")
+            return 1
+        elapsed = time.perf_counter() - started
+        print(f"Analyzed {counts['analyzed']} ({counts['failed']} failed), copied {counts['copied']} duplicates, "
+              f"{counts['current']} unchanged, pruned {counts['pruned']} in {elapsed:.2f}s -> '{args.database}'")
+    elif args.report is None and not args.sql:
+        parser.error("give files to analyze, --report or --sql")
+
+    try:
+        if args.sql:
+            print_table(*run_query(args.database, args.sql))
+        if args.report is not None:
+            for name in args.report or list(REPORTS):
+                print(f"\n=== {REPORTS[name][0].upper()} ===")
+                print_table(*run_report(args.database, name, args.limit))
+    except sqlite3.Error as e:
+        print(f"Error querying '{args.database}': {str(e)}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,63 +1,82 @@
-import docx
+import argparse
+import json
 import os
+import sys
+from collections import Counter
 from pathlib import Path
 
-def deep_analyze_docx(docx_path):
+import docx_ir
+from conversion_trace import traced
+
+OUTPUT_BUFFER_SIZE = 1024 * 1024
+
+@traced("deep_analyze")
+def deep_analyze_docx(docx_path, document=None, trace=None):
     """
     Deep analysis of .docx file to understand its structure
+
+    Time is traced in "load", "paragraphs", "tables" and "styles" stages.
     """
     try:
         if not os.path.exists(docx_path):
             print(f"Error: File '{docx_path}' not found.")
             return None
         
-        doc = docx.Document(docx_path)
+        if document is None:
+            with trace.stage("load"):
+                document = docx_ir.load_document(docx_path, trace)
+        paragraphs = document.paragraphs
+        tables = document.tables
         
         print("=== DEEP DOCUMENT ANALYSIS ===")
-        print(f"Document has {len(doc.paragraphs)} paragraphs")
-        print(f"Document has {len(doc.tables)} tables")
-        print(f"Document has {len(doc.sections)} sections")
-        print(f"Document has {len(doc.styles)} styles")
+        print(f"Document has {len(paragraphs)} paragraphs")
+        print(f"Document has {len(tables)} tables")
+        print(f"Document has {document.section_count} sections")
+        print(f"Document has {len(document.style_names)} styles")
         
         # Analyze each paragraph in detail
         all_content = []
         
-        for i, paragraph in enumerate(doc.paragraphs):
-            print(f"\n--- Paragraph {i+1} ---")
-            print(f"Style: {paragraph.style.name}")
-            print(f"Text: '{paragraph.text}'")
-            print(f"Number of runs: {len(paragraph.runs)}")
-            
-            # Analyze each run in the paragraph
-            for j, run in enumerate(paragraph.runs):
-                print(f"  Run {j+1}: '{run.text}'")
-                print(f"    Bold: {run.bold}")
-                print(f"    Italic: {run.italic}")
-                print(f"    Font size: {run.font.size}")
-                print(f"    Font name: {run.font.name}")
+        with trace.stage("paragraphs"):
+            for i, paragraph in enumerate(paragraphs):
+                print(f"\n--- Paragraph {i+1} ---")
+                print(f"Style: {paragraph.style_name}")
+                print(f"Text: '{paragraph.text}'")
+                print(f"Number of runs: {len(paragraph.runs)}")
                 
-                if run.text.strip():
-                    all_content.append(run.text.strip())
-        
+                # Analyze each run in the paragraph
+                for j, run in enumerate(paragraph.runs):
+                    print(f"  Run {j+1}: '{run.text}'")
+                    print(f"    Bold: {run.bold}")
+                    print(f"    Italic: {run.italic}")
+                    print(f"    Font size: {run.size}")
+                    print(f"    Font name: {run.font}")
+                    
+                    if run.text.strip():
+                        all_content.append(run.text.strip())
+            
         # Analyze tables
-        for i, table in enumerate(doc.tables):
-            print(f"\n--- Table {i+1} ---")
-            print(f"Rows: {len(table.rows)}")
-            print(f"Columns: {len(table.columns)}")
+        with trace.stage("tables"):
+            for i, table in enumerate(tables):
+                print(f"\n--- Table {i+1} ---")
+                print(f"Rows: {len(table.rows)}")
+                print(f"Columns: {table.column_count}")
+                
+                for row_idx, row in enumerate(table.rows):
+                    print(f"  Row {row_idx+1}:")
+                    for col_idx, cell_text in enumerate(row):
+                        cell_text = cell_text.strip()
+                        print(f"    Cell {col_idx+1}: '{cell_text}'")
+                        if cell_text:
+                            all_content.append(cell_text)
             
-            for row_idx, row in enumerate(table.rows):
-                print(f"  Row {row_idx+1}:")
-                for col_idx, cell in enumerate(row.cells):
-                    cell_text = cell.text.strip()
-                    print(f"    Cell {col_idx+1}: '{cell_text}'")
-                    if cell_text:
-                        all_content.append(cell_text)
-        
         # Analyze styles
-        print(f"\n--- Available Styles ---")
-        for style in doc.styles:
-            print(f"  {style.name}")
-        
+        with trace.stage("styles"):
+            print(f"\n--- Available Styles ---")
+            for style_name in document.style_names:
+                print(f"  {style_name}")
+            
+        trace.count("content_items", len(all_content))
         return all_content
         
     except Exception as e:
@@ -66,15 +85,16 @@ def deep_analyze_docx(docx_path):
         traceback.print_exc()
         return None
 
-def extract_raw_text(docx_path):
+def extract_raw_text(docx_path, document=None):
     """
     Extract raw text without any processing
     """
     try:
-        doc = docx.Document(docx_path)
+        if document is None:
+            document = docx_ir.load_document(docx_path)
         raw_text = []
         
-        for paragraph in doc.paragraphs:
+        for paragraph in document.paragraphs:
             raw_text.append(paragraph.text)
         
         return '\n'.join(raw_text)
@@ -83,14 +103,220 @@ def extract_raw_text(docx_path):
         print(f"Error extracting raw text: {str(e)}")
         return None
 
-def main():
-    docx_file = "eduphilo-website-requirements.docx"
+def block_kind(block):
+    """
+    Short name of an IR block's type, as used in the machine-readable output
+    """
+    if isinstance(block, docx_ir.Heading):
+        return "heading"
+    if isinstance(block, docx_ir.ListItem):
+        return "list_item"
+    if isinstance(block, docx_ir.Table):
+        return "table"
+    return "paragraph"
+
+def summarize_document(document):
+    """
+    Aggregate counters over a parsed document, without per-item output
+    """
+    kinds = Counter()
+    styles = Counter()
+    runs_per_paragraph = Counter()
+    font_sizes = Counter()
+    fonts = Counter()
+    table_shapes = []
+    run_count = bold_runs = italic_runs = characters = empty_paragraphs = 0
+    
+    for block in document.blocks:
+        kinds[block_kind(block)] += 1
+        if isinstance(block, docx_ir.Table):
+            table_shapes.append([len(block.rows), block.column_count])
+            continue
+        
+        styles[block.style_name] += 1
+        runs = block.runs
+        runs_per_paragraph[len(runs)] += 1
+        run_count += len(runs)
+        characters += len(block.text)
+        if not block.text.strip():
+            empty_paragraphs += 1
+        for run in runs:
+            # Runs without a direct size inherit the paragraph's effective size
+            size = run.size if run.size is not None else block.font_size
+            font_sizes[size if size is not None else "inherited"] += 1
+            fonts[run.font or "inherited"] += 1
+            if run.bold:
+                bold_runs += 1
+            if run.italic:
+                italic_runs += 1
+    
+    paragraph_count = sum(runs_per_paragraph.values())
+    return {
+        "source": document.source,
+        "sections": document.section_count,
+        "styles_defined": len(document.style_names),
+        "blocks": dict(kinds),
+        "paragraphs": paragraph_count,
+        "empty_paragraphs": empty_paragraphs,
+        "characters": characters,
+        "runs": run_count,
+        "bold_runs": bold_runs,
+        "italic_runs": italic_runs,
+        "runs_per_paragraph": {
+            "mean": round(run_count / paragraph_count, 3) if paragraph_count else 0,
+            "max": max(runs_per_paragraph) if runs_per_paragraph else 0,
+            "histogram": {str(k): v for k, v in sorted(runs_per_paragraph.items())},
+        },
+        "style_histogram": dict(styles.most_common()),
+        "font_size_histogram": {str(k): v for k, v in sorted(font_sizes.items(), key=lambda item: str(item[0]))},
+        "font_histogram": dict(fonts.most_common()),
+        "tables": {
+            "count": len(table_shapes),
+            "cells": sum(rows * columns for rows, columns in table_shapes),
+            "max_rows": max((rows for rows, _ in table_shapes), default=0),
+            "max_columns": max((columns for _, columns in table_shapes), default=0),
+            "dimensions": table_shapes,
+        },
+    }
+
+def print_summary(summary, limit=10):
+    """
+    Print a document summary, showing the most common entries of each histogram
+    """
+    print("=== DOCUMENT SUMMARY ===")
+    print(f"Source: {summary['source']}")
+    print(f"Sections: {summary['sections']}")
+    print(f"Styles defined: {summary['styles_defined']}")
+    print(f"Blocks: {', '.join(f'{k}={v}' for k, v in summary['blocks'].items())}")
+    print(f"Paragraphs: {summary['paragraphs']} ({summary['empty_paragraphs']} empty)")
+    print(f"Characters: {summary['characters']}")
+    print(f"Runs: {summary['runs']} ({summary['bold_runs']} bold, {summary['italic_runs']} italic)")
+    
+    runs = summary["runs_per_paragraph"]
+    print(f"Runs per paragraph: mean {runs['mean']}, max {runs['max']}")
+    
+    for title, key in (("Styles", "style_histogram"), ("Font sizes", "font_size_histogram"),
+                       ("Fonts", "font_histogram")):
+        histogram = summary[key]
+        print(f"{title}:")
+        for name, count in sorted(histogram.items(), key=lambda item: -item[1])[:limit]:
+            print(f"  {name}: {count}")
+        if len(histogram) > limit:
+            print(f"  ... {len(histogram) - limit} more")
+    
+    tables = summary["tables"]
+    print(f"Tables: {tables['count']} ({tables['cells']} cells, up to "
+          f"{tables['max_rows']} rows x {tables['max_columns']} columns)")
+
+def open_output(path):
+    """
+    Open a large-buffered text stream for path, or for stdout when path is '-'
+    """
+    if path == "-":
+        return open(sys.stdout.fileno(), "w", encoding="utf-8", buffering=OUTPUT_BUFFER_SIZE, closefd=False)
+    return open(path, "w", encoding="utf-8", buffering=OUTPUT_BUFFER_SIZE)
+
+def write_jsonl(document, out):
+    """
+    Write one JSON object per block in document order
+
+    Paragraph records carry their runs as [text, bold, italic, size, font]
+    lists; the last line is the aggregate summary.
+    """
+    dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+    for index, block in enumerate(document.blocks):
+        if isinstance(block, docx_ir.Table):
+            record = {"index": index, "kind": "table", "rows": len(block.rows),
+                      "columns": block.column_count, "cells": block.rows}
+        else:
+            record = {"index": index, "kind": block_kind(block), "style": block.style_name,
+                      "text": block.text, "font_size": block.font_size,
+                      "runs": [[run.text, run.bold, run.italic, run.size, run.font] for run in block.runs]}
+            if isinstance(block, (docx_ir.Heading, docx_ir.ListItem)):
+                record["level"] = block.level
+        out.write(dumps(record))
+        out.write("\n")
+    out.write(dumps({"kind": "summary", **summarize_document(document)}))
+    out.write("\n")
+
+def write_columnar(document, out):
+    """
+    Write the document as one JSON object of parallel per-field arrays
+
+    "paragraphs" has one entry per paragraph, "runs" one per run (with the
+    index of its paragraph) and "tables" one per table.
+    """
+    paragraphs = {"block": [], "kind": [], "style": [], "chars": [], "runs": [], "font_size": []}
+    runs = {"paragraph": [], "chars": [], "bold": [], "italic": [], "size": [], "font": []}
+    tables = {"block": [], "rows": [], "columns": []}
+    
+    for index, block in enumerate(document.blocks):
+        if isinstance(block, docx_ir.Table):
+            tables["block"].append(index)
+            tables["rows"].append(len(block.rows))
+            tables["columns"].append(block.column_count)
+            continue
+        paragraph_index = len(paragraphs["block"])
+        paragraphs["block"].append(index)
+        paragraphs["kind"].append(block_kind(block))
+        paragraphs["style"].append(block.style_name)
+        paragraphs["chars"].append(len(block.text))
+        paragraphs["runs"].append(len(block.runs))
+        paragraphs["font_size"].append(block.font_size)
+        for run in block.runs:
+            runs["paragraph"].append(paragraph_index)
+            runs["chars"].append(len(run.text))
+            runs["bold"].append(run.bold)
+            runs["italic"].append(run.italic)
+            runs["size"].append(run.size)
+            runs["font"].append(run.font)
+    
+    json.dump({"source": document.source, "paragraphs": paragraphs, "runs": runs, "tables": tables},
+              out, ensure_ascii=False, separators=(",", ":"))
+    out.write("\n")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze the structure of a .docx file")
+    parser.add_argument("docx_file", nargs="?", default="eduphilo-website-requirements.docx")
+    parser.add_argument("--summary", action="store_true",
+                        help="Print aggregate counters only, no per-paragraph output")
+    parser.add_argument("--format", choices=["text", "jsonl", "columnar"], default="text",
+                        help="jsonl: one record per block; columnar: per-field arrays")
+    parser.add_argument("-o", "--output", default="-",
+                        help="Where --summary/--format output goes (default: stdout)")
+    args = parser.parse_args(argv)
+    docx_file = args.docx_file
+    
+    # Parse once and share the result between analysis and extraction
+    try:
+        document = docx_ir.load_document(docx_file) if os.path.exists(docx_file) else None
+    except Exception as e:
+        print(f"Error reading file: {str(e)}")
+        return 1
+    
+    if args.summary or args.format != "text":
+        if document is None:
+            print(f"Error: File '{docx_file}' not found.")
+            return 1
+        if args.format == "text" and args.output == "-":
+            print_summary(summarize_document(document))
+            return 0
+        with open_output(args.output) as out:
+            if args.format == "jsonl":
+                write_jsonl(document, out)
+            elif args.format == "columnar":
+                write_columnar(document, out)
+            else:
+                # A summary written to a file is kept machine-readable
+                json.dump(summarize_document(document), out, ensure_ascii=False, indent=2)
+                out.write("\n")
+        return 0
     
     print("Starting deep analysis...")
-    content = deep_analyze_docx(docx_file)
+    content = deep_analyze_docx(docx_file, document)
     
     print(f"\n=== RAW TEXT EXTRACTION ===")
-    raw_text = extract_raw_text(docx_file)
+    raw_text = extract_raw_text(docx_file, document)
     
     if raw_text:
         print(f"Raw text length: {len(raw_text)} characters")
@@ -113,4 +339,4 @@ def main():
             print(f"  {i+1}. {item}")
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    sys.exit(main()) 
\ No newline at end of file
@@ -0,0 +1,445 @@
+import marshal
+from functools import lru_cache
+import sys
+import xml.etree.ElementTree as ET
+
+import docx_package
+import docx_styles
+from conversion_trace import NULL_TRACE
+from docx_package import w
+
+IR_MAGIC = b"DOCXIR"
+IR_VERSION = 6
+
+W_RPR = w("rPr")
+W_HEADER_REFERENCE = w("headerReference")
+W_FOOTER_REFERENCE = w("footerReference")
+R_ID = "{%s}id" % docx_package.R_NS
+R_EMBED = "{%s}embed" % docx_package.R_NS
+W_DRAWING = w("drawing")
+W_PICT = w("pict")
+WP_DOC_PR = "{http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing}docPr"
+A_BLIP = "{http://schemas.openxmlformats.org/drawingml/2006/main}blip"
+V_IMAGEDATA = "{urn:schemas-microsoft-com:vml}imagedata"
+
+_UNORDERED_FORMATS = ("bullet", "none")
+
+
+class Run:
+    """
+    A span of text with its direct character formatting
+
+    bold and italic are None when not set on the run itself; size is in
+    points and font is the run's ASCII font name.
+    """
+    __slots__ = ("text", "bold", "italic", "size", "font")
+
+    def __init__(self, text, bold=None, italic=None, size=None, font=None):
+        self.text = text
+        self.bold = bold
+        self.italic = italic
+        self.size = size
+        self.font = font
+
+
+class Paragraph:
+    """
+    A body paragraph: its full text, resolved style and runs
+
+    font_size is the size of the first run that sets one, otherwise the
+    effective size of the paragraph style. outline_level is the 0-based
+    outline level from the paragraph or its style, or None for body text.
+    images holds a (relationship id, alt text) pair per embedded picture.
+    """
+    __slots__ = ("text", "style_name", "runs", "font_size", "outline_level", "images")
+
+    def __init__(self, text, style_name, runs, font_size=None, outline_level=None, images=()):
+        self.text = text
+        self.style_name = style_name
+        self.runs = runs
+        self.font_size = font_size
+        self.outline_level = outline_level
+        self.images = images
+
+
+class Heading(Paragraph):
+    """
+    A paragraph whose style makes it a heading of the given level
+    """
+    __slots__ = ("level",)
+
+    def __init__(self, text, style_name, runs, level, font_size=None, outline_level=None, images=()):
+        Paragraph.__init__(self, text, style_name, runs, font_size, outline_level, images)
+        self.level = level
+
+
+class ListItem(Paragraph):
+    """
+    A paragraph with list numbering at the given indentation level
+
+    ordered is False for bullet lists and True for numbered ones.
+    """
+    __slots__ = ("level", "num_id", "ordered")
+
+    def __init__(self, text, style_name, runs, level, num_id, ordered, font_size=None, outline_level=None,
+                 images=()):
+        Paragraph.__init__(self, text, style_name, runs, font_size, outline_level, images)
+        self.level = level
+        self.num_id = num_id
+        self.ordered = ordered
+
+
+class Table:
+    """
+    A table as rows of cell text resolved onto its column grid
+
+    Merged cells repeat their text in every grid column they cover, like
+    python-docx ``row.cells``; merged_cells counts those repeated cells.
+    """
+    __slots__ = ("column_count", "rows", "merged_cells")
+
+    def __init__(self, column_count, rows, merged_cells=0):
+        self.column_count = column_count
+        self.rows = rows
+        self.merged_cells = merged_cells
+
+
+class DocumentIR:
+    """
+    Everything the converters and the analyzer read from a .docx file
+
+    blocks holds Paragraph, Heading, ListItem and Table objects in document
+    order. headers and footers hold, per section, the paragraph texts of
+    the primary header and footer, following links to previous sections.
+    """
+    __slots__ = ("source", "blocks", "style_names", "section_count", "headers", "footers")
+
+    def __init__(self, source, blocks, style_names, section_count, headers, footers):
+        self.source = source
+        self.blocks = blocks
+        self.style_names = style_names
+        self.section_count = section_count
+        self.headers = headers
+        self.footers = footers
+
+    @property
+    def paragraphs(self):
+        return [block for block in self.blocks if not isinstance(block, Table)]
+
+    @property
+    def tables(self):
+        return [block for block in self.blocks if isinstance(block, Table)]
+
+
+@lru_cache(maxsize=None)
+def heading_level(style_name):
+    """
+    Markdown heading level implied by a paragraph style name, or None
+    """
+    is_heading_name, heading_number = docx_styles.style_name_traits(style_name)
+    if not is_heading_name:
+        return None
+    if 'title' in style_name.lower():
+        return 1
+    return heading_number or 1
+
+
+def _toggle(r_pr, tag):
+    return docx_styles.toggle_value(r_pr.find(w(tag))) if r_pr is not None else None
+
+
+def _read_run(r):
+    r_pr = r.find(W_RPR)
+    size = docx_package.w_val(r_pr, "sz")
+    fonts = r_pr.find(w("rFonts")) if r_pr is not None else None
+    return Run(
+        docx_package.run_text(r),
+        _toggle(r_pr, "b"),
+        _toggle(r_pr, "i"),
+        int(size) / 2.0 if size else None,
+        fonts.get(w("ascii")) if fonts is not None else None,
+    )
+
+
+def _run_images(r):
+    # DrawingML pictures, plus VML ones from older documents
+    images = []
+    for child in r:
+        if child.tag == W_DRAWING:
+            doc_pr = next(child.iter(WP_DOC_PR), None)
+            alt = (doc_pr.get("descr") or doc_pr.get("title") or "") if doc_pr is not None else ""
+            for blip in child.iter(A_BLIP):
+                if blip.get(R_EMBED):
+                    images.append((blip.get(R_EMBED), alt))
+        elif child.tag == W_PICT:
+            for image_data in child.iter(V_IMAGEDATA):
+                if image_data.get(R_ID):
+                    images.append((image_data.get(R_ID), image_data.get("title") or ""))
+    return images
+
+
+class ParagraphReader:
+    """
+    Turn w:p elements into IR paragraphs using a document's styles and numbering
+    """
+    def __init__(self, package, relationships):
+        styles_root = docx_package.read_styles_part(package, relationships)
+        self.styles = docx_styles.StyleSheet(styles_root)
+        self.style_numbering = docx_package.paragraph_style_numbering(styles_root)
+        self.numbering_formats = docx_package.read_numbering_formats(package, relationships)
+        self.all_style_names = docx_package.all_style_names(styles_root)
+
+    def read(self, p):
+        """
+        Return the Paragraph, Heading or ListItem for a w:p element
+        """
+        run_elements = p.findall(docx_package.W_R)
+        runs = [_read_run(r) for r in run_elements]
+        text = "".join(run.text for run in runs)
+        images = ()
+        for r in run_elements:
+            if r.find(W_DRAWING) is not None or r.find(W_PICT) is not None:
+                images = tuple(image for r in run_elements for image in _run_images(r))
+                break
+        p_pr = p.find(docx_package.W_P_PR)
+        style_id = docx_package.w_val(p_pr, "pStyle")
+        style = self.styles.resolve(style_id)
+        style_name = style.name
+
+        # Run-level sizes override the style only where a run sets one
+        font_size = style.font_size
+        for run in runs:
+            if run.size:
+                font_size = run.size
+                break
+        outline_level = docx_package.w_val(p_pr, "outlineLvl")
+        if outline_level is None:
+            outline_level = style.outline_level
+        else:
+            outline_level = int(outline_level)
+            if outline_level == docx_styles.BODY_TEXT_OUTLINE_LEVEL:
+                outline_level = None
+
+        level = heading_level(style_name)
+        if level is not None:
+            return Heading(text, style_name, runs, level, font_size, outline_level, images)
+
+        numbering = self._numbering(p_pr, style_id)
+        if numbering is not None:
+            num_id, ilvl = numbering
+            fmt = self.numbering_formats.get(num_id, {}).get(ilvl, "bullet")
+            return ListItem(text, style_name, runs, ilvl, num_id, fmt not in _UNORDERED_FORMATS,
+                            font_size, outline_level, images)
+
+        return Paragraph(text, style_name, runs, font_size, outline_level, images)
+
+    def _numbering(self, p_pr, style_id):
+        num_pr = p_pr.find(docx_package.W_NUM_PR) if p_pr is not None else None
+        if num_pr is None:
+            return self.style_numbering.get(style_id)
+        num_id = docx_package.w_val(num_pr, "numId")
+        if not num_id or num_id == "0":
+            # numId 0 explicitly removes numbering inherited from the style
+            return None
+        ilvl = docx_package.w_val(num_pr, "ilvl")
+        return num_id, int(ilvl) if ilvl else 0
+
+
+def _story_texts(package, part_name, cache):
+    if part_name not in cache:
+        try:
+            root = ET.fromstring(package.read(part_name))
+            cache[part_name] = [docx_package.paragraph_text(p) for p in root.iterfind(docx_package.W_P)]
+        except KeyError:
+            cache[part_name] = []
+    return cache[part_name]
+
+
+def _resolve_stories(package, relationships, section_refs):
+    # Sections without their own primary header or footer use the previous one
+    cache = {}
+    resolved = []
+    previous = []
+    for rel_id in section_refs:
+        if rel_id in relationships:
+            previous = _story_texts(package, relationships[rel_id][1], cache)
+        resolved.append(previous)
+    return resolved
+
+
+def _primary_reference(sect_pr, tag):
+    for reference in sect_pr.iterfind(tag):
+        if reference.get(w("type")) == "default":
+            return reference.get(R_ID)
+    return None
+
+
+def section_references(sect_pr):
+    """
+    Relationship ids of a section's primary header and footer, or None
+    """
+    return (_primary_reference(sect_pr, W_HEADER_REFERENCE),
+            _primary_reference(sect_pr, W_FOOTER_REFERENCE))
+
+
+def assemble_document(package, relationships, source, blocks, style_names, sections):
+    """
+    Build a DocumentIR from parsed blocks and (header, footer) section references
+    """
+    headers = _resolve_stories(package, relationships, [header for header, _ in sections])
+    footers = _resolve_stories(package, relationships, [footer for _, footer in sections])
+    return DocumentIR(str(source), blocks, style_names, len(sections), headers, footers)
+
+
+def iter_blocks(events, reader, add_section=None):
+    """
+    Turn docx_package.iter_body events into IR blocks
+
+    add_section, if given, is called with each w:sectPr in document order.
+    """
+    grid = None
+    rows = None
+    for event, value in events:
+        if event == "paragraph":
+            yield reader.read(value)
+            if add_section is not None:
+                p_pr = value.find(docx_package.W_P_PR)
+                if p_pr is not None and p_pr.find(docx_package.W_SECT_PR) is not None:
+                    add_section(p_pr.find(docx_package.W_SECT_PR))
+        elif event == "table":
+            grid = docx_package.TableGrid(value)
+            rows = []
+        elif event == "row":
+            rows.append(grid.add_row(value))
+        elif event == "end_table":
+            yield Table(grid.column_count, rows, grid.merged_cells)
+        elif event == "section" and add_section is not None:
+            add_section(value)
+
+
+def build_document(docx_path, trace=NULL_TRACE):
+    """
+    Parse a .docx file once into a DocumentIR
+
+    trace gets "package" (relationships, styles, numbering), "body" and
+    "stories" (headers and footers) stages plus block counters.
+    """
+    with docx_package.open_package(docx_path) as package:
+        with trace.stage("package"):
+            document_part = docx_package.find_document_part(package)
+            relationships = docx_package.read_relationships(package, document_part)
+            reader = ParagraphReader(package, relationships)
+
+        sections = []
+
+        def add_section(sect_pr):
+            sections.append(section_references(sect_pr))
+
+        with trace.stage("body"):
+            events = docx_package.iter_body(package, document_part)
+            blocks = list(iter_blocks(events, reader, add_section))
+        trace.count("blocks", len(blocks))
+        trace.count("table_rows", sum(len(block.rows) for block in blocks if isinstance(block, Table)))
+
+        with trace.stage("stories"):
+            return assemble_document(package, relationships, docx_path, blocks,
+                                     reader.all_style_names, sections)
+
+
+_PARAGRAPH, _HEADING, _LIST_ITEM, _TABLE = range(4)
+
+
+def _encode_block(block):
+    if isinstance(block, Table):
+        return (_TABLE, block.column_count, block.rows, block.merged_cells)
+    runs = [(run.text, run.bold, run.italic, run.size, run.font) for run in block.runs]
+    common = (block.text, block.style_name, runs, block.font_size, block.outline_level, block.images)
+    if isinstance(block, Heading):
+        return (_HEADING,) + common + (block.level,)
+    if isinstance(block, ListItem):
+        return (_LIST_ITEM,) + common + (block.level, block.num_id, block.ordered)
+    return (_PARAGRAPH,) + common
+
+
+def _decode_block(data):
+    kind = data[0]
+    if kind == _TABLE:
+        return Table(data[1], data[2], data[3])
+    text, style_name, runs, font_size, outline_level, images = data[1:7]
+    runs = [Run(*run) for run in runs]
+    if kind == _HEADING:
+        return Heading(text, style_name, runs, data[7], font_size, outline_level, images)
+    if kind == _LIST_ITEM:
+        return ListItem(text, style_name, runs, data[7], data[8], data[9], font_size, outline_level, images)
+    return Paragraph(text, style_name, runs, font_size, outline_level, images)
+
+
+def save_ir(document, ir_path):
+    """
+    Write a DocumentIR to a compact binary file
+
+    The IR is stored as plain tuples with marshal, which is fast, shares
+    repeated strings such as style names, and never executes code on load.
+    """
+    payload = (
+        document.source,
+        [_encode_block(block) for block in document.blocks],
+        document.style_names,
+        document.section_count,
+        document.headers,
+        document.footers,
+    )
+    with open(ir_path, "wb") as f:
+        f.write(IR_MAGIC + bytes([IR_VERSION]))
+        marshal.dump(payload, f)
+
+
+def is_ir_file(path):
+    """
+    True if path is a DocumentIR file written by save_ir
+    """
+    try:
+        with open(path, "rb") as f:
+            return f.read(len(IR_MAGIC)) == IR_MAGIC
+    except OSError:
+        return False
+
+
+def load_ir(ir_path):
+    """
+    Read a DocumentIR written by save_ir
+    """
+    with open(ir_path, "rb") as f:
+        header = f.read(len(IR_MAGIC) + 1)
+        if header[:len(IR_MAGIC)] != IR_MAGIC:
+            raise ValueError(f"'{ir_path}' is not a document IR file")
+        if header[len(IR_MAGIC)] != IR_VERSION:
+            raise ValueError(f"'{ir_path}' uses IR version {header[len(IR_MAGIC)]}, expected {IR_VERSION}")
+        source, blocks, style_names, section_count, headers, footers = marshal.load(f)
+    return DocumentIR(source, [_decode_block(block) for block in blocks], style_names,
+                      section_count, headers, footers)
+
+
+def load_document(path, trace=NULL_TRACE):
+    """
+    Return the DocumentIR for a .docx file or a saved IR file
+    """
+    if is_ir_file(path):
+        with trace.stage("ir"):
+            return load_ir(path)
+    return build_document(path, trace)
+
+
+def main():
+    if len(sys.argv) != 3:
+        print("Usage: python docx_ir.py <input.docx> <output.ir>")
+        return 1
+
+    document = build_document(sys.argv[1])
+    save_ir(document, sys.argv[2])
+    print(f"Saved {len(document.blocks)} blocks to '{sys.argv[2]}'")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
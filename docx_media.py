@@ -0,0 +1,162 @@
+import contextlib
+import hashlib
+import os
+import posixpath
+import zipfile
+from urllib.parse import quote
+
+import docx_package
+
+COPY_CHUNK_SIZE = 1024 * 1024
+NAME_HASH_LENGTH = 20
+
+_stores = {}
+
+
+class MediaStore:
+    """
+    Directory of extracted media files named by a hash of their content
+
+    The same picture embedded in any number of documents is stored once.
+    Members are streamed out of the zip without being decoded: a first
+    read hashes the bytes and only content not stored yet is read again
+    and copied. Files appear under their final name atomically, so worker
+    processes sharing a store never see partial files or clobber each
+    other.
+    """
+    def __init__(self, media_dir):
+        self.media_dir = os.path.abspath(media_dir)
+        self.known = set()
+        self.stored = 0
+        self.reused = 0
+
+    def add_member(self, package, part_name):
+        """
+        Store a zip member and return the absolute path of the stored file
+        """
+        digest = hashlib.sha256()
+        with package.open(part_name) as source:
+            for chunk in iter(lambda: source.read(COPY_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        extension = posixpath.splitext(part_name)[1].lower()
+        name = digest.hexdigest()[:NAME_HASH_LENGTH] + extension
+        path = os.path.join(self.media_dir, name)
+        if name in self.known or os.path.exists(path):
+            self.known.add(name)
+            self.reused += 1
+            return path
+
+        os.makedirs(self.media_dir, exist_ok=True)
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with package.open(part_name) as source, open(temp_path, "wb") as target:
+                for chunk in iter(lambda: source.read(COPY_CHUNK_SIZE), b""):
+                    target.write(chunk)
+            os.replace(temp_path, path)
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.remove(temp_path)
+            raise
+        self.known.add(name)
+        self.stored += 1
+        return path
+
+
+def media_store(media_dir):
+    """
+    The process-wide MediaStore for a directory, shared by every document
+    """
+    key = os.path.abspath(media_dir)
+    store = _stores.get(key)
+    if store is None:
+        store = _stores[key] = MediaStore(key)
+    return store
+
+
+def _alt_text(text):
+    return text.replace("\\", "\\\\").replace("[", "\\[").replace("]", "\\]").replace("\n", " ")
+
+
+class DocumentMedia:
+    """
+    Images of one document, extracted on first use and linked from its Markdown
+
+    Nothing is opened until a paragraph with a picture is rendered, so a
+    document without pictures costs nothing. Links are relative to the
+    directory of output_path. Pictures that cannot be resolved, such as
+    external links or documents loaded from a saved IR, are left out.
+    """
+    def __init__(self, docx_path, output_path, store):
+        self.docx_path = docx_path
+        self.output_dir = os.path.dirname(os.path.abspath(output_path))
+        self.store = store
+        self.package = None
+        self.relationships = None
+        self.links = {}
+
+    def _open(self):
+        if self.package is None:
+            try:
+                self.package = docx_package.open_package(self.docx_path)
+                document_part = docx_package.find_document_part(self.package)
+                self.relationships = docx_package.read_relationships(self.package, document_part)
+            except (OSError, zipfile.BadZipFile):
+                self.package = False
+                self.relationships = {}
+        return self.package
+
+    def link(self, rel_id):
+        """
+        Relative URL of the stored picture for a relationship id, or None
+        """
+        if rel_id in self.links:
+            return self.links[rel_id]
+        link = None
+        if self._open():
+            target = self.relationships.get(rel_id)
+            if target is not None and target[1] in self.package.NameToInfo:
+                path = self.store.add_member(self.package, target[1])
+                link = quote(os.path.relpath(path, self.output_dir).replace(os.sep, "/"))
+        self.links[rel_id] = link
+        return link
+
+    def markdown(self, paragraph):
+        """
+        Markdown image references for a paragraph's pictures, or ""
+        """
+        if not paragraph.images:
+            return ""
+        references = []
+        for rel_id, alt in paragraph.images:
+            link = self.link(rel_id)
+            if link is not None:
+                references.append(f"![{_alt_text(alt)}]({link})")
+        return " ".join(references)
+
+    def close(self):
+        if self.package:
+            self.package.close()
+        self.package = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        return False
+
+
+def document_media(docx_path, output_path, media_dir):
+    """
+    A DocumentMedia context for a conversion, or a no-op one without media_dir
+    """
+    if not media_dir:
+        return contextlib.nullcontext()
+    return DocumentMedia(docx_path, output_path, media_store(media_dir))
+
+
+def with_images(line, images):
+    """
+    A rendered line followed by its paragraph's image references, if any
+    """
+    return f"{line} {images}" if images else line
@@ -0,0 +1,368 @@
+import posixpath
+import zipfile
+import xml.etree.ElementTree as ET
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+R_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+
+RT_OFFICE_DOCUMENT = R_NS + "/officeDocument"
+RT_STYLES = R_NS + "/styles"
+RT_NUMBERING = R_NS + "/numbering"
+
+DEFAULT_DOCUMENT_PART = "word/document.xml"
+
+
+def w(tag):
+    """
+    Return the Clark-notation name of a WordprocessingML tag
+    """
+    return "{%s}%s" % (W_NS, tag)
+
+
+def w_val(element, tag):
+    """
+    Return the w:val attribute of the first *tag* child of element, or None
+    """
+    if element is None:
+        return None
+    child = element.find(w(tag))
+    if child is None:
+        return None
+    return child.get(w("val"))
+
+
+W_BODY = w("body")
+W_P = w("p")
+W_R = w("r")
+W_T = w("t")
+W_TAB = w("tab")
+W_BR = w("br")
+W_CR = w("cr")
+W_TBL = w("tbl")
+W_TBL_GRID = w("tblGrid")
+W_GRID_COL = w("gridCol")
+W_TR = w("tr")
+W_TC = w("tc")
+W_TC_PR = w("tcPr")
+W_TR_PR = w("trPr")
+W_P_PR = w("pPr")
+W_VAL = w("val")
+W_STYLE = w("style")
+W_STYLE_ID = w("styleId")
+W_TYPE = w("type")
+W_DEFAULT = w("default")
+W_SECT_PR = w("sectPr")
+W_NUM_PR = w("numPr")
+
+_ON_VALUES = ("1", "true", "on")
+
+# The built-in styles python-docx reports under a different UI name
+_UI_STYLE_NAMES = {
+    "caption": "Caption",
+    "footer": "Footer",
+    "header": "Header",
+    "heading 1": "Heading 1",
+    "heading 2": "Heading 2",
+    "heading 3": "Heading 3",
+    "heading 4": "Heading 4",
+    "heading 5": "Heading 5",
+    "heading 6": "Heading 6",
+    "heading 7": "Heading 7",
+    "heading 8": "Heading 8",
+    "heading 9": "Heading 9",
+}
+
+_RUN_BREAKS = (W_BR, W_CR)
+
+
+def open_package(docx_path):
+    """
+    Open a .docx file as a zip package
+    """
+    return zipfile.ZipFile(docx_path)
+
+
+def _rels_name(part_name):
+    directory, file_name = posixpath.split(part_name)
+    return posixpath.join(directory, "_rels", file_name + ".rels")
+
+
+def read_relationships(package, part_name=""):
+    """
+    Map relationship ids of a part to (type, target part name) pairs
+
+    An empty part_name reads the package-level relationships.
+    """
+    rels_name = "_rels/.rels" if not part_name else _rels_name(part_name)
+    try:
+        data = package.read(rels_name)
+    except KeyError:
+        return {}
+
+    base_dir = posixpath.dirname(part_name)
+    relationships = {}
+    for rel in ET.fromstring(data).iter("{%s}Relationship" % PKG_REL_NS):
+        if rel.get("TargetMode") == "External":
+            continue
+        target = rel.get("Target", "")
+        if target.startswith("/"):
+            target = target[1:]
+        else:
+            target = posixpath.normpath(posixpath.join(base_dir, target))
+        relationships[rel.get("Id")] = (rel.get("Type"), target)
+    return relationships
+
+
+def find_document_part(package):
+    """
+    Return the name of the main document part of the package
+    """
+    for rel_type, target in read_relationships(package).values():
+        if rel_type == RT_OFFICE_DOCUMENT:
+            return target
+    return DEFAULT_DOCUMENT_PART
+
+
+def find_related_part(relationships, rel_type):
+    """
+    Return the target of the first relationship of rel_type, or None
+    """
+    for candidate_type, target in relationships.values():
+        if candidate_type == rel_type:
+            return target
+    return None
+
+
+def read_styles_part(package, relationships):
+    """
+    Parse the styles part related to a document part, or return None
+    """
+    styles_part = find_related_part(relationships, RT_STYLES)
+    if styles_part is None:
+        return None
+    try:
+        return ET.fromstring(package.read(styles_part))
+    except KeyError:
+        return None
+
+
+def ui_style_name(name):
+    """
+    Map an internal style name such as 'heading 1' to its UI name
+    """
+    return _UI_STYLE_NAMES.get(name, name)
+
+
+def all_style_names(styles_root):
+    """
+    UI names of every style defined in the styles part, in document order
+    """
+    if styles_root is None:
+        return []
+    return [ui_style_name(w_val(style, "name") or "") for style in styles_root.iter(W_STYLE)]
+
+
+def paragraph_style_numbering(styles_root):
+    """
+    Map paragraph style ids to the (num_id, ilvl) list numbering they apply
+    """
+    numbering = {}
+    if styles_root is None:
+        return numbering
+
+    for style in styles_root.iter(W_STYLE):
+        if style.get(W_TYPE) != "paragraph":
+            continue
+        num_pr = style.find(W_P_PR + "/" + W_NUM_PR)
+        if num_pr is None:
+            continue
+        num_id = w_val(num_pr, "numId")
+        if num_id and num_id != "0":
+            ilvl = w_val(num_pr, "ilvl")
+            numbering[style.get(W_STYLE_ID)] = (num_id, int(ilvl) if ilvl else 0)
+    return numbering
+
+
+def read_numbering_formats(package, relationships):
+    """
+    Map numbering ids to {ilvl: numFmt} from the numbering part
+    """
+    numbering_part = find_related_part(relationships, RT_NUMBERING)
+    if numbering_part is None:
+        return {}
+    try:
+        root = ET.fromstring(package.read(numbering_part))
+    except KeyError:
+        return {}
+
+    def level_formats(parent):
+        formats = {}
+        for lvl in parent.iter(w("lvl")):
+            fmt = w_val(lvl, "numFmt")
+            if fmt is not None:
+                formats[int(lvl.get(w("ilvl"), "0"))] = fmt
+        return formats
+
+    abstract_formats = {
+        abstract.get(w("abstractNumId")): level_formats(abstract)
+        for abstract in root.iterfind(w("abstractNum"))
+    }
+    formats = {}
+    for num in root.iterfind(w("num")):
+        merged = dict(abstract_formats.get(w_val(num, "abstractNumId"), {}))
+        for override in num.iterfind(w("lvlOverride")):
+            merged.update(level_formats(override))
+        formats[num.get(w("numId"))] = merged
+    return formats
+
+
+def run_text(r):
+    """
+    Text of a w:r element, translating tabs and breaks like python-docx
+    """
+    parts = []
+    for child in r:
+        tag = child.tag
+        if tag == W_T:
+            if child.text:
+                parts.append(child.text)
+        elif tag == W_TAB:
+            parts.append("\t")
+        elif tag in _RUN_BREAKS:
+            parts.append("\n")
+    return "".join(parts)
+
+
+def paragraph_text(p):
+    """
+    Text of the direct runs of a w:p element, matching ``paragraph.text``
+    """
+    return "".join(run_text(r) for r in p.iterfind(W_R))
+
+
+def cell_text(tc):
+    """
+    Text of a w:tc element, matching ``cell.text``
+    """
+    return "\n".join(paragraph_text(p) for p in tc.iterfind(W_P))
+
+
+def cell_span(tc):
+    """
+    Return (grid_span, is_vertical_continuation) for a w:tc element
+    """
+    tc_pr = tc.find(W_TC_PR)
+    if tc_pr is None:
+        return 1, False
+    span = w_val(tc_pr, "gridSpan")
+    v_merge = tc_pr.find(w("vMerge"))
+    continuation = v_merge is not None and v_merge.get(W_VAL, "continue") == "continue"
+    return (int(span) if span else 1), continuation
+
+
+class TableGrid:
+    """
+    Resolve a stream of w:tr elements into rows on the table's column grid
+
+    Horizontally merged cells (gridSpan) repeat their text across the
+    columns they cover and vertically merged cells (vMerge) repeat the text
+    of the cell above, matching python-docx ``row.cells``. merged_cells
+    counts the grid cells filled by such repeats. The grid is resolved row
+    by row against the previous row only, and each w:tc is read exactly
+    once, so cost is linear in the size of the table.
+    """
+    def __init__(self, column_count):
+        self.column_count = column_count
+        self.above = []
+        self.row_count = 0
+        self.merged_cells = 0
+
+    def add_row(self, tr):
+        """
+        Return the cell texts of a w:tr element, one per grid column
+        """
+        row = []
+        tr_pr = tr.find(W_TR_PR)
+        grid_before = w_val(tr_pr, "gridBefore")
+        grid_after = w_val(tr_pr, "gridAfter")
+        if grid_before:
+            row.extend([""] * int(grid_before))
+
+        above = self.above
+        for tc in tr.iterfind(W_TC):
+            span, continuation = cell_span(tc)
+            if continuation:
+                for _ in range(span):
+                    column = len(row)
+                    row.append(above[column] if column < len(above) else "")
+                self.merged_cells += span
+            else:
+                text = cell_text(tc)
+                row.extend([text] * span)
+                self.merged_cells += span - 1
+
+        if grid_after:
+            row.extend([""] * int(grid_after))
+        if len(row) < self.column_count:
+            row.extend([""] * (self.column_count - len(row)))
+        elif len(row) > self.column_count:
+            # Rows wider than w:tblGrid widen the grid for the rows below
+            self.column_count = len(row)
+
+        self.above = row
+        self.row_count += 1
+        return row
+
+
+def iter_body(package, part_name):
+    """
+    Stream the top-level block content of a document part
+
+    Yields ("paragraph", p), ("table", column_count), ("row", tr),
+    ("end_table", None) and ("section", sectPr) events in document order. Elements are only valid
+    while the consumer handles the event; they are cleared afterwards so
+    memory stays flat regardless of document size.
+    """
+    with package.open(part_name) as stream:
+        yield from iter_body_stream(stream)
+
+
+def iter_body_stream(stream):
+    """
+    iter_body over an already open binary stream of document XML
+    """
+    stack = []
+    table_started = False
+
+    for event, elem in ET.iterparse(stream, events=("start", "end")):
+        if event == "start":
+            stack.append(elem)
+            continue
+
+        stack.pop()
+        depth = len(stack)
+        if depth < 2 or stack[1].tag != W_BODY:
+            continue
+
+        if depth == 2:
+            if elem.tag == W_P:
+                yield "paragraph", elem
+            elif elem.tag == W_TBL:
+                if not table_started:
+                    yield "table", 0
+                yield "end_table", None
+                table_started = False
+            elif elem.tag == W_SECT_PR:
+                yield "section", elem
+            stack[1].remove(elem)
+        elif depth == 3 and stack[2].tag == W_TBL:
+            if elem.tag == W_TBL_GRID:
+                table_started = True
+                yield "table", len(elem.findall(W_GRID_COL))
+            elif elem.tag == W_TR:
+                if not table_started:
+                    table_started = True
+                    yield "table", 0
+                yield "row", elem
+                stack[2].remove(elem)
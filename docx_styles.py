@@ -0,0 +1,141 @@
+import re
+from functools import lru_cache
+
+import docx_package
+from docx_package import w, w_val
+
+W_BASED_ON = w("basedOn")
+W_RPR = w("rPr")
+W_DOC_DEFAULTS = w("docDefaults")
+
+# outlineLvl 9 marks body text; 0-8 are heading levels 1-9
+BODY_TEXT_OUTLINE_LEVEL = 9
+MAX_STYLE_DEPTH = 32
+
+_HEADING_NUMBER = re.compile(r"heading ([1-6])")
+_OFF_VALUES = ("0", "false", "off")
+
+
+class ResolvedStyle:
+    """
+    Effective formatting of a paragraph style after following basedOn
+
+    font_size is in points, outline_level is 0-based (None for body text)
+    and any of them may be None when nothing in the chain sets it.
+    """
+    __slots__ = ("style_id", "name", "font_size", "bold", "outline_level")
+
+    def __init__(self, style_id, name, font_size, bold, outline_level):
+        self.style_id = style_id
+        self.name = name
+        self.font_size = font_size
+        self.bold = bold
+        self.outline_level = outline_level
+
+
+def toggle_value(element):
+    """
+    Value of an on/off property element such as w:b, or None if absent
+    """
+    if element is None:
+        return None
+    return element.get(docx_package.W_VAL) not in _OFF_VALUES
+
+
+def _direct_properties(style):
+    r_pr = style.find(W_RPR)
+    p_pr = style.find(docx_package.W_P_PR)
+    size = w_val(r_pr, "sz")
+    outline = w_val(p_pr, "outlineLvl")
+    return (
+        int(size) / 2.0 if size else None,
+        toggle_value(r_pr.find(w("b"))) if r_pr is not None else None,
+        int(outline) if outline is not None else None,
+    )
+
+
+class StyleSheet:
+    """
+    Effective paragraph style properties, resolved once per style id
+
+    Each style's chain of basedOn parents is walked the first time it is
+    asked for and the result is memoized, so lookups per paragraph are O(1).
+    """
+    def __init__(self, styles_root):
+        self._styles = {}
+        self._resolved = {}
+        self.default_style_id = None
+        self.default_font_size = None
+        self.default_bold = None
+
+        if styles_root is None:
+            return
+
+        defaults = styles_root.find(W_DOC_DEFAULTS)
+        if defaults is not None:
+            r_pr = defaults.find(w("rPrDefault") + "/" + W_RPR)
+            if r_pr is not None:
+                size = w_val(r_pr, "sz")
+                self.default_font_size = int(size) / 2.0 if size else None
+                self.default_bold = toggle_value(r_pr.find(w("b")))
+
+        for style in styles_root.iter(docx_package.W_STYLE):
+            if style.get(docx_package.W_TYPE) != "paragraph":
+                continue
+            style_id = style.get(docx_package.W_STYLE_ID)
+            name = docx_package.ui_style_name(w_val(style, "name") or "")
+            self._styles[style_id] = (name, w_val(style, "basedOn"), _direct_properties(style))
+            if style.get(docx_package.W_DEFAULT) in ("1", "true", "on"):
+                self.default_style_id = style_id
+
+    def resolve(self, style_id):
+        """
+        Return the ResolvedStyle for a paragraph style id
+
+        Unknown ids fall back to the default paragraph style, as Word does.
+        """
+        if style_id not in self._styles:
+            style_id = self.default_style_id
+        resolved = self._resolved.get(style_id)
+        if resolved is None:
+            resolved = self._resolve(style_id)
+            self._resolved[style_id] = resolved
+        return resolved
+
+    def _resolve(self, style_id):
+        name = self._styles[style_id][0] if style_id in self._styles else "Normal"
+        font_size = bold = outline_level = None
+
+        seen = set()
+        current = style_id
+        while current in self._styles and current not in seen and len(seen) < MAX_STYLE_DEPTH:
+            seen.add(current)
+            _, based_on, (size, is_bold, outline) = self._styles[current]
+            if font_size is None:
+                font_size = size
+            if bold is None:
+                bold = is_bold
+            if outline_level is None:
+                outline_level = outline
+            current = based_on
+
+        if font_size is None:
+            font_size = self.default_font_size
+        if bold is None:
+            bold = self.default_bold
+        if outline_level == BODY_TEXT_OUTLINE_LEVEL:
+            outline_level = None
+        return ResolvedStyle(style_id, name, font_size, bold, outline_level)
+
+
+@lru_cache(maxsize=None)
+def style_name_traits(style_name):
+    """
+    Return (is_heading_name, heading_number) for a style name
+
+    is_heading_name is True for names containing 'heading' or 'title';
+    heading_number is the N of a 'heading N' name (1-6) or None.
+    """
+    lowered = style_name.lower()
+    match = _HEADING_NUMBER.search(lowered)
+    return ('heading' in lowered or 'title' in lowered), (int(match.group(1)) if match else None)
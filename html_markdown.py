@@ -0,0 +1,299 @@
+import io
+from html.parser import HTMLParser
+
+FEED_CHUNK_SIZE = 64 * 1024
+
+HEADING_TAGS = {"h1": 1, "h2": 2, "h3": 3, "h4": 4, "h5": 5, "h6": 6}
+EMPHASIS_MARKERS = {"strong": "**", "b": "**", "em": "*", "i": "*"}
+LIST_BULLETS = ('•', '-', '*', '1.', '2.', '3.', '4.', '5.', '6.', '7.', '8.', '9.')
+
+class MarkdownText(str):
+    """
+    Extracted content that is already Markdown and must be written as is
+    """
+    __slots__ = ()
+
+def plain_line_markdown(line):
+    """
+    Guess the Markdown for one stripped line of plain text
+    """
+    if line.isupper() and len(line) < 100:
+        return f"# {line}"
+    elif line.endswith(':') and len(line) < 100:
+        return f"## {line}"
+    elif line.startswith(LIST_BULLETS):
+        return line.replace('•', '-').replace('*', '-')
+    return line
+
+def _cell_text(text):
+    return " ".join(text.split()).replace("|", "\\|") or " "
+
+class MarkdownHTMLParser(HTMLParser):
+    """
+    Incremental HTML to Markdown conversion driven by tag events
+
+    Handles the HTML Mammoth produces: paragraphs, headings, nested lists,
+    tables with colspan/rowspan, emphasis, links and line breaks. Each
+    block is handed to write_line as soon as its closing tag is seen, so
+    only the block currently being read is held in memory.
+    """
+    def __init__(self, write_line):
+        super().__init__(convert_charrefs=True)
+        self.write_line = write_line
+        # Nothing written yet counts as a blank line, so output never starts with one
+        self.last_blank = True
+        self.pieces = []
+        self.heading_level = None
+        self.lists = []
+        self.item_open = False
+        self.links = []
+        self.table_rows = None
+        self.row = None
+        self.cell = None
+        self.column = 0
+        self.spans_below = {}
+        self.skip_depth = 0
+
+    def feed_all(self, html, chunk_size=FEED_CHUNK_SIZE):
+        """
+        Feed a whole HTML string in fixed-size chunks and flush the parser
+        """
+        for start in range(0, len(html), chunk_size):
+            self.feed(html[start:start + chunk_size])
+        self.close()
+        self._flush_item()
+
+    def _write(self, line):
+        # Blocks end with a blank line; never write two in a row
+        if not line and self.last_blank:
+            return
+        self.last_blank = not line
+        self.write_line(line)
+
+    def _take_text(self):
+        text = "".join(self.pieces)
+        self.pieces = []
+        return text
+
+    def _flush_item(self):
+        # List item text is written when a nested list starts or the item ends
+        if not self.item_open:
+            return
+        self.item_open = False
+        text = " ".join(self._take_text().split())
+        if text:
+            depth = len(self.lists) - 1
+            if self.lists[-1] == "ol":
+                self._write("   " * depth + "1. " + text)
+            else:
+                self._write("  " * depth + "- " + text)
+
+    def _flush_paragraph(self):
+        text = self._take_text()
+        if self.heading_level:
+            text = " ".join(text.split())
+            if text:
+                self._write("#" * self.heading_level + " " + text)
+                self._write("")
+            return
+        wrote = False
+        for line in text.split("\n"):
+            line = line.strip()
+            if line:
+                self._write(plain_line_markdown(line))
+                wrote = True
+        if wrote:
+            self._write("")
+
+    def _close_marker(self, marker):
+        if self.pieces and self.pieces[-1] == marker:
+            # Nothing between the markers, drop both
+            self.pieces.pop()
+            return
+        # Keep trailing whitespace outside the emphasis
+        trailing = ""
+        if self.pieces:
+            last = self.pieces.pop()
+            stripped = last.rstrip()
+            trailing = last[len(stripped):]
+            if stripped:
+                self.pieces.append(stripped)
+        self.pieces.append(marker)
+        if trailing:
+            self.pieces.append(trailing)
+
+    def _fill_spans(self):
+        # Repeat rowspan cells from the rows above into the columns they cover
+        while self.column in self.spans_below:
+            text, remaining = self.spans_below[self.column]
+            self.row.append(text)
+            if remaining > 1:
+                self.spans_below[self.column] = (text, remaining - 1)
+            else:
+                del self.spans_below[self.column]
+            self.column += 1
+
+    def _write_table(self):
+        rows = self.table_rows
+        self.table_rows = None
+        self.spans_below = {}
+        if not rows:
+            return
+        width = max(len(row) for row in rows)
+        self._write("")
+        for row_idx, row in enumerate(rows):
+            row = row + [" "] * (width - len(row))
+            self._write("| " + " | ".join(row) + " |")
+            if row_idx == 0:
+                self._write("| " + " | ".join(["---"] * width) + " |")
+        self._write("")
+
+    def handle_starttag(self, tag, attrs):
+        if self.skip_depth:
+            if tag in ("script", "style"):
+                self.skip_depth += 1
+            return
+        if tag in ("script", "style"):
+            self.skip_depth = 1
+        elif tag in HEADING_TAGS and self.cell is None and not self.item_open:
+            self.pieces = []
+            self.heading_level = HEADING_TAGS[tag]
+        elif tag == "p" or tag in HEADING_TAGS:
+            if self.cell is None and not self.item_open:
+                self.pieces = []
+            elif self.pieces:
+                self.pieces.append(" ")
+        elif tag in ("ul", "ol"):
+            self._flush_item()
+            self.lists.append(tag)
+        elif tag == "li":
+            self._flush_item()
+            self.pieces = []
+            self.item_open = True
+        elif tag == "table":
+            self.table_rows = []
+        elif tag == "tr" and self.table_rows is not None:
+            self.row = []
+            self.column = 0
+        elif tag in ("td", "th") and self.row is not None:
+            self._fill_spans()
+            attributes = dict(attrs)
+            self.cell = (int(attributes.get("colspan") or 1), int(attributes.get("rowspan") or 1))
+            self.pieces = []
+        elif tag in EMPHASIS_MARKERS:
+            self.pieces.append(EMPHASIS_MARKERS[tag])
+        elif tag == "a":
+            href = dict(attrs).get("href")
+            self.links.append(href)
+            if href and not href.startswith("#"):
+                self.pieces.append("[")
+        elif tag == "br":
+            self.pieces.append(" " if self.cell is not None else "\n")
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+
+    def handle_endtag(self, tag):
+        if self.skip_depth:
+            if tag in ("script", "style"):
+                self.skip_depth -= 1
+            return
+        if tag in HEADING_TAGS and self.heading_level:
+            self._flush_paragraph()
+            self.heading_level = None
+        elif tag == "p" or tag in HEADING_TAGS:
+            if self.cell is None and not self.item_open:
+                self._flush_paragraph()
+        elif tag == "li":
+            self._flush_item()
+        elif tag in ("ul", "ol"):
+            self._flush_item()
+            if self.lists:
+                self.lists.pop()
+            if not self.lists:
+                self._write("")
+        elif tag in ("td", "th") and self.cell is not None:
+            colspan, rowspan = self.cell
+            text = _cell_text(self._take_text())
+            for _ in range(colspan):
+                self.row.append(text)
+                if rowspan > 1:
+                    self.spans_below[self.column] = (text, rowspan - 1)
+                self.column += 1
+            self.cell = None
+        elif tag == "tr" and self.row is not None:
+            self._fill_spans()
+            self.table_rows.append(self.row)
+            self.row = None
+        elif tag == "table":
+            self._write_table()
+        elif tag in EMPHASIS_MARKERS:
+            self._close_marker(EMPHASIS_MARKERS[tag])
+        elif tag == "a" and self.links:
+            href = self.links.pop()
+            if href and not href.startswith("#"):
+                self.pieces.append(f"]({href})")
+
+    def handle_data(self, data):
+        if not self.skip_depth:
+            self.pieces.append(data)
+
+def write_html_markdown(html, write_line, chunk_size=FEED_CHUNK_SIZE):
+    """
+    Stream the Markdown for an HTML string into write_line, one line at a time
+
+    Trailing blank lines are dropped, so joining the lines with newlines
+    gives html_to_markdown(html).
+    """
+    blank_lines = 0
+
+    def emit(line):
+        nonlocal blank_lines
+        # Blank lines are held back until more content follows them
+        if not line:
+            blank_lines += 1
+            return
+        for _ in range(blank_lines):
+            write_line("")
+        blank_lines = 0
+        write_line(line)
+
+    MarkdownHTMLParser(emit).feed_all(html, chunk_size)
+
+def html_to_markdown(html, chunk_size=FEED_CHUNK_SIZE):
+    """
+    Convert an HTML string to MarkdownText in one streaming pass
+    """
+    buffer = io.StringIO()
+
+    def write_line(line):
+        if buffer.tell():
+            buffer.write("\n")
+        buffer.write(line)
+
+    write_html_markdown(html, write_line, chunk_size)
+    return MarkdownText(buffer.getvalue())
+
+class HTMLMarkdown:
+    """
+    HTML whose Markdown is generated while it is written
+
+    The Mammoth backend returns this instead of a Markdown string: only
+    the HTML is held, write_to streams it through MarkdownHTMLParser into
+    a writer and then drops it, so peak memory stays near one copy of the
+    document. str() builds the whole Markdown, for callers that need it.
+    """
+    __slots__ = ("html",)
+
+    def __init__(self, html):
+        self.html = html
+
+    def __bool__(self):
+        return bool(self.html) and not self.html.isspace()
+
+    def __str__(self):
+        return html_to_markdown(self.html)
+
+    def write_to(self, write_line):
+        html, self.html = self.html, None
+        write_html_markdown(html, write_line)
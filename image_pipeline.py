@@ -0,0 +1,374 @@
+import argparse
+import contextlib
+import glob
+import hashlib
+import html
+import json
+import os
+import re
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import backend_registry
+from conversion_cache import file_digest
+from markdown_writer import atomic_write
+
+PIPELINE_VERSION = 1
+DEFAULT_OUTPUT_DIR = "img"
+MANIFEST_FILE = "manifest.json"
+DEFAULT_WIDTHS = (320, 640, 960, 1280)
+DEFAULT_SIZES = "100vw"
+JPEG_QUALITY = 82
+WEBP_QUALITY = 80
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png")
+
+# Below this many images to process, starting worker processes costs more than it saves
+PARALLEL_MIN_IMAGES = 2
+
+# A rewritten image keeps its original path in data-source, so later runs can regenerate it
+_IMAGE_TAG = re.compile(r'<picture\b[^>]*?\bdata-source="([^"]*)"[^>]*>.*?</picture>|<img\b[^>]*>', re.S)
+_INNER_IMG = re.compile(r"<img\b[^>]*>")
+_ATTRIBUTE = re.compile(r'([\w:-]+)(?:\s*=\s*"([^"]*)")?')
+_DERIVATIVE = re.compile(r"-[0-9a-f]{12}-\d+\.(?:jpg|png|webp)$")
+
+# Attributes the markup computes; everything else on the original <img> is kept
+GENERATED_ATTRIBUTES = {"src", "srcset", "sizes", "width", "height"}
+
+def derivative_key(digest, settings):
+    """
+    Short key naming an image's derivatives: its contents plus the settings they were made with
+    """
+    payload = json.dumps({"digest": digest, "settings": settings}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:12]
+
+def variant_widths(width, widths):
+    """
+    Widths to generate for an image width pixels wide; never upscales
+    """
+    result = sorted(w for w in set(widths) if w < width)
+    largest = min(width, max(widths))
+    if largest not in result:
+        result.append(largest)
+    return result
+
+def _stem(source):
+    return re.sub(r"[^A-Za-z0-9]+", "-", os.path.splitext(os.path.basename(source))[0]).strip("-").lower() or "image"
+
+def _save_atomic(image, path, image_format, **options):
+    with atomic_write(path, "wb") as f:
+        image.save(f, image_format, **options)
+
+def _copy_atomic(source, path):
+    with open(source, "rb") as src, atomic_write(path, "wb") as f:
+        shutil.copyfileobj(src, f)
+
+def process_image(source, key, output_dir, widths, settings, overwrite=False):
+    """
+    Write the resized fallback and WebP variants of one image
+
+    Runs in a worker process. Derivative names carry the key, so a file
+    that already exists is complete and is only written again with
+    overwrite. Returns the
+    image's manifest entry, less its source signature.
+    """
+    from PIL import Image, ImageOps
+
+    with Image.open(source) as original:
+        source_format = original.format
+        upright = original.getexif().get(0x0112, 1) == 1
+        image = ImageOps.exif_transpose(original)
+        alpha = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+        image = image.convert("RGBA" if alpha else "RGB")
+
+        # Photos fall back to JPEG; images with transparency need PNG
+        fallback_ext, fallback_format = (".png", "PNG") if alpha else (".jpg", "JPEG")
+        fallback_type = "image/png" if alpha else "image/jpeg"
+        stem = f"{_stem(source)}-{key}"
+        variants = []
+        for width in variant_widths(image.width, widths):
+            height = max(round(image.height * width / image.width), 1)
+            names = {"fallback": f"{stem}-{width}{fallback_ext}", "webp": f"{stem}-{width}.webp"}
+            paths = {kind: os.path.join(output_dir, name) for kind, name in names.items()}
+            missing = {kind: overwrite or not os.path.exists(path) for kind, path in paths.items()}
+            if any(missing.values()):
+                resized = image if width == image.width else image.resize(
+                    (width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+                if missing["fallback"]:
+                    if width == image.width and upright and source_format == fallback_format:
+                        # Re-encoding the full-size original would only lose quality, usually for more bytes
+                        _copy_atomic(source, paths["fallback"])
+                    elif alpha:
+                        _save_atomic(resized, paths["fallback"], fallback_format, optimize=True)
+                    else:
+                        _save_atomic(resized, paths["fallback"], fallback_format,
+                                     quality=settings["jpeg_quality"], optimize=True, progressive=True)
+                if missing["webp"]:
+                    _save_atomic(resized, paths["webp"], "WEBP", quality=settings["webp_quality"], method=4)
+            variants.append(dict(names, width=width, height=height))
+
+    return {
+        "key": key,
+        "width": variants[-1]["width"],
+        "height": variants[-1]["height"],
+        "fallback_type": fallback_type,
+        "variants": variants,
+    }
+
+def _load_manifest(path):
+    with contextlib.suppress(OSError, ValueError):
+        with open(path, "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") == PIPELINE_VERSION:
+            return manifest
+    return {}
+
+def _write_json_atomic(path, data):
+    with atomic_write(path) as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+
+def _is_current(entry, output_dir):
+    return all(os.path.exists(os.path.join(output_dir, variant[kind]))
+               for variant in entry["variants"] for kind in ("fallback", "webp"))
+
+def optimize_images(sources, output_dir=DEFAULT_OUTPUT_DIR, widths=DEFAULT_WIDTHS, workers=None, force=False,
+                    jpeg_quality=JPEG_QUALITY, webp_quality=WEBP_QUALITY, prune=False):
+    """
+    Generate responsive variants of every source image, reusing unchanged ones
+
+    An image is hashed only when its size or modification time changed
+    since the last run, and processed only when its contents or the
+    settings changed or a derivative is missing. Images to process are
+    spread over a process pool. The manifest keeps the entries of images
+    not given this time, and of images that failed to process, so their
+    existing variants stay in use. Only with prune, for a run over every
+    image the pages use, are other manifest entries dropped and the
+    derivatives nothing uses removed. Returns (manifest images of the
+    given sources, processed sources).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    settings = {"widths": sorted(set(widths)), "jpeg_quality": jpeg_quality, "webp_quality": webp_quality,
+                "pipeline": PIPELINE_VERSION}
+    manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+    previous = _load_manifest(manifest_path).get("images", {})
+
+    images = {}
+    jobs = []
+    for source in sources:
+        stat = os.stat(source)
+        signature = [stat.st_size, stat.st_mtime_ns]
+        entry = previous.get(source)
+        # Entries kept from runs over other images may have been made with other settings
+        if (not force and entry and entry["signature"] == signature and entry.get("settings") == settings
+                and _is_current(entry, output_dir)):
+            images[source] = entry
+            continue
+        key = derivative_key(file_digest(source), settings)
+        if not force and entry and entry["key"] == key and _is_current(entry, output_dir):
+            images[source] = dict(entry, signature=signature, settings=settings)
+            continue
+        jobs.append((source, key, signature))
+
+    if jobs and not backend_registry.probe_modules(["PIL"]).get("PIL"):
+        raise ImportError("Pillow is required to process images (pip install Pillow)")
+
+    processed = []
+
+    def record(source, signature, entry):
+        images[source] = dict(entry, signature=signature, settings=settings)
+        processed.append(source)
+
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(jobs) >= PARALLEL_MIN_IMAGES:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+            futures = [(source, signature,
+                        executor.submit(process_image, source, key, output_dir, widths, settings, force))
+                       for source, key, signature in jobs]
+            for source, signature, future in futures:
+                try:
+                    record(source, signature, future.result())
+                except Exception as e:
+                    print(f"Error processing '{source}': {str(e)}")
+    else:
+        for source, key, signature in jobs:
+            try:
+                record(source, signature, process_image(source, key, output_dir, widths, settings, force))
+            except Exception as e:
+                print(f"Error processing '{source}': {str(e)}")
+
+    if prune:
+        # Failed images keep their last good variants until they process again
+        kept = {source: previous[source] for source in sources if source not in images and source in previous}
+    else:
+        kept = {source: entry for source, entry in previous.items() if source not in images}
+    stored = dict(kept, **images)
+    if prune:
+        used = {variant[kind] for entry in stored.values() for variant in entry["variants"]
+                for kind in ("fallback", "webp")}
+        for name in os.listdir(output_dir):
+            if _DERIVATIVE.search(name) and name not in used:
+                os.remove(os.path.join(output_dir, name))
+
+    _write_json_atomic(manifest_path, {"version": PIPELINE_VERSION, "settings": settings, "images": stored})
+    return images, processed
+
+def srcset(entry, url_prefix, kind):
+    """
+    srcset attribute value listing every variant of one kind ("fallback" or "webp")
+    """
+    return ", ".join(f"{url_prefix}{variant[kind]} {variant['width']}w" for variant in entry["variants"])
+
+def picture_markup(source, entry, url_prefix="", attributes=None, sizes=DEFAULT_SIZES):
+    """
+    <picture> element serving WebP where supported and the fallback format elsewhere
+
+    attributes are extra <img> attributes such as alt and class; a sizes
+    attribute among them replaces the default. The largest variant is the
+    plain src, and width and height let the browser reserve space.
+    """
+    attributes = dict(attributes or {})
+    sizes = attributes.pop("sizes", None) or sizes
+    largest = entry["variants"][-1]
+    img = {
+        "src": url_prefix + largest["fallback"],
+        "srcset": srcset(entry, url_prefix, "fallback"),
+        "sizes": sizes,
+        "width": str(entry["width"]),
+        "height": str(entry["height"]),
+    }
+    img.update((name, value) for name, value in attributes.items() if name not in GENERATED_ATTRIBUTES)
+    img_attributes = "".join(f' {name}="{html.escape(value)}"' if value is not None else f" {name}"
+                             for name, value in img.items())
+    return (f'<picture data-source="{html.escape(source)}">'
+            f'<source type="image/webp" srcset="{html.escape(srcset(entry, url_prefix, "webp"))}" '
+            f'sizes="{html.escape(sizes)}">'
+            f"<img{img_attributes}></picture>")
+
+def _tag_attributes(tag):
+    body = re.sub(r"^<\w+|/?>$", "", tag)
+    return {name.lower(): None if value is None else html.unescape(value)
+            for name, value in _ATTRIBUTE.findall(body)}
+
+def _local_source(url, page_dir):
+    if not url or re.match(r"^[a-z][a-z0-9+.-]*:|^//|^/", url, re.I):
+        return None
+    path = os.path.normpath(os.path.join(page_dir, url.split("#")[0].split("?")[0]))
+    return path if path.lower().endswith(IMAGE_EXTENSIONS) else None
+
+def iter_page_images(text, page_dir="."):
+    """
+    Yield (match, source path, <img> attributes) for each local image in a page
+
+    Images the pipeline already turned into <picture> elements are found
+    through their data-source attribute.
+    """
+    for match in _IMAGE_TAG.finditer(text):
+        if match.group(1) is not None:
+            inner = _INNER_IMG.search(match.group(0))
+            attributes = _tag_attributes(inner.group(0)) if inner else {}
+            source = _local_source(html.unescape(match.group(1)), page_dir)
+        else:
+            attributes = _tag_attributes(match.group(0))
+            source = _local_source(attributes.get("src"), page_dir)
+        if source:
+            yield match, source, attributes
+
+def rewrite_page(path, images, output_dir, sizes=DEFAULT_SIZES):
+    """
+    Replace a page's <img> tags for processed images with <picture> markup
+
+    Rewriting an already rewritten page refreshes its markup. The page is
+    only written when it changes; returns the number of images replaced,
+    or 0 if the page was already current.
+    """
+    page_dir = os.path.dirname(path)
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    url_prefix = os.path.relpath(output_dir, page_dir or ".").replace(os.sep, "/") + "/"
+
+    parts = []
+    position = 0
+    replaced = 0
+    for match, source, attributes in iter_page_images(text, page_dir):
+        if source not in images:
+            continue
+        parts.append(text[position:match.start()])
+        parts.append(picture_markup(source.replace(os.sep, "/"), images[source], url_prefix, attributes, sizes))
+        position = match.end()
+        replaced += 1
+    parts.append(text[position:])
+    updated = "".join(parts)
+
+    if updated != text:
+        with atomic_write(path) as f:
+            f.write(updated)
+        return replaced
+    return 0
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate responsive image variants and srcset markup for the pages")
+    parser.add_argument("images", nargs="*", help="Images to process (default: every local image the pages use)")
+    parser.add_argument("--pages", nargs="*", help="HTML pages to scan (default: *.html)")
+    parser.add_argument("-o", "--output-dir", default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument("--widths", default=",".join(map(str, DEFAULT_WIDTHS)), help="Comma-separated variant widths")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help="sizes attribute for images that do not set one")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count(), help="Worker processes")
+    parser.add_argument("--force", action="store_true", help="Reprocess every image")
+    parser.add_argument("--rewrite", action="store_true", help="Replace the pages' <img> tags with <picture> markup")
+    parser.add_argument("--markup", action="store_true", help="Print the <picture> markup for every image")
+    args = parser.parse_args(argv)
+
+    pages = args.pages if args.pages is not None else sorted(glob.glob("*.html"))
+    try:
+        widths = [int(width) for width in args.widths.split(",") if width.strip()]
+        if not widths or min(widths) <= 0:
+            raise ValueError("widths must be positive integers")
+
+        sources = [os.path.normpath(image) for image in args.images]
+        # Only a scan of every page knows all the images in use, so only it may delete derivatives
+        full_scan = not sources
+        if full_scan:
+            for page in pages:
+                with open(page, "r", encoding="utf-8") as f:
+                    for _, source, _ in iter_page_images(f.read(), os.path.dirname(page)):
+                        if source not in sources and os.path.exists(source):
+                            sources.append(source)
+
+        started = time.perf_counter()
+        images, processed = optimize_images(sources, args.output_dir, widths, args.workers, args.force,
+                                            prune=full_scan)
+        elapsed = (time.perf_counter() - started) * 1000
+    except (OSError, ValueError, ImportError) as e:
+        print(f"Error optimizing images: {str(e)}")
+        return 1
+
+    for source in processed:
+        entry = images[source]
+        original = os.path.getsize(source)
+        largest = entry["variants"][-1]
+        webp = os.path.getsize(os.path.join(args.output_dir, largest["webp"]))
+        print(f"✓ {source}: {len(entry['variants'])} widths, "
+              f"{original:,} -> {webp:,} bytes at {largest['width']}px (WebP)")
+    print(f"Processed {len(processed)} of {len(sources)} images in {elapsed:.1f} ms "
+          f"({len(images) - len(processed)} unchanged)")
+
+    if args.markup:
+        for source, entry in images.items():
+            prefix = args.output_dir.replace(os.sep, "/").rstrip("/") + "/"
+            print(f"\n{source}:\n{picture_markup(source.replace(os.sep, '/'), entry, prefix, sizes=args.sizes)}")
+
+    if args.rewrite:
+        for page in pages:
+            try:
+                replaced = rewrite_page(page, images, args.output_dir, args.sizes)
+            except OSError as e:
+                print(f"Error rewriting '{page}': {str(e)}")
+                return 1
+            if replaced:
+                print(f"Rewrote {replaced} images in '{page}'")
+
+    return 0 if len(images) == len(sources) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
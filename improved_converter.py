@@ -1,9 +1,15 @@
-import docx
 import os
 import re
 from pathlib import Path
 
-def extract_all_content_from_docx(docx_path):
+import docx_ir
+from conversion_trace import traced
+from docx_media import document_media, with_images
+from docx_styles import style_name_traits
+from convert_docx_to_md import markdown_list_item
+from markdown_writer import MarkdownWriter, preview_text
+
+def extract_all_content_from_docx(docx_path, document=None):
     """
     Extract all possible content from a .docx file
     """
@@ -12,29 +18,32 @@ def extract_all_content_from_docx(docx_path):
             print(f"Error: File '{docx_path}' not found.")
             return None
         
-        doc = docx.Document(docx_path)
+        if document is None:
+            document = docx_ir.load_document(docx_path)
+        paragraphs = document.paragraphs
+        tables = document.tables
         
-        print(f"Document has {len(doc.paragraphs)} paragraphs")
-        print(f"Document has {len(doc.tables)} tables")
-        print(f"Document has {len(doc.sections)} sections")
+        print(f"Document has {len(paragraphs)} paragraphs")
+        print(f"Document has {len(tables)} tables")
+        print(f"Document has {document.section_count} sections")
         
         # Extract all text content
         all_content = []
         
         # Process all paragraphs
-        for i, paragraph in enumerate(doc.paragraphs):
+        for i, paragraph in enumerate(paragraphs):
             text = paragraph.text.strip()
             if text:
                 print(f"Paragraph {i+1}: {text[:100]}...")
                 all_content.append(text)
         
         # Process all tables
-        for i, table in enumerate(doc.tables):
+        for i, table in enumerate(tables):
             print(f"Table {i+1}:")
             for row_idx, row in enumerate(table.rows):
                 row_text = []
-                for cell in row.cells:
-                    cell_text = cell.text.strip()
+                for cell_text in row:
+                    cell_text = cell_text.strip()
                     if cell_text:
                         row_text.append(cell_text)
                 if row_text:
@@ -47,99 +56,137 @@ def extract_all_content_from_docx(docx_path):
         print(f"Error reading file: {str(e)}")
         return None
 
-def convert_docx_to_markdown_improved(docx_path, output_path=None):
+def improved_paragraph_line(paragraph, text):
+    """
+    Render a paragraph, promoting likely headings by style, size and shape
+    """
+    # Style traits and the effective font size are resolved once per style
+    is_heading_style, heading_number = style_name_traits(paragraph.style_name)
+    font_size = paragraph.font_size
+    
+    # Determine if it's a heading based on style and font size
+    if (is_heading_style or 
+        (font_size and font_size > 14) or
+        paragraph.text.isupper() or
+        len(text) < 100 and text.endswith(':')):
+        
+        # Determine heading level
+        if heading_number == 1 or font_size and font_size > 18:
+            return f"# {text}"
+        elif heading_number == 2 or font_size and font_size > 16:
+            return f"## {text}"
+        elif heading_number == 3 or font_size and font_size > 14:
+            return f"### {text}"
+        else:
+            return f"## {text}"
+    
+    # Regular paragraph
+    return text
+
+def iter_improved_table_lines(table):
+    """
+    Stream a table's Markdown lines with a generic separator after the header row
+    """
+    if len(table.rows) == 0:
+        return
+    
+    yield ""
+    for row_idx, row in enumerate(table.rows):
+        row_data = [cell_text.strip() or " " for cell_text in row]
+        if row_data:
+            yield "| " + " | ".join(row_data) + " |"
+            
+            # Add separator after header row
+            if row_idx == 0:
+                yield "| " + " | ".join(["---"] * len(row_data)) + " |"
+    yield ""
+
+def iter_improved_markdown(document, media=None):
+    """
+    Generate the improved Markdown for a document, line by line
+
+    With a docx_media.DocumentMedia, pictures are linked after their
+    paragraph's text.
+    """
+    # Add document title
+    yield "# Eduphilo Website Requirements"
+    yield ""
+    
+    # Process blocks in document order with better detection
+    in_list = False
+    list_num_id = None
+    for block in document.blocks:
+        if isinstance(block, docx_ir.Table):
+            if in_list:
+                yield ""
+                in_list = False
+            yield from iter_improved_table_lines(block)
+            continue
+        
+        text = block.text.strip()
+        images = media.markdown(block) if media is not None else ""
+        if not text:
+            if images:
+                # A picture on its own is a paragraph of its own
+                if in_list:
+                    yield ""
+                    in_list = False
+                yield images
+                yield ""
+            continue
+        
+        if isinstance(block, docx_ir.ListItem):
+            if in_list and block.level == 0 and block.num_id != list_num_id:
+                # A different top-level list starts a new Markdown list
+                yield ""
+            yield with_images(markdown_list_item(block, text), images)
+            in_list = True
+            list_num_id = block.num_id
+            continue
+        
+        if in_list:
+            yield ""
+            in_list = False
+        yield with_images(improved_paragraph_line(block, text), images)
+        yield ""
+    
+    if in_list:
+        yield ""
+
+@traced("improved")
+def convert_docx_to_markdown_improved(docx_path, output_path=None, document=None, media_dir=None, trace=None):
     """
     Improved conversion with better content extraction
+
+    Pass an already parsed DocumentIR as document to skip parsing. With
+    media_dir, embedded pictures are extracted there and linked. Returns
+    a MarkdownOutput (truthy) on success, False on failure. Time is traced
+    in "load" and "render" stages.
     """
     try:
         if not os.path.exists(docx_path):
             print(f"Error: File '{docx_path}' not found.")
             return False
         
-        doc = docx.Document(docx_path)
-        
-        md_content = []
-        
-        # Add document title
-        md_content.append("# Eduphilo Website Requirements")
-        md_content.append("")
-        
-        # Process paragraphs with better detection
-        for paragraph in doc.paragraphs:
-            text = paragraph.text.strip()
-            if not text:
-                continue
-            
-            # Check for various heading patterns
-            style_name = paragraph.style.name.lower()
-            font_size = None
-            
-            # Try to get font size
-            for run in paragraph.runs:
-                if run.font.size:
-                    font_size = run.font.size.pt
-                    break
-            
-            # Determine if it's a heading based on style and font size
-            if ('heading' in style_name or 
-                'title' in style_name or 
-                (font_size and font_size > 14) or
-                paragraph.text.isupper() or
-                len(text) < 100 and text.endswith(':')):
-                
-                # Determine heading level
-                if 'heading 1' in style_name or font_size and font_size > 18:
-                    md_content.append(f"# {text}")
-                elif 'heading 2' in style_name or font_size and font_size > 16:
-                    md_content.append(f"## {text}")
-                elif 'heading 3' in style_name or font_size and font_size > 14:
-                    md_content.append(f"### {text}")
-                else:
-                    md_content.append(f"## {text}")
-            else:
-                # Regular paragraph
-                md_content.append(text)
-            
-            md_content.append("")
-        
-        # Process tables
-        for table in doc.tables:
-            if len(table.rows) > 0:
-                md_content.append("")
-                
-                # Create table
-                for row_idx, row in enumerate(table.rows):
-                    row_data = []
-                    for cell in row.cells:
-                        cell_text = cell.text.strip()
-                        row_data.append(cell_text if cell_text else " ")
-                    
-                    if row_data:
-                        md_content.append("| " + " | ".join(row_data) + " |")
-                        
-                        # Add separator after header row
-                        if row_idx == 0:
-                            separator = "| " + " | ".join(["---"] * len(row_data)) + " |"
-                            md_content.append(separator)
-                
-                md_content.append("")
-        
-        # Join content
-        final_content = '\n'.join(md_content)
+        if document is None:
+            with trace.stage("load"):
+                document = docx_ir.load_document(docx_path, trace)
         
         # Determine output path
         if output_path is None:
             base_name = Path(docx_path).stem
             output_path = f"{base_name}.md"
         
-        # Write to file
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(final_content)
+        # Render straight to the file; it only appears once complete
+        with trace.stage("render"):
+            with MarkdownWriter(output_path) as writer, document_media(docx_path, output_path, media_dir) as media:
+                writer.write_lines(iter_improved_markdown(document, media))
+        trace.count("output_chars", writer.chars)
         
         print(f"Successfully converted '{docx_path}' to '{output_path}'")
-        print(f"Content length: {len(final_content)} characters")
+        print(f"Content length: {writer.chars} characters")
         
-        return True
+        return writer.result
         
     except Exception as e:
         print(f"Error converting file: {str(e)}")
@@ -149,31 +196,33 @@ def main():
     docx_file = "eduphilo-website-requirements.docx"
     output_file = "eduphilo-website-requirements.md"
     
+    # Parse once and share the result between analysis and conversion
+    try:
+        document = docx_ir.load_document(docx_file) if os.path.exists(docx_file) else None
+    except Exception as e:
+        print(f"Error reading file: {str(e)}")
+        return
+    
     print("=== DOCUMENT ANALYSIS ===")
-    content = extract_all_content_from_docx(docx_file)
+    content = extract_all_content_from_docx(docx_file, document)
     
     if content:
         print(f"\nTotal content items found: {len(content)}")
         print("\n=== CONVERTING TO MARKDOWN ===")
-        success = convert_docx_to_markdown_improved(docx_file, output_file)
+        output = convert_docx_to_markdown_improved(docx_file, output_file, document)
         
-        if success:
+        if output:
             print(f"\nConversion completed!")
             print(f"Output file: {output_file}")
             
-            # Show preview
-            try:
-                with open(output_file, 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    if content:
-                        print(f"\nPreview (first 1000 characters):")
-                        print("-" * 50)
-                        print(content[:1000] + "..." if len(content) > 1000 else content)
-                        print("-" * 50)
-                    else:
-                        print("Warning: Generated file is empty!")
-            except Exception as e:
-                print(f"Error reading output file: {str(e)}")
+            # Show preview, kept while the file was written
+            if output.chars:
+                print(f"\nPreview (first 1000 characters):")
+                print("-" * 50)
+                print(preview_text(output, 1000))
+                print("-" * 50)
+            else:
+                print("Warning: Generated file is empty!")
         else:
             print("Conversion failed!")
     else:
@@ -0,0 +1,307 @@
+import argparse
+import hashlib
+import io
+import json
+import os
+import re
+import sys
+from pathlib import Path
+
+import docx_ir
+import docx_package
+from conversion_cache import file_digest
+from conversion_trace import NULL_TRACE, traced
+from convert_docx_to_md import MarkdownBlockRenderer
+from markdown_writer import DEFAULT_PREVIEW_CHARS, MarkdownOutput, MarkdownWriter, atomic_write
+
+MANIFEST_VERSION = 1
+MANIFEST_SUFFIX = ".blocks.json"
+
+def manifest_path(output_path):
+    """
+    Where the block manifest for a Markdown output is kept
+    """
+    return str(output_path) + MANIFEST_SUFFIX
+
+def load_manifest(output_path):
+    """
+    The manifest for output_path, or None if it is missing, stale or unusable
+
+    A manifest is only trusted while the Markdown file still has the size
+    and modification time recorded when it was written.
+    """
+    try:
+        with open(manifest_path(output_path), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+        st = os.stat(output_path)
+    except (OSError, ValueError):
+        return None
+    if (manifest.get("version") != MANIFEST_VERSION
+            or manifest.get("output_size") != st.st_size
+            or manifest.get("output_mtime_ns") != st.st_mtime_ns):
+        return None
+    return manifest
+
+def save_manifest(output_path, manifest):
+    """
+    Atomically write the manifest next to output_path
+    """
+    path = manifest_path(output_path)
+    with atomic_write(path) as f:
+        json.dump(manifest, f, separators=(",", ":"))
+
+_BODY_START = re.compile(rb"<(?:[\w.-]+:)?body\b[^>]*>")
+_BODY_END = re.compile(rb"</(?:[\w.-]+:)?body\s*>")
+_TOP_LEVEL_START = re.compile(rb"\s*(?:<!--.*?-->\s*)*<([^\s>/!?]+)[^>]*?(/?)>", re.S)
+_element_tags = {}
+
+def _element_tag_pattern(name):
+    # Start and end tags of one element name only, e.g. <w:p ...> but not <w:pPr>
+    pattern = _element_tags.get(name)
+    if pattern is None:
+        pattern = re.compile(b"<(/?)" + re.escape(name) + rb"(?=[\s/>])[^>]*?(/?)>")
+        _element_tags[name] = pattern
+    return pattern
+
+def split_body(xml):
+    """
+    Split document XML into (prefix, chunks, suffix) without parsing it
+
+    Each chunk is the raw bytes of one top-level body element (a paragraph,
+    table, section properties and so on). prefix + chunk + suffix is a
+    well-formed document holding just that element. Only tags with the
+    same name as the current top-level element are looked at, so nested
+    content is skipped at regex speed.
+    """
+    start = _BODY_START.search(xml)
+    end = None
+    if start is not None:
+        for end in _BODY_END.finditer(xml, start.end()):
+            pass
+    if end is None:
+        raise ValueError("document has no body")
+
+    chunks = []
+    position = start.end()
+    body_end = end.start()
+    while position < body_end:
+        match = _TOP_LEVEL_START.match(xml, position, body_end)
+        if match is None:
+            break  # only whitespace or comments left
+        chunk_start = match.start(1) - 1
+        if match.group(2):
+            chunks.append(xml[chunk_start:match.end()])
+            position = match.end()
+            continue
+        depth = 1
+        for tag in _element_tag_pattern(match.group(1)).finditer(xml, match.end(), body_end):
+            if tag.group(1):
+                depth -= 1
+            elif not tag.group(2):
+                depth += 1
+            if depth == 0:
+                chunks.append(xml[chunk_start:tag.end()])
+                position = tag.end()
+                break
+        else:
+            raise ValueError("unbalanced body markup")
+    return xml[:start.end()], chunks, xml[end.start():]
+
+def _context_digest(package, relationships, prefix, suffix):
+    # Anything besides a block's own XML that affects how it renders
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(str(docx_ir.IR_VERSION).encode("ascii"))
+    for rel_type in (docx_package.RT_STYLES, docx_package.RT_NUMBERING):
+        part = docx_package.find_related_part(relationships, rel_type)
+        if part is not None and part in package.namelist():
+            digest.update(package.read(part))
+        digest.update(b"\0")
+    digest.update(prefix)
+    digest.update(suffix)
+    return digest.hexdigest()
+
+def _segment_key(chunk, state):
+    # A chunk renders the same whenever its XML and the list state before it match
+    digest = hashlib.blake2b(chunk, digest_size=16)
+    digest.update(f"|{state[0]}|{state[1]}".encode("utf-8"))
+    return digest.hexdigest()
+
+@traced("incremental")
+def convert_docx_to_markdown_incremental(docx_path, output_path=None, full=False, trace=None):
+    """
+    Convert like convert_docx_to_markdown, re-rendering only changed blocks
+
+    The body XML is split into top-level elements without being parsed.
+    Each element's rendered Markdown is recorded in a manifest next to the
+    output, keyed by a hash of its XML and the list state before it. On
+    the next run, elements whose key is unchanged are copied from the
+    existing Markdown; only new or edited elements are parsed and rendered.
+    Changes to styles or numbering, or full=True, re-render everything.
+    Returns a MarkdownOutput (truthy) on success, False on failure.
+    """
+    try:
+        if not os.path.exists(docx_path):
+            print(f"Error: File '{docx_path}' not found.")
+            return False
+
+        if output_path is None:
+            output_path = f"{Path(docx_path).stem}.md"
+
+        source_digest = file_digest(docx_path)
+        manifest = None if full else load_manifest(output_path)
+        if manifest is not None and manifest["source_digest"] == source_digest:
+            print(f"'{output_path}' is up to date")
+            trace.count("blocks_reused", len(manifest["segments"]))
+            with open(output_path, "r", encoding="utf-8") as f:
+                preview = f.read(DEFAULT_PREVIEW_CHARS)
+            return MarkdownOutput(output_path, manifest["output_chars"], preview)
+
+        with docx_package.open_package(docx_path) as package:
+            with trace.stage("split"):
+                document_part = docx_package.find_document_part(package)
+                relationships = docx_package.read_relationships(package, document_part)
+                prefix, chunks, suffix = split_body(package.read(document_part))
+                context = _context_digest(package, relationships, prefix, suffix)
+
+            # Old segments by key, with the old Markdown addressed as one
+            # stream where every rendered line is preceded by a newline
+            old_segments = {}
+            old_stream = b""
+            if manifest is not None and manifest["context"] == context:
+                with trace.stage("read_previous"):
+                    with open(output_path, "rb") as f:
+                        old_stream = b"\n" + f.read()
+                    for key, offset, length, state_after in manifest["segments"]:
+                        old_segments[key] = (offset, length, state_after)
+
+            reader = None
+            lines = []
+            renderer = MarkdownBlockRenderer(lines.append)
+            segments = []
+            position = 0
+            rendered = reused = 0
+
+            with trace.stage("render"):
+                with MarkdownWriter(output_path) as writer:
+                    for chunk in chunks + [None]:
+                        state = (renderer.in_list, renderer.list_num_id)
+                        key = _segment_key(chunk if chunk is not None else b"", state)
+                        previous = old_segments.get(key)
+                        if previous is not None:
+                            offset, length, state_after = previous
+                            data = old_stream[offset:offset + length]
+                            renderer.in_list, renderer.list_num_id = state_after
+                            reused += 1
+                        else:
+                            if chunk is None:
+                                renderer.finish()
+                            else:
+                                if reader is None:
+                                    reader = docx_ir.ParagraphReader(package, relationships)
+                                events = docx_package.iter_body_stream(io.BytesIO(prefix + chunk + suffix))
+                                for block in docx_ir.iter_blocks(events, reader):
+                                    renderer.block(block)
+                            data = "".join("\n" + line for line in lines).encode("utf-8")
+                            lines.clear()
+                            rendered += 1
+
+                        text = data.decode("utf-8")
+                        # The stream's leading newline is not part of the file
+                        writer.write(text[1:] if position == 0 else text)
+                        segments.append([key, position, len(data), [renderer.in_list, renderer.list_num_id]])
+                        position += len(data)
+
+        st = os.stat(output_path)
+        save_manifest(output_path, {
+            "version": MANIFEST_VERSION,
+            "source_digest": source_digest,
+            "context": context,
+            "output_size": st.st_size,
+            "output_mtime_ns": st.st_mtime_ns,
+            "output_chars": writer.chars,
+            "segments": segments,
+        })
+        trace.count("blocks_rendered", rendered)
+        trace.count("blocks_reused", reused)
+
+        print(f"Successfully converted '{docx_path}' to '{output_path}'")
+        print(f"Re-rendered {rendered} of {len(segments)} blocks, reused {reused}")
+
+        return writer.result
+
+    except Exception as e:
+        print(f"Error converting file: {str(e)}")
+        return False
+
+class WarmDocument:
+    """
+    Parsed blocks of one .docx file kept in memory between loads
+
+    Each load splits the body like convert_docx_to_markdown_incremental
+    and only parses the top-level elements whose XML was not seen in the
+    previous version; everything else reuses the blocks parsed before.
+    Styles and numbering are read once and re-read only when they change.
+    """
+    def __init__(self, docx_path):
+        self.docx_path = docx_path
+        self.context = None
+        self.reader = None
+        self.chunks = {}
+        self.parsed = 0
+        self.reused = 0
+
+    def load(self, trace=NULL_TRACE):
+        """
+        Return a fresh DocumentIR for the file's current content
+        """
+        with docx_package.open_package(self.docx_path) as package:
+            document_part = docx_package.find_document_part(package)
+            relationships = docx_package.read_relationships(package, document_part)
+            with trace.stage("split"):
+                prefix, chunks, suffix = split_body(package.read(document_part))
+                context = _context_digest(package, relationships, prefix, suffix)
+            if context != self.context:
+                self.reader = docx_ir.ParagraphReader(package, relationships)
+                self.context = context
+                self.chunks = {}
+
+            previous = self.chunks
+            self.chunks = {}
+            blocks = []
+            sections = []
+            self.parsed = self.reused = 0
+            with trace.stage("body"):
+                for chunk in chunks:
+                    key = hashlib.blake2b(chunk, digest_size=16).digest()
+                    entry = self.chunks.get(key) or previous.get(key)
+                    if entry is None:
+                        chunk_sections = []
+                        events = docx_package.iter_body_stream(io.BytesIO(prefix + chunk + suffix))
+                        chunk_blocks = list(docx_ir.iter_blocks(
+                            events, self.reader,
+                            lambda sect_pr: chunk_sections.append(docx_ir.section_references(sect_pr))))
+                        entry = (chunk_blocks, chunk_sections)
+                        self.parsed += 1
+                    else:
+                        self.reused += 1
+                    self.chunks[key] = entry
+                    blocks.extend(entry[0])
+                    sections.extend(entry[1])
+            trace.count("blocks_parsed", self.parsed)
+            trace.count("blocks_reused", self.reused)
+
+            with trace.stage("stories"):
+                return docx_ir.assemble_document(package, relationships, self.docx_path, blocks,
+                                                 self.reader.all_style_names, sections)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert a .docx file to Markdown, re-rendering only what changed")
+    parser.add_argument("docx_file", nargs="?", default="eduphilo-website-requirements.docx")
+    parser.add_argument("output_file", nargs="?", default="eduphilo-website-requirements.md")
+    parser.add_argument("--full", action="store_true", help="Ignore the block manifest and render everything")
+    args = parser.parse_args(argv)
+
+    return 0 if convert_docx_to_markdown_incremental(args.docx_file, args.output_file, args.full) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+import html
+import re
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+_LIST_ITEM = re.compile(r"^(\s*)([-*+]|\d+\.)\s+(.*)$")
+_TABLE_SEPARATOR = re.compile(r"^\|?\s*:?-{3,}:?\s*(\|\s*:?-{3,}:?\s*)*\|?\s*$")
+_IMAGE = re.compile(r"!\[((?:\\.|[^\]\\])*)\]\(([^)\s]+)\)")
+_LINK = re.compile(r"\[((?:\\.|[^\]\\])*)\]\(([^)\s]+)\)")
+_STRONG = re.compile(r"\*\*(?=\S)(.+?)(?<=\S)\*\*")
+_EMPHASIS = re.compile(r"(?<![*\w])\*(?=\S)(.+?)(?<=\S)\*(?![*\w])")
+_ESCAPED = re.compile(r"\\([\\\[\]|*_#])")
+_SLUG = re.compile(r"[^a-z0-9]+")
+
+def heading_id(text):
+    """
+    Anchor id for a heading, as used in the rendered HTML
+    """
+    return _SLUG.sub("-", text.lower()).strip("-") or "section"
+
+def inline_html(text, rewrite_url=None):
+    """
+    Escape a line of Markdown text and render its images, links and emphasis
+    """
+    text = html.escape(text, quote=False)
+
+    def url(value):
+        value = html.unescape(value)
+        return html.escape(rewrite_url(value) if rewrite_url else value)
+
+    text = _IMAGE.sub(lambda m: f'<img src="{url(m.group(2))}" alt="{html.escape(m.group(1))}">', text)
+    text = _LINK.sub(lambda m: f'<a href="{url(m.group(2))}">{m.group(1)}</a>', text)
+    text = _STRONG.sub(r"<strong>\1</strong>", text)
+    text = _EMPHASIS.sub(r"<em>\1</em>", text)
+    return _ESCAPED.sub(r"\1", text)
+
+def _table_cells(line):
+    line = line.strip()
+    if line.startswith("|"):
+        line = line[1:]
+    if line.endswith("|") and not line.endswith("\\|"):
+        line = line[:-1]
+    return [cell.strip() for cell in re.split(r"(?<!\\)\|", line)]
+
+class MarkdownHTMLRenderer:
+    """
+    Line-by-line HTML rendering of the Markdown the converters produce
+
+    Handles ATX headings, paragraphs, nested bullet and numbered lists,
+    pipe tables, images, links and emphasis. rewrite_url, if given, maps
+    every link and image target, e.g. to keep relative paths working from
+    another directory.
+    """
+    def __init__(self, rewrite_url=None):
+        self.rewrite_url = rewrite_url
+        self.out = []
+        self.paragraph = []
+        self.lists = []
+        self.table = None
+
+    def _inline(self, text):
+        return inline_html(text, self.rewrite_url)
+
+    def _flush_paragraph(self):
+        if self.paragraph:
+            self.out.append("<p>" + "<br>\n".join(self._inline(line) for line in self.paragraph) + "</p>")
+            self.paragraph = []
+
+    def _close_lists(self, indent=-1):
+        while self.lists and self.lists[-1][0] > indent:
+            _, tag = self.lists.pop()
+            self.out.append(f"</li></{tag}>")
+
+    def _cell(self, text):
+        return "<br>".join(self._inline(line) for line in text.split("\n"))
+
+    def _flush_table(self):
+        if self.table is None:
+            return
+        rows = self.table
+        self.table = None
+        header = len(rows) > 1 and _TABLE_SEPARATOR.match(rows[1])
+        self.out.append("<table>")
+        for index, row in enumerate(rows):
+            if header and index == 1:
+                continue
+            cell_tag = "th" if header and index == 0 else "td"
+            cells = "".join(f"<{cell_tag}>{self._cell(cell)}</{cell_tag}>" for cell in _table_cells(row))
+            self.out.append(f"<tr>{cells}</tr>")
+        self.out.append("</table>")
+
+    def _flush(self):
+        self._flush_paragraph()
+        self._flush_table()
+        self._close_lists()
+
+    def line(self, line):
+        stripped = line.strip()
+        if self.table and not self.table[-1].endswith("|"):
+            # Multi-paragraph cells continue the row on the following lines
+            self.table[-1] += "\n" + stripped
+            return
+        if not stripped:
+            self._flush_paragraph()
+            self._flush_table()
+            return
+
+        if stripped.startswith("|"):
+            self._flush_paragraph()
+            self._close_lists()
+            if self.table is None:
+                self.table = []
+            self.table.append(stripped)
+            return
+        self._flush_table()
+
+        heading = _HEADING.match(stripped)
+        if heading:
+            self._flush()
+            level = len(heading.group(1))
+            text = heading.group(2)
+            self.out.append(f'<h{level} id="{heading_id(text)}">{self._inline(text)}</h{level}>')
+            return
+
+        item = _LIST_ITEM.match(line)
+        if item:
+            self._flush_paragraph()
+            indent = len(item.group(1).expandtabs())
+            tag = "ol" if item.group(2)[0].isdigit() else "ul"
+            self._close_lists(indent)
+            if self.lists and self.lists[-1][0] == indent:
+                if self.lists[-1][1] == tag:
+                    self.out.append("</li>")
+                else:
+                    self._close_lists(indent - 1)
+            if not self.lists or self.lists[-1][0] < indent:
+                self.lists.append((indent, tag))
+                self.out.append(f"<{tag}>")
+            self.out.append(f"<li>{self._inline(item.group(3))}")
+            return
+
+        if self.lists and not self.paragraph:
+            # A paragraph after a list ends it; lists here are always blank-line separated
+            self._close_lists()
+        self.paragraph.append(stripped)
+
+    def finish(self):
+        """
+        Close open blocks and return the HTML
+        """
+        self._flush()
+        return "\n".join(self.out)
+
+def markdown_to_html(text, rewrite_url=None):
+    """
+    Render Markdown text to an HTML fragment
+    """
+    renderer = MarkdownHTMLRenderer(rewrite_url)
+    for line in text.split("\n"):
+        renderer.line(line)
+    return renderer.finish()
@@ -0,0 +1,143 @@
+import contextlib
+import os
+import tempfile
+from collections import namedtuple
+
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+DEFAULT_PREVIEW_CHARS = 1000
+
+# What a committed conversion produced; a non-empty tuple, so always truthy
+MarkdownOutput = namedtuple("MarkdownOutput", ["path", "chars", "preview"])
+
+_file_mode = None
+
+def _new_file_mode():
+    # mkstemp creates files as 0600; give outputs the mode open() would have
+    global _file_mode
+    if _file_mode is None:
+        umask = os.umask(0)
+        os.umask(umask)
+        _file_mode = 0o666 & ~umask
+    return _file_mode
+
+class MarkdownWriter:
+    """
+    Line-by-line Markdown output to a temporary file renamed into place
+
+    Lines are joined with newlines exactly as '\\n'.join would, but go
+    straight to a large-buffered file handle, so memory does not grow with
+    the output. Only the first preview_chars characters are kept. The
+    output path only ever holds a complete file: commit() renames the
+    temporary file over it and abort() removes it. Used as a context
+    manager it commits on success and aborts on an exception.
+    """
+    def __init__(self, output_path, preview_chars=DEFAULT_PREVIEW_CHARS,
+                 buffer_size=DEFAULT_BUFFER_SIZE, durable=False):
+        self.output_path = str(output_path)
+        self.preview_chars = preview_chars
+        self.durable = durable
+        self.chars = 0
+        self.result = None
+        self._preview = []
+        self._preview_left = preview_chars
+        self._first_line = True
+
+        directory = os.path.dirname(os.path.abspath(self.output_path))
+        fd, self.temp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+        try:
+            self.file = open(fd, "w", encoding="utf-8", buffering=buffer_size)
+        except BaseException:
+            os.close(fd)
+            os.remove(self.temp_path)
+            raise
+
+    def write(self, text):
+        """
+        Write raw text, counting it and keeping the start for the preview
+        """
+        self.file.write(text)
+        self.chars += len(text)
+        if self._preview_left > 0:
+            self._preview.append(text[:self._preview_left])
+            self._preview_left -= len(text)
+
+    def write_line(self, line):
+        if self._first_line:
+            self._first_line = False
+        else:
+            self.write('\n')
+        self.write(line)
+
+    def write_lines(self, lines):
+        for line in lines:
+            self.write_line(line)
+
+    @property
+    def preview(self):
+        return "".join(self._preview)
+
+    def commit(self):
+        """
+        Flush the output and move it into place; returns a MarkdownOutput
+        """
+        if self.result is not None:
+            return self.result
+        try:
+            self.file.flush()
+            if self.durable:
+                os.fsync(self.file.fileno())
+            self.file.close()
+            os.chmod(self.temp_path, _new_file_mode())
+            os.replace(self.temp_path, self.output_path)
+        except BaseException:
+            self.abort()
+            raise
+        self.result = MarkdownOutput(self.output_path, self.chars, self.preview)
+        return self.result
+
+    def abort(self):
+        """
+        Discard everything written; the output path is left untouched
+        """
+        with contextlib.suppress(OSError):
+            self.file.close()
+        with contextlib.suppress(OSError):
+            os.remove(self.temp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+        return False
+
+@contextlib.contextmanager
+def atomic_write(path, mode="w"):
+    """
+    Write a file through a temporary file that replaces path when the block ends
+
+    Yields the temporary file, opened for text as UTF-8 ("w") or for bytes
+    ("wb"). On success it gets the mode open() would have given it and is
+    renamed over path; on an exception it is removed and path is left as it
+    was.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".tmp")
+    try:
+        with open(fd, mode, encoding=None if "b" in mode else "utf-8") as f:
+            yield f
+        os.chmod(temp_path, _new_file_mode())
+        os.replace(temp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(temp_path)
+        raise
+
+def preview_text(output, limit):
+    """
+    The first limit characters of a MarkdownOutput, with '...' if there is more
+    """
+    return output.preview[:limit] + "..." if output.chars > limit else output.preview[:limit]
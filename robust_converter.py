@@ -1,24 +1,33 @@
+import argparse
+import contextlib
+import importlib
+import json
 import os
+import shlex
 import sys
+import time
 from pathlib import Path
 
+import backend_registry
+from conversion_trace import NULL_TRACE, PROFILERS, Trace, trace_from_environment
+from markdown_writer import MarkdownWriter, preview_text
+
 def try_mammoth(docx_path):
     """
     Try to extract content using mammoth library
+
+    Returns Mammoth's HTML as HTMLMarkdown: it is streamed through an
+    incremental parser that emits Markdown lines straight into the output,
+    keeping its headings, lists and tables.
     """
     try:
         import mammoth
+        from html_markdown import HTMLMarkdown
         
+        # Images are left out instead of being base64-encoded into the HTML
+        skip_images = mammoth.images.img_element(lambda image: {})
         with open(docx_path, "rb") as docx_file:
-            result = mammoth.convert_to_html(docx_file)
-            html_content = result.value
-            
-            # Convert HTML to plain text
-            import re
-            text_content = re.sub(r'<[^>]+>', '', html_content)
-            text_content = re.sub(r'\n\s*\n', '\n\n', text_content)
-            
-            return text_content.strip()
+            return HTMLMarkdown(mammoth.convert_to_html(docx_file, convert_image=skip_images).value)
             
     except Exception as e:
         print(f"Mammoth failed: {str(e)}")
@@ -50,39 +59,38 @@ def try_docx2txt(docx_path):
         print(f"Docx2txt failed: {str(e)}")
         return None
 
-def try_python_docx_enhanced(docx_path):
+def try_python_docx_enhanced(docx_path, document=None):
     """
-    Enhanced python-docx extraction
+    Enhanced extraction from the parsed document IR
     """
     try:
-        import docx
+        import docx_ir
         
-        doc = docx.Document(docx_path)
+        if document is None:
+            document = docx_ir.load_document(docx_path)
         content = []
         
         # Extract from paragraphs
-        for paragraph in doc.paragraphs:
+        for paragraph in document.paragraphs:
             if paragraph.text.strip():
                 content.append(paragraph.text.strip())
         
         # Extract from tables
-        for table in doc.tables:
+        for table in document.tables:
             for row in table.rows:
-                for cell in row.cells:
-                    if cell.text.strip():
-                        content.append(cell.text.strip())
+                for cell_text in row:
+                    if cell_text.strip():
+                        content.append(cell_text.strip())
         
         # Extract from headers and footers
-        for section in doc.sections:
-            if section.header:
-                for paragraph in section.header.paragraphs:
-                    if paragraph.text.strip():
-                        content.append(paragraph.text.strip())
+        for header, footer in zip(document.headers, document.footers):
+            for text in header:
+                if text.strip():
+                    content.append(text.strip())
             
-            if section.footer:
-                for paragraph in section.footer.paragraphs:
-                    if paragraph.text.strip():
-                        content.append(paragraph.text.strip())
+            for text in footer:
+                if text.strip():
+                    content.append(text.strip())
         
         return '\n\n'.join(content)
         
@@ -90,92 +98,222 @@ def try_python_docx_enhanced(docx_path):
         print(f"Enhanced python-docx failed: {str(e)}")
         return None
 
+def iter_plain_markdown(content):
+    """
+    Generate Markdown lines for plain extracted text, one source line at a time
+    """
+    from html_markdown import plain_line_markdown
+
+    start = 0
+    while start <= len(content):
+        end = content.find('\n', start)
+        if end < 0:
+            end = len(content)
+        line = content[start:end].strip()
+        start = end + 1
+        if line:
+            yield plain_line_markdown(line)
+            yield ""  # Add spacing
+
 def convert_to_markdown(content, output_path):
     """
     Convert extracted content to markdown format
+
+    Returns a MarkdownOutput (truthy) once the file is in place, or False.
     """
     if not content:
         return False
     
-    # Basic markdown conversion
-    lines = content.split('\n')
-    md_lines = []
+    from html_markdown import HTMLMarkdown, MarkdownText
     
-    for line in lines:
-        line = line.strip()
-        if not line:
-            continue
-        
-        # Detect headings (simple heuristic)
-        if line.isupper() and len(line) < 100:
-            md_lines.append(f"# {line}")
-        elif line.endswith(':') and len(line) < 100:
-            md_lines.append(f"## {line}")
-        elif line.startswith(('•', '-', '*', '1.', '2.', '3.', '4.', '5.', '6.', '7.', '8.', '9.')):
-            # Convert to markdown list
-            line = line.replace('•', '-').replace('*', '-')
-            md_lines.append(line)
+    with MarkdownWriter(output_path) as writer:
+        if isinstance(content, HTMLMarkdown):
+            content.write_to(writer.write_line)
+        elif isinstance(content, MarkdownText):
+            # Already structured Markdown, e.g. from Mammoth
+            writer.write(content)
         else:
-            md_lines.append(line)
-        
-        md_lines.append("")  # Add spacing
+            # Basic markdown conversion with simple heading and list heuristics
+            writer.write_lines(iter_plain_markdown(content))
     
-    final_content = '\n'.join(md_lines)
+    return writer.result
+
+BACKENDS = [
+    ("Mammoth", try_mammoth),
+    ("Textract", try_textract),
+    ("Docx2txt", try_docx2txt),
+    ("Enhanced python-docx", try_python_docx_enhanced)
+]
+
+# Third-party module each backend imports; backends not listed are always available
+BACKEND_MODULES = {
+    "Mammoth": "mammoth",
+    "Textract": "textract",
+    "Docx2txt": "docx2txt",
+}
+
+def available_backends(cache_path=backend_registry.AVAILABILITY_CACHE_FILE):
+    """
+    Backends whose library is installed, probed once and cached on disk
+
+    Nothing is imported here; each backend imports its library the first
+    time it is actually run.
+    """
+    availability = backend_registry.probe_modules(BACKEND_MODULES.values(), cache_path)
+    return [(name, func) for name, func in BACKENDS
+            if availability.get(BACKEND_MODULES.get(name), True)]
+
+def extract_sequentially(docx_file, methods):
+    """
+    Try each backend in turn until one returns content
+
+    Returns (method_name, content, outcomes) like backend_race.race_backends.
+    """
+    outcomes = {}
+    for method_name, method_func in methods:
+        print(f"\nTrying {method_name}...")
+        started = time.perf_counter()
+        content = method_func(docx_file)
+        seconds = time.perf_counter() - started
+        
+        if content and not (isinstance(content, str) and content.isspace()):
+            outcomes[method_name] = {"status": "ok", "seconds": seconds}
+            return method_name, content, outcomes
+        
+        outcomes[method_name] = {"status": "empty", "seconds": seconds}
+        print(f"✗ {method_name} failed or returned empty content")
+    return None, None, outcomes
+
+def extract_with_fallbacks(docx_file, stats, race=False, best=False, timeout=None, stagger=0.0, methods=None):
+    """
+    Extract text with the available backends, preferred backends first
+
+    Records every backend outcome in stats and returns (method_name,
+    content, outcomes). timeout defaults to backend_race.DEFAULT_BACKEND_TIMEOUT.
+    """
+    # Try the backends that have worked fastest for similar documents first
+    profile = backend_registry.document_profile(docx_file) if os.path.exists(docx_file) else None
+    methods = backend_registry.rank_backends(methods or available_backends(), stats, profile)
     
-    # Write to file
-    with open(output_path, 'w', encoding='utf-8') as f:
-        f.write(final_content)
+    if race:
+        # Only racing needs the process machinery
+        import backend_race
+        if timeout is None:
+            timeout = backend_race.DEFAULT_BACKEND_TIMEOUT
+        print(f"Racing {', '.join(name for name, _ in methods)}...")
+        method_name, content, outcomes = backend_race.race_backends(
+            docx_file, methods, timeout, wait_for_best=best, stagger=stagger)
+        for name, outcome in outcomes.items():
+            print(f"  {name}: {outcome['status']} in {outcome['seconds']:.2f}s")
+    else:
+        method_name, content, outcomes = extract_sequentially(docx_file, methods)
     
-    return True
+    if profile is not None:
+        for name, outcome in outcomes.items():
+            if outcome["status"] != "cancelled":
+                backend_registry.record_backend_result(stats, profile, name, outcome["status"] == "ok",
+                                                   outcome["seconds"])
+    return method_name, content, outcomes
 
-def main():
-    docx_file = "eduphilo-website-requirements.docx"
-    output_file = "eduphilo-website-requirements.md"
+def serve(args):
+    """
+    Persistent worker: one request per stdin line, one JSON reply per stdout line
+
+    A request is either "input.docx [output.md]" or a JSON object with
+    "input" and optional "output" keys. Backend libraries stay imported
+    between requests, so per-file overhead is only the extraction itself.
+    """
+    methods = available_backends()
+    for name, _ in methods:
+        # Warm up the backend libraries once instead of on the first request
+        if name in BACKEND_MODULES:
+            try:
+                importlib.import_module(BACKEND_MODULES[name])
+            except Exception:
+                pass
+    stats = backend_registry.load_backend_stats(args.stats_file)
     
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        
+        started = time.perf_counter()
+        reply = {"ok": False}
+        try:
+            if line.startswith("{"):
+                request = json.loads(line)
+            else:
+                request = dict(zip(("input", "output"), shlex.split(line)))
+            docx_file = request["input"]
+            output_file = request.get("output") or str(Path(docx_file).with_suffix(".md"))
+            reply.update(input=docx_file, output=output_file)
+            
+            # Keep stdout for replies; backend chatter goes to stderr
+            with contextlib.redirect_stdout(sys.stderr):
+                method_name, content, _ = extract_with_fallbacks(
+                    docx_file, stats, args.race, args.best, args.timeout, args.stagger, methods)
+                reply["backend"] = method_name
+                reply["ok"] = bool(content and convert_to_markdown(content, output_file))
+            if not reply["ok"]:
+                reply["error"] = "All extraction methods failed"
+        except Exception as e:
+            reply["error"] = str(e)
+        
+        reply["seconds"] = round(time.perf_counter() - started, 4)
+        sys.stdout.write(json.dumps(reply) + "\n")
+        sys.stdout.flush()
+        
+        try:
+            backend_registry.save_backend_stats(stats, args.stats_file)
+        except OSError as e:
+            print(f"Could not save backend stats: {str(e)}", file=sys.stderr)
+    return 0
+
+def extract_and_convert(docx_file, output_file, args, trace=NULL_TRACE):
+    """
+    Extract a document with the fallback backends and write it as Markdown
+
+    Time is traced in "extract" (with one entry per backend tried) and
+    "markdown" stages.
+    """
     print("=== ROBUST DOCUMENT EXTRACTION ===")
     
-    # Try different methods
-    methods = [
-        ("Mammoth", try_mammoth),
-        ("Textract", try_textract),
-        ("Docx2txt", try_docx2txt),
-        ("Enhanced python-docx", try_python_docx_enhanced)
-    ]
-    
-    extracted_content = None
+    stats = backend_registry.load_backend_stats(args.stats_file)
+    with trace.stage("extract"):
+        method_name, extracted_content, outcomes = extract_with_fallbacks(
+            docx_file, stats, args.race, args.best, args.timeout, args.stagger)
+    for name, outcome in outcomes.items():
+        trace.add_time(f"extract/{name}", outcome["seconds"])
+        trace.count(f"backend_{outcome['status']}")
+    try:
+        backend_registry.save_backend_stats(stats, args.stats_file)
+    except OSError as e:
+        print(f"Could not save backend stats: {str(e)}")
     
-    for method_name, method_func in methods:
-        print(f"\nTrying {method_name}...")
-        content = method_func(docx_file)
-        
-        if content and len(content.strip()) > 0:
-            print(f"✓ {method_name} succeeded!")
-            print(f"Content length: {len(content)} characters")
+    if extracted_content:
+        print(f"✓ {method_name} succeeded!")
+        # Streamed HTML has no text yet; it is previewed once written
+        if isinstance(extracted_content, str):
+            print(f"Content length: {len(extracted_content)} characters")
             print("Preview:")
             print("-" * 50)
-            print(content[:500] + "..." if len(content) > 500 else content)
+            print(extracted_content[:500] + "..." if len(extracted_content) > 500 else extracted_content)
             print("-" * 50)
-            
-            extracted_content = content
-            break
-        else:
-            print(f"✗ {method_name} failed or returned empty content")
-    
-    if extracted_content:
+        
         print(f"\n=== CONVERTING TO MARKDOWN ===")
-        success = convert_to_markdown(extracted_content, output_file)
+        with trace.stage("markdown"):
+            output = convert_to_markdown(extracted_content, output_file)
         
-        if success:
+        if output:
             print(f"✓ Successfully converted to '{output_file}'")
             
-            # Show final result
-            with open(output_file, 'r', encoding='utf-8') as f:
-                final_content = f.read()
-                print(f"Final markdown length: {len(final_content)} characters")
-                print("\nFinal markdown preview:")
-                print("-" * 50)
-                print(final_content[:1000] + "..." if len(final_content) > 1000 else final_content)
-                print("-" * 50)
+            # Show final result, previewed while it was written
+            print(f"Final markdown length: {output.chars} characters")
+            print("\nFinal markdown preview:")
+            print("-" * 50)
+            print(preview_text(output, 1000))
+            print("-" * 50)
         else:
             print("✗ Markdown conversion failed")
     else:
@@ -186,5 +324,42 @@ def main():
         print("- Contains only images or embedded objects")
         print("- In a different format")
 
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Extract a .docx file with several fallback backends")
+    parser.add_argument("docx_file", nargs="?", default="eduphilo-website-requirements.docx")
+    parser.add_argument("output_file", nargs="?", default="eduphilo-website-requirements.md")
+    parser.add_argument("--race", action="store_true",
+                        help="Run all backends concurrently and take the first usable result")
+    parser.add_argument("--best", action="store_true",
+                        help="With --race, wait for every backend and take the highest scoring result")
+    parser.add_argument("--timeout", type=float,
+                        help="Per-backend timeout in seconds for --race (default: 60)")
+    parser.add_argument("--stagger", type=float, default=0.0,
+                        help="Seconds between backend starts for --race, preferred backends first")
+    parser.add_argument("--stats-file", default=backend_registry.BACKEND_STATS_FILE,
+                        help="Where backend success and timing history is kept")
+    parser.add_argument("--serve", action="store_true",
+                        help="Stay running and convert the files named on stdin, one per line")
+    parser.add_argument("--trace", metavar="PATH",
+                        help="Write a JSON trace of per-stage timings to PATH (a file or directory)")
+    parser.add_argument("--profile", choices=PROFILERS,
+                        help="Add a cProfile or sampling profile to the trace")
+    args = parser.parse_args(argv)
+    
+    if args.serve:
+        return serve(args)
+    
+    docx_file = args.docx_file
+    output_file = args.output_file
+    
+    if args.trace or args.profile:
+        trace = Trace("robust", docx_file, args.trace or ".", args.profile)
+    else:
+        trace = trace_from_environment("robust", docx_file)
+    try:
+        extract_and_convert(docx_file, output_file, args, trace)
+    finally:
+        trace.close()
+
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,213 @@
+// Client for the static search index written by search_index.py
+//
+// meta.json is fetched once; each query term then fetches only the small
+// shard holding its prefix, and shards are cached for the page's lifetime.
+// Tokenizing, stemming and scoring mirror search_index.py exactly.
+(() => {
+    const TOKENIZER_VERSION = 1;
+    const MIN_STEM = 3;
+    const STOPWORDS = new Set((
+        'a an and are as at be but by for from has have in into is it its of on or our that the their this to was ' +
+        'we were which will with you your'
+    ).split(' '));
+    const SUFFIX_RULES = [
+        ['ational', 'ate'], ['ations', 'ate'], ['ation', 'ate'], ['ies', 'y'], ['sses', 'ss'],
+        ['ness', ''], ['ments', ''], ['ment', ''], ['ings', ''], ['ing', ''], ['edly', ''], ['ed', ''],
+        ['ly', ''], ['s', ''],
+    ];
+
+    // Python's len() counts code points, not UTF-16 units
+    const length = (text) => Array.from(text).length;
+
+    const stem = (word) => {
+        for (const [suffix, replacement] of SUFFIX_RULES) {
+            if (word.endsWith(suffix) && length(word) - suffix.length >= MIN_STEM) {
+                if (suffix === 's' && /(ss|us|is)$/.test(word)) {
+                    break;
+                }
+                word = word.slice(0, word.length - suffix.length) + replacement;
+                break;
+            }
+        }
+        if (word.endsWith('e') && length(word) > MIN_STEM + 1) {
+            word = word.slice(0, -1);
+        }
+        return word;
+    };
+
+    const tokenize = (text) => {
+        const words = text.normalize('NFKC').toLowerCase().match(/[\p{L}\p{N}]+/gu) || [];
+        return words
+            .filter((word) => !STOPWORDS.has(word))
+            .map(stem)
+            .filter((term) => length(term) >= 2);
+    };
+
+    const shardName = (term, prefixLength) => {
+        const prefix = Array.from(term).slice(0, prefixLength).join('');
+        if (/^[a-z0-9]+$/.test(prefix)) {
+            return prefix;
+        }
+        const bytes = new TextEncoder().encode(prefix);
+        return '_' + Array.from(bytes, (byte) => byte.toString(16).padStart(2, '0')).join('');
+    };
+
+    class SiteSearch {
+        constructor(baseUrl = 'search/') {
+            this.baseUrl = baseUrl.endsWith('/') ? baseUrl : baseUrl + '/';
+            this.meta = null;
+            this.shards = new Map();
+        }
+
+        async load() {
+            if (!this.meta) {
+                this.meta = fetch(this.baseUrl + 'meta.json').then((response) => {
+                    if (!response.ok) {
+                        throw new Error(`Search index unavailable (${response.status})`);
+                    }
+                    return response.json();
+                }).then((meta) => {
+                    if (meta.tokenizer !== TOKENIZER_VERSION) {
+                        throw new Error('Search index was built with a different tokenizer');
+                    }
+                    return meta;
+                });
+                this.meta.catch(() => { this.meta = null; });
+            }
+            return this.meta;
+        }
+
+        async shard(name) {
+            const meta = await this.load();
+            if (!(name in meta.shards)) {
+                return {};
+            }
+            if (!this.shards.has(name)) {
+                // The content hash in the URL lets the browser cache shards indefinitely
+                const request = fetch(`${this.baseUrl}${name}.json?v=${meta.shards[name]}`)
+                    .then((response) => (response.ok ? response.json() : {}));
+                this.shards.set(name, request);
+                request.catch(() => this.shards.delete(name));
+            }
+            return this.shards.get(name);
+        }
+
+        async postings(term, prefix) {
+            const meta = await this.load();
+            const shard = await this.shard(shardName(term, meta.prefix_length));
+            const terms = prefix ? Object.keys(shard).filter((key) => key.startsWith(term)) : [term];
+            const result = new Map();
+            for (const key of terms) {
+                const flat = shard[key] || [];
+                let docId = 0;
+                for (let i = 0; i < flat.length; i += 2) {
+                    docId += flat[i];
+                    result.set(docId, (result.get(docId) || 0) + flat[i + 1]);
+                }
+            }
+            return result;
+        }
+
+        // Documents containing every query term, best BM25 score first.
+        // Unless the query ends in a space, its last word also matches as a prefix.
+        async search(query, limit = 10) {
+            const terms = tokenize(query);
+            if (!terms.length) {
+                return [];
+            }
+            const meta = await this.load();
+            const last = terms[terms.length - 1];
+            const prefixLast = !query.endsWith(' ') && length(last) >= meta.prefix_length;
+            const unique = Array.from(new Set(terms));
+            const allPostings = await Promise.all(
+                unique.map((term) => this.postings(term, prefixLast && term === last)));
+
+            const documents = meta.documents;
+            const { k1, b } = meta.bm25;
+            const average = meta.average_length || 1;
+            let scores = null;
+            for (const postings of allPostings) {
+                const idf = Math.log(1 + (documents.length - postings.size + 0.5) / (postings.size + 0.5));
+                const termScores = new Map();
+                for (const [docId, frequency] of postings) {
+                    const docLength = documents[docId][3];
+                    termScores.set(docId, idf * frequency * (k1 + 1) /
+                        (frequency + k1 * (1 - b + b * docLength / average)));
+                }
+                if (scores === null) {
+                    scores = termScores;
+                } else {
+                    const combined = new Map();
+                    for (const [docId, score] of scores) {
+                        if (termScores.has(docId)) {
+                            combined.set(docId, score + termScores.get(docId));
+                        }
+                    }
+                    scores = combined;
+                }
+                if (!scores.size) {
+                    return [];
+                }
+            }
+
+            return Array.from(scores)
+                .sort((x, y) => y[1] - x[1] || x[0] - y[0])
+                .slice(0, limit)
+                .map(([docId, score]) => ({
+                    url: documents[docId][0],
+                    title: documents[docId][1],
+                    snippet: documents[docId][2],
+                    score,
+                }));
+        }
+    }
+
+    // Wire up <input data-search-input> with <div data-search-results> on the same page
+    const attach = () => {
+        const input = document.querySelector('[data-search-input]');
+        const results = document.querySelector('[data-search-results]');
+        if (!input || !results) {
+            return;
+        }
+        const search = new SiteSearch(input.dataset.searchIndex || 'search/');
+        let latest = 0;
+        input.addEventListener('focus', () => search.load().catch(() => {}), { once: true });
+        input.addEventListener('input', async () => {
+            const ticket = ++latest;
+            let found = [];
+            try {
+                found = await search.search(input.value, 8);
+            } catch (error) {
+                console.error('Search failed:', error);
+            }
+            if (ticket !== latest) {
+                return;  // A newer query is already on its way
+            }
+            results.replaceChildren(...found.map((result) => {
+                const link = document.createElement('a');
+                link.href = result.url;
+                link.className = 'block px-4 py-3 hover:bg-gray-50';
+                const title = document.createElement('div');
+                title.className = 'font-semibold text-eduphilo-blue';
+                title.textContent = result.title;
+                const snippet = document.createElement('div');
+                snippet.className = 'text-sm text-gray-600';
+                snippet.textContent = result.snippet;
+                link.append(title, snippet);
+                return link;
+            }));
+        });
+    };
+
+    const api = { SiteSearch, tokenize, stem, shardName };
+    if (typeof module !== 'undefined' && module.exports) {
+        module.exports = api;
+    } else {
+        window.EduPhiloSearch = api;
+        if (document.readyState === 'loading') {
+            document.addEventListener('DOMContentLoaded', attach);
+        } else {
+            attach();
+        }
+    }
+})();
@@ -0,0 +1,454 @@
+import argparse
+import contextlib
+import hashlib
+import json
+import math
+import os
+import re
+import sys
+import time
+import unicodedata
+from collections import Counter, defaultdict
+from html.parser import HTMLParser
+
+from deep_analyzer import extract_raw_text
+from markdown_html import heading_id
+from markdown_writer import atomic_write
+from site_builder import select_sections, split_markdown
+from verify_content import DEFAULT_PAGES, SKIPPED_TAGS, VOID_TAGS
+
+INDEX_VERSION = 1
+# Bump whenever tokenize() or stem() change; search.js must implement the same version
+TOKENIZER_VERSION = 1
+DEFAULT_OUTPUT_DIR = "search"
+META_FILE = "meta.json"
+PREFIX_LENGTH = 2
+SNIPPET_CHARS = 160
+CHUNK_WORDS = 200
+DEFAULT_LIMIT = 10
+
+# BM25 parameters, shared with search.js through meta.json
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have in into is it its of on or our that the their this to was
+we were which will with you your
+""".split())
+
+# Suffix rules applied first match only, then a trailing "e" is dropped; search.js mirrors these exactly
+SUFFIX_RULES = (
+    ("ational", "ate"), ("ations", "ate"), ("ation", "ate"), ("ies", "y"), ("sses", "ss"),
+    ("ness", ""), ("ments", ""), ("ment", ""), ("ings", ""), ("ing", ""), ("edly", ""), ("ed", ""),
+    ("ly", ""), ("s", ""),
+)
+MIN_STEM = 3
+
+HEADING_TAGS = {"h1", "h2", "h3", "h4"}
+
+_WORD = re.compile(r"[^\W_]+")
+# Names shard_name() can produce: a short ASCII prefix, or up to 4 UTF-8 bytes per character in hex
+_SHARD_NAME = re.compile(rf"(?:[a-z0-9]{{1,{PREFIX_LENGTH}}}|_(?:[0-9a-f]{{2}}){{1,{4 * PREFIX_LENGTH}}})")
+_MARKDOWN_LINK_TARGET = re.compile(r"\]\([^)]*\)")
+_MARKDOWN_MARKUP = re.compile(r"<[^>\n]+>|^\s*#+\s*|[*_`|]+|^\s*(?:[-+]|\d+\.)\s+|-{3,}", re.M)
+
+def stem(word):
+    """
+    Light suffix-stripping stemmer, kept simple so search.js can match it exactly
+    """
+    for suffix, replacement in SUFFIX_RULES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM:
+            if suffix == "s" and word.endswith(("ss", "us", "is")):
+                break
+            word = word[:-len(suffix)] + replacement
+            break
+    if word.endswith("e") and len(word) > MIN_STEM + 1:
+        word = word[:-1]
+    return word
+
+def tokenize(text):
+    """
+    Index terms of text: NFKC-normalized, lowercased, stemmed, stopwords dropped
+    """
+    text = unicodedata.normalize("NFKC", text).lower()
+    terms = []
+    for word in _WORD.findall(text):
+        if word in STOPWORDS:
+            continue
+        term = stem(word)
+        if len(term) >= 2:
+            terms.append(term)
+    return terms
+
+def shard_name(term):
+    """
+    Shard holding a term: its first PREFIX_LENGTH characters, hex-encoded unless plain ASCII
+    """
+    prefix = term[:PREFIX_LENGTH]
+    if re.fullmatch(r"[a-z0-9]+", prefix):
+        return prefix
+    return "_" + prefix.encode("utf-8").hex()
+
+def _snippet(text):
+    text = " ".join(text.split())
+    if len(text) <= SNIPPET_CHARS:
+        return text
+    return text[:SNIPPET_CHARS].rsplit(" ", 1)[0] + "…"
+
+class PageSectionParser(HTMLParser):
+    """
+    Split a page's visible text into sections at h1-h4 headings
+
+    Each section links to its heading's id or, failing that, the id of the
+    innermost element enclosing the heading, so results land on the
+    nearest anchor. Navigation, footers and other chrome are skipped as in
+    verify_content.
+    """
+    def __init__(self):
+        HTMLParser.__init__(self, convert_charrefs=True)
+        self.open = []
+        self.anchor = ""
+        self.skipping = []
+        self.heading = None
+        self.sections = []
+        self._start("", "")
+
+    def _start(self, title, anchor):
+        self.sections.append({"title": title, "anchor": anchor, "text": []})
+
+    def handle_starttag(self, tag, attrs):
+        if self.skipping:
+            if tag == self.skipping[-1] and tag not in VOID_TAGS:
+                self.skipping.append(tag)
+            return
+        if tag in SKIPPED_TAGS and tag not in VOID_TAGS:
+            self.skipping.append(tag)
+            return
+        if tag not in VOID_TAGS:
+            self.open.append((tag, dict(attrs).get("id")))
+        if tag in HEADING_TAGS:
+            self.heading = [tag]
+            self.anchor = next((element_id for _, element_id in reversed(self.open) if element_id), "")
+
+    def handle_endtag(self, tag):
+        if self.skipping:
+            if self.skipping[-1] == tag:
+                self.skipping.pop()
+            return
+        # Elements left open by the markup (e.g. <p>, <li>) close with their parent
+        if any(open_tag == tag for open_tag, _ in self.open):
+            while self.open and self.open.pop()[0] != tag:
+                pass
+        if self.heading and tag == self.heading[0]:
+            title = " ".join("".join(self.heading[1:]).split())
+            self.heading = None
+            if title:
+                self._start(title, self.anchor)
+                self.sections[-1]["text"].append(title)
+
+    def handle_data(self, data):
+        if self.skipping:
+            return
+        if self.heading is not None:
+            self.heading.append(data)
+        else:
+            self.sections[-1]["text"].append(data)
+
+def html_documents(path, url=None):
+    """
+    Searchable documents of an HTML page, one per heading section
+
+    Results link to url, by default the path itself.
+    """
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        parser = PageSectionParser()
+        parser.feed(f.read())
+        parser.close()
+    url = url or path.replace(os.sep, "/")
+    documents = []
+    for section in parser.sections:
+        text = " ".join(" ".join(section["text"]).split())
+        if not text:
+            continue
+        body = text[len(section["title"]):] if section["title"] else text
+        documents.append({
+            "url": url + (f"#{section['anchor']}" if section["anchor"] else ""),
+            "title": section["title"] or os.path.splitext(os.path.basename(path))[0].title(),
+            "snippet": _snippet(body),
+            "text": text,
+        })
+    return documents
+
+def markdown_documents(path, split_level=2, site_config=None):
+    """
+    Searchable documents of converted Markdown, one per heading section
+
+    With a site_builder config, sections link to the pages built from
+    them instead of to the Markdown file.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        sections = split_markdown(f.read(), split_level)
+
+    pages = {}
+    if site_config:
+        with open(site_config, "r", encoding="utf-8") as f:
+            config = json.load(f)
+        output = config.get("output", "site")
+        for name, page in config.get("pages", {}).items():
+            for entry in select_sections(sections, page.get("sections", [])):
+                pages.setdefault(id(entry), f"{output}/{name}")
+
+    documents = []
+    for entry in sections:
+        text = _MARKDOWN_MARKUP.sub(" ", _MARKDOWN_LINK_TARGET.sub("] ", entry["markdown"]))
+        text = " ".join(text.replace("[", " ").replace("]", " ").split())
+        if not text:
+            continue
+        title = entry["path"][-1] if entry["path"] else ""
+        url = pages.get(id(entry), path.replace(os.sep, "/"))
+        documents.append({
+            "url": url + (f"#{heading_id(title)}" if title else ""),
+            "title": title or os.path.basename(path),
+            "snippet": _snippet(text[len(title):] if title and text.startswith(title) else text),
+            "text": text,
+        })
+    return documents
+
+def docx_documents(path):
+    """
+    Searchable documents of a .docx file's raw text, in chunks of about CHUNK_WORDS words
+    """
+    raw_text = extract_raw_text(path)
+    if raw_text is None:
+        raise ValueError(f"Could not read '{path}'")
+    documents = []
+    chunk = []
+    words = 0
+    for line in raw_text.split("\n") + [None]:
+        if line is not None and line.strip():
+            chunk.append(line.strip())
+            words += len(line.split())
+        if chunk and (line is None or words >= CHUNK_WORDS):
+            text = " ".join(chunk)
+            documents.append({
+                "url": path.replace(os.sep, "/"),
+                "title": chunk[0][:80],
+                "snippet": _snippet(text),
+                "text": text,
+            })
+            chunk = []
+            words = 0
+    return documents
+
+def load_documents(path, split_level=2, site_config=None):
+    """
+    Searchable documents of a .html page, converted Markdown or a .docx file
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".html", ".htm"):
+        return html_documents(path)
+    if extension == ".docx":
+        return docx_documents(path)
+    return markdown_documents(path, split_level, site_config)
+
+def build_postings(documents):
+    """
+    Inverted index {term: [doc id delta, term frequency, ...]} plus document lengths
+
+    Postings are in document order with ids delta-encoded, which keeps
+    the shards small.
+    """
+    postings = defaultdict(list)
+    lengths = []
+    for doc_id, document in enumerate(documents):
+        terms = tokenize(document["text"])
+        lengths.append(len(terms))
+        for term, frequency in Counter(terms).items():
+            postings[term].append((doc_id, frequency))
+
+    index = {}
+    for term, entries in postings.items():
+        flat = []
+        previous = 0
+        for doc_id, frequency in entries:
+            flat.extend((doc_id - previous, frequency))
+            previous = doc_id
+        index[term] = flat
+    return index, lengths
+
+def _write_if_changed(path, text):
+    # Unchanged shards keep their bytes and mtime, so caches and deploys skip them
+    with contextlib.suppress(OSError):
+        with open(path, "r", encoding="utf-8") as f:
+            if f.read() == text:
+                return False
+    with atomic_write(path) as f:
+        f.write(text)
+    return True
+
+def write_index(documents, output_dir=DEFAULT_OUTPUT_DIR):
+    """
+    Write the index as meta.json plus one JSON shard per term prefix
+
+    meta.json lists every document's url, title, snippet and length, the
+    BM25 parameters and a content hash per shard, which clients append to
+    shard URLs so shards can be cached indefinitely. Shards no term uses
+    any more are removed if the previous meta.json listed them; other files
+    in output_dir are never touched. Returns (shard count, shards rewritten).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    index, lengths = build_postings(documents)
+    previous_shards = {}
+    with contextlib.suppress(OSError, ValueError, AttributeError):
+        with open(os.path.join(output_dir, META_FILE), "r", encoding="utf-8") as f:
+            previous_shards = json.load(f).get("shards") or {}
+
+    shards = defaultdict(dict)
+    for term in sorted(index):
+        shards[shard_name(term)][term] = index[term]
+
+    versions = {}
+    written = 0
+    for name, terms in shards.items():
+        text = json.dumps(terms, ensure_ascii=False, separators=(",", ":"))
+        versions[name] = hashlib.sha256(text.encode("utf-8")).hexdigest()[:10]
+        written += _write_if_changed(os.path.join(output_dir, f"{name}.json"), text)
+
+    # Only shards the previous meta.json listed are ours to remove
+    for name in set(previous_shards) - set(shards):
+        if isinstance(name, str) and _SHARD_NAME.fullmatch(name):
+            with contextlib.suppress(OSError):
+                os.remove(os.path.join(output_dir, f"{name}.json"))
+
+    meta = {
+        "version": INDEX_VERSION,
+        "tokenizer": TOKENIZER_VERSION,
+        "prefix_length": PREFIX_LENGTH,
+        "bm25": {"k1": BM25_K1, "b": BM25_B},
+        "average_length": sum(lengths) / len(lengths) if lengths else 0,
+        "documents": [[document["url"], document["title"], document["snippet"], length]
+                      for document, length in zip(documents, lengths)],
+        "shards": versions,
+    }
+    _write_if_changed(os.path.join(output_dir, META_FILE),
+                      json.dumps(meta, ensure_ascii=False, separators=(",", ":")))
+    return len(shards), written
+
+class SearchIndex:
+    """
+    Query a written index the way search.js does, loading shards on demand
+    """
+    def __init__(self, output_dir=DEFAULT_OUTPUT_DIR):
+        self.output_dir = output_dir
+        with open(os.path.join(output_dir, META_FILE), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("tokenizer") != TOKENIZER_VERSION:
+            raise ValueError("Index was built with a different tokenizer; rebuild it")
+        self.shards = {}
+
+    def shard(self, name):
+        if name not in self.shards:
+            if name in self.meta["shards"]:
+                with open(os.path.join(self.output_dir, f"{name}.json"), "r", encoding="utf-8") as f:
+                    self.shards[name] = json.load(f)
+            else:
+                self.shards[name] = {}
+        return self.shards[name]
+
+    def postings(self, term, prefix=False):
+        """
+        {doc id: term frequency} for a term, or for every term starting with it
+        """
+        shard = self.shard(shard_name(term))
+        terms = [key for key in shard if key.startswith(term)] if prefix else [term]
+        result = {}
+        for key in terms:
+            flat = shard.get(key, [])
+            doc_id = 0
+            for i in range(0, len(flat), 2):
+                doc_id += flat[i]
+                result[doc_id] = result.get(doc_id, 0) + flat[i + 1]
+        return result
+
+    def search(self, query, limit=DEFAULT_LIMIT):
+        """
+        Documents containing every query term, best BM25 score first
+
+        Unless the query ends in a space, its last word also matches as a
+        prefix, for search-as-you-type.
+        """
+        terms = tokenize(query)
+        if not terms:
+            return []
+        prefix_last = not query.endswith(" ") and len(terms[-1]) >= PREFIX_LENGTH
+        documents = self.meta["documents"]
+        count = len(documents)
+        k1 = self.meta["bm25"]["k1"]
+        b = self.meta["bm25"]["b"]
+        average = self.meta["average_length"] or 1
+
+        scores = None
+        for term in dict.fromkeys(terms):
+            postings = self.postings(term, prefix_last and term == terms[-1])
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            term_scores = {}
+            for doc_id, frequency in postings.items():
+                length = documents[doc_id][3]
+                term_scores[doc_id] = idf * frequency * (k1 + 1) / (
+                    frequency + k1 * (1 - b + b * length / average))
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {doc_id: score + term_scores[doc_id] for doc_id, score in scores.items()
+                          if doc_id in term_scores}
+            if not scores:
+                return []
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return [{"url": documents[doc_id][0], "title": documents[doc_id][1], "snippet": documents[doc_id][2],
+                 "score": round(score, 4)} for doc_id, score in ranked]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a sharded full-text search index of the site content")
+    parser.add_argument("sources", nargs="*",
+                        help="HTML pages, converted Markdown or .docx files "
+                             "(default: the site pages and eduphilo-website-requirements.md)")
+    parser.add_argument("-o", "--output-dir", default=DEFAULT_OUTPUT_DIR)
+    parser.add_argument("--level", type=int, default=2, choices=range(1, 7),
+                        help="Markdown heading level that starts a new document")
+    parser.add_argument("--site", metavar="CONFIG", help="site_builder config mapping Markdown sections to pages")
+    parser.add_argument("--query", help="Search an existing index instead of building one")
+    parser.add_argument("-n", "--limit", type=int, default=DEFAULT_LIMIT)
+    args = parser.parse_args(argv)
+
+    if args.query is not None:
+        try:
+            started = time.perf_counter()
+            results = SearchIndex(args.output_dir).search(args.query, args.limit)
+            elapsed = (time.perf_counter() - started) * 1000
+        except (OSError, ValueError) as e:
+            print(f"Error searching index: {str(e)}")
+            return 1
+        for result in results:
+            print(f"{result['score']:8.3f}  {result['title']}  ({result['url']})\n          {result['snippet']}")
+        print(f"{len(results)} results in {elapsed:.1f} ms")
+        return 0 if results else 1
+
+    sources = args.sources or [page for page in DEFAULT_PAGES + ["gallery.html", "eduphilo-website-requirements.md"]
+                               if os.path.exists(page)]
+    started = time.perf_counter()
+    try:
+        documents = []
+        for source in sources:
+            documents.extend(load_documents(source, args.level, args.site))
+        shard_count, written = write_index(documents, args.output_dir)
+    except (OSError, ValueError) as e:
+        print(f"Error building index: {str(e)}")
+        return 1
+    elapsed = (time.perf_counter() - started) * 1000
+    print(f"Indexed {len(documents)} documents from {len(sources)} sources into {shard_count} shards "
+          f"in '{args.output_dir}' ({written} rewritten) in {elapsed:.1f} ms")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
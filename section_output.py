@@ -0,0 +1,245 @@
+import argparse
+import contextlib
+import hashlib
+import json
+import mmap
+import os
+import re
+import sys
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+import docx_ir
+from conversion_trace import traced
+from convert_docx_to_md import MarkdownBlockRenderer
+from markdown_writer import MarkdownWriter, atomic_write
+
+INDEX_VERSION = 2
+INDEX_FILE = "index.json"
+DEFAULT_SPLIT_LEVEL = 2
+DEFAULT_WORKERS = 4
+SLUG_LENGTH = 40
+
+def slugify(title):
+    """
+    File-name friendly form of a heading
+    """
+    slug = re.sub(r"[^a-z0-9]+", "-", title.lower()).strip("-")
+    return slug[:SLUG_LENGTH].rstrip("-") or "section"
+
+def iter_sections(document, split_level=DEFAULT_SPLIT_LEVEL):
+    """
+    Render a document like convert_docx_to_markdown, cut at headings
+
+    Yields (heading path, level, lines) per section. A section starts at
+    every heading of split_level or above; content before the first one
+    is a section with an empty path. Joining every section's lines with
+    newlines gives exactly the output of convert_docx_to_markdown.
+    """
+    lines = []
+    renderer = MarkdownBlockRenderer(lines.append)
+    stack = []
+    path = []
+    level = 0
+    for block in document.blocks:
+        if isinstance(block, docx_ir.Heading) and block.level <= split_level and block.text.strip():
+            # Close any open list first, so its trailing blank line stays behind
+            renderer.finish()
+            if lines or path:
+                yield path, level, lines
+            lines = []
+            renderer.write_line = lines.append
+            while stack and stack[-1][0] >= block.level:
+                stack.pop()
+            stack.append((block.level, block.text.strip()))
+            path = [title for _, title in stack]
+            level = block.level
+        renderer.block(block)
+    renderer.finish()
+    if lines or path:
+        yield path, level, lines
+
+def _write_section(output_path, lines):
+    with MarkdownWriter(output_path, preview_chars=0) as writer:
+        writer.write_lines(lines)
+    return writer.chars
+
+def _save_index(path, index):
+    with atomic_write(path) as f:
+        json.dump(index, f, ensure_ascii=False, indent=1)
+
+@traced("sections")
+def convert_docx_to_markdown_sections(docx_path, output_dir=None, split_level=DEFAULT_SPLIT_LEVEL,
+                                      workers=DEFAULT_WORKERS, document=None, trace=None):
+    """
+    Convert a .docx file to one Markdown file per section, plus an index
+
+    Sections are rendered in order and written by a pool of threads as
+    they become ready. The single-file output of convert_docx_to_markdown,
+    where sections are separated by one newline, is written alongside as
+    <document>.md. index.json names that file with its SHA-256 and lists
+    every section's file, heading path and level, with its byte offset,
+    length and SHA-256 in it. Files the previous index listed that this
+    run did not write are removed. Returns the index (truthy) on success, False on failure.
+    """
+    try:
+        if not os.path.exists(docx_path):
+            print(f"Error: File '{docx_path}' not found.")
+            return False
+
+        if document is None:
+            with trace.stage("load"):
+                document = docx_ir.load_document(docx_path, trace)
+
+        if output_dir is None:
+            output_dir = f"{Path(docx_path).stem}.sections"
+        os.makedirs(output_dir, exist_ok=True)
+
+        markdown_name = f"{Path(docx_path).stem}.md"
+        digest = hashlib.sha256()
+        entries = []
+        offset = 0
+        with trace.stage("render"), ThreadPoolExecutor(max_workers=workers) as executor, \
+                MarkdownWriter(os.path.join(output_dir, markdown_name), preview_chars=0) as combined:
+            pending = set()
+            for number, (path, level, lines) in enumerate(iter_sections(document, split_level), 1):
+                file_name = f"{number:04d}-{slugify(path[-1]) if path else 'preamble'}.md"
+                data = "\n".join(lines).encode("utf-8")
+                entries.append({
+                    "file": file_name,
+                    "title": path[-1] if path else "",
+                    "path": path,
+                    "level": level,
+                    "offset": offset,
+                    "bytes": len(data),
+                    "sha256": hashlib.sha256(data).hexdigest(),
+                })
+                if offset:
+                    digest.update(b"\n")
+                digest.update(data)
+                offset += len(data) + 1
+                combined.write_lines(lines)
+
+                if len(pending) >= workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        future.result()
+                pending.add(executor.submit(_write_section, os.path.join(output_dir, file_name), lines))
+            for future in pending:
+                future.result()
+        trace.count("sections", len(entries))
+
+        # Only files the previous index listed are removed; anything else in the directory is not ours
+        previous = {}
+        with contextlib.suppress(OSError, ValueError):
+            with open(os.path.join(output_dir, INDEX_FILE), "r", encoding="utf-8") as f:
+                previous = json.load(f)
+        if isinstance(previous, dict):
+            current = {entry["file"] for entry in entries} | {markdown_name}
+            stale = {entry.get("file") for entry in previous.get("sections", []) if isinstance(entry, dict)}
+            stale.add(previous.get("markdown"))
+            for name in stale - current:
+                if isinstance(name, str) and name and os.path.basename(name) == name:
+                    with contextlib.suppress(OSError):
+                        os.remove(os.path.join(output_dir, name))
+
+        index = {
+            "version": INDEX_VERSION,
+            "source": str(docx_path),
+            "split_level": split_level,
+            "markdown": markdown_name,
+            "sha256": digest.hexdigest(),
+            "total_bytes": max(offset - 1, 0),
+            "sections": entries,
+        }
+        _save_index(os.path.join(output_dir, INDEX_FILE), index)
+
+        print(f"Successfully converted '{docx_path}' to {len(entries)} sections in '{output_dir}'")
+        return index
+
+    except Exception as e:
+        print(f"Error converting file: {str(e)}")
+        return False
+
+def load_index(output_dir):
+    """
+    Read the index.json of a sectioned conversion
+    """
+    with open(os.path.join(output_dir, INDEX_FILE), "r", encoding="utf-8") as f:
+        index = json.load(f)
+    if index.get("version") != INDEX_VERSION:
+        raise ValueError(f"'{output_dir}' was written by an older version; convert the document again")
+    return index
+
+def find_sections(index, query):
+    """
+    Index entries whose heading path contains every '/'-separated part of query
+    """
+    parts = [part.strip().lower() for part in query.split("/") if part.strip()]
+    matches = []
+    for entry in index["sections"]:
+        titles = [title.lower() for title in entry["path"]]
+        position = 0
+        for part in parts:
+            while position < len(titles) and part not in titles[position]:
+                position += 1
+            if position == len(titles):
+                break
+            position += 1
+        else:
+            matches.append(entry)
+    return matches
+
+def read_section(output_dir, entry):
+    """
+    Text of one section from its own file
+    """
+    with open(os.path.join(output_dir, entry["file"]), "r", encoding="utf-8") as f:
+        return f.read()
+
+def read_span(output_dir, index, entry):
+    """
+    Text of one section out of the index's single-file Markdown, via a memory map
+
+    The span is checked against the section's digest, so a Markdown file
+    changed since the index was written raises ValueError instead of
+    returning the wrong bytes.
+    """
+    markdown_path = os.path.join(output_dir, index["markdown"])
+    with open(markdown_path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            data = b""
+        else:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as view:
+                data = view[entry["offset"]:entry["offset"] + entry["bytes"]]
+    if hashlib.sha256(data).hexdigest() != entry["sha256"]:
+        raise ValueError(f"'{markdown_path}' does not match its index; convert the document again")
+    return data.decode("utf-8")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert a .docx file to per-section Markdown files with an index")
+    parser.add_argument("docx_file", nargs="?", default="eduphilo-website-requirements.docx")
+    parser.add_argument("output_dir", nargs="?", help="Default: <document>.sections")
+    parser.add_argument("--level", type=int, default=DEFAULT_SPLIT_LEVEL, choices=range(1, 7),
+                        help="Start a new section at headings of this level or above")
+    parser.add_argument("-j", "--workers", type=int, default=DEFAULT_WORKERS, help="Writer threads")
+    parser.add_argument("--show", metavar="HEADING",
+                        help="Print the sections under a heading path such as 'About/Mission' instead")
+    args = parser.parse_args(argv)
+
+    output_dir = args.output_dir or f"{Path(args.docx_file).stem}.sections"
+    if args.show:
+        try:
+            index = load_index(output_dir)
+        except (OSError, ValueError) as e:
+            print(f"Error reading index: {str(e)}")
+            return 1
+        matches = find_sections(index, args.show)
+        for entry in matches:
+            print(read_section(output_dir, entry))
+        return 0 if matches else 1
+
+    return 0 if convert_docx_to_markdown_sections(args.docx_file, output_dir, args.level, args.workers) else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
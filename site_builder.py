@@ -0,0 +1,345 @@
+import argparse
+import contextlib
+import hashlib
+import html
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.parse import urlsplit
+
+from markdown_html import markdown_to_html
+from markdown_writer import atomic_write
+from section_output import find_sections
+
+BUILDER_VERSION = 2
+DEFAULT_CONFIG = "site.json"
+MANIFEST_FILE = ".site-manifest.json"
+SEARCH_DIR = "search"
+SEARCH_CLIENT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "search.js")
+DEFAULT_SPLIT_LEVEL = 2
+
+# Below this many pages to rebuild, starting worker processes costs more than it saves
+PARALLEL_MIN_PAGES = 4
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+_PLACEHOLDER = re.compile(r"\{\{\s*(>?)\s*([\w./-]+)\s*\}\}")
+
+DEFAULT_TEMPLATE = """<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{{ title }} | {{ site_title }}</title>
+</head>
+<body>
+{{> nav.html }}
+<main>
+{{ content }}
+</main>
+<script src="search.js" defer></script>
+</body>
+</html>
+"""
+
+DEFAULT_NAV = """<nav>
+{{ nav }}
+<input type="search" data-search-input placeholder="Search" aria-label="Search the site" autocomplete="off">
+<div data-search-results></div>
+</nav>
+"""
+
+STARTER_PAGES = [
+    ("index.html", "Home"),
+    ("about.html", "About"),
+    ("services.html", "Services"),
+    ("programs.html", "Programmes"),
+    ("institutions.html", "Institutions"),
+    ("training.html", "Training"),
+    ("contact.html", "Contact"),
+]
+
+def split_markdown(text, split_level=DEFAULT_SPLIT_LEVEL):
+    """
+    Cut Markdown at headings of split_level or above
+
+    Returns section entries shaped like section_output's index: heading
+    path, level, the section's Markdown and a digest of it. Text before
+    the first heading is a section with an empty path.
+    """
+    sections = []
+    stack = []
+    path = []
+    level = 0
+    lines = []
+
+    def close():
+        if lines or path:
+            body = "\n".join(lines)
+            sections.append({
+                "path": path,
+                "level": level,
+                "markdown": body,
+                "digest": hashlib.sha256(body.encode("utf-8")).hexdigest(),
+            })
+
+    for line in text.split("\n"):
+        heading = _HEADING.match(line)
+        if heading and len(heading.group(1)) <= split_level:
+            close()
+            heading_level = len(heading.group(1))
+            while stack and stack[-1][0] >= heading_level:
+                stack.pop()
+            stack.append((heading_level, heading.group(2)))
+            path = [title for _, title in stack]
+            level = heading_level
+            lines = []
+        lines.append(line)
+    close()
+    return sections
+
+def select_sections(sections, queries):
+    """
+    Sections matching any of the heading path queries, in document order
+
+    "*" selects every section.
+    """
+    if "*" in queries:
+        return list(sections)
+    wanted = set()
+    index = {"sections": sections}
+    for query in queries:
+        wanted.update(id(entry) for entry in find_sections(index, query))
+    return [entry for entry in sections if id(entry) in wanted]
+
+def load_template(templates_dir, name, seen=None):
+    """
+    A template with its {{> partial }} includes expanded
+
+    Returns (text, {file name: digest}) covering every file it was built from.
+    """
+    seen = seen or ()
+    if name in seen:
+        raise ValueError(f"Template include cycle: {' -> '.join(seen + (name,))}")
+    with open(os.path.join(templates_dir, name), "r", encoding="utf-8") as f:
+        text = f.read()
+    digests = {name: hashlib.sha256(text.encode("utf-8")).hexdigest()}
+
+    def include(match):
+        if not match.group(1):
+            return match.group(0)
+        partial, partial_digests = load_template(templates_dir, match.group(2), seen + (name,))
+        digests.update(partial_digests)
+        return partial
+
+    return _PLACEHOLDER.sub(include, text), digests
+
+def fill_template(template, values):
+    """
+    Replace {{ name }} placeholders; unknown names are an error
+    """
+    def value(match):
+        if match.group(2) not in values:
+            raise ValueError(f"Unknown template placeholder '{match.group(2)}'")
+        return values[match.group(2)]
+
+    return _PLACEHOLDER.sub(value, template)
+
+def _relative_url_rewriter(markdown_dir, output_dir):
+    # Keep Markdown-relative links (e.g. extracted media) working from the output directory
+    def rewrite(url):
+        parts = urlsplit(url)
+        if parts.scheme or parts.netloc or url.startswith(("/", "#")):
+            return url
+        target = os.path.normpath(os.path.join(markdown_dir, parts.path))
+        return os.path.relpath(target, output_dir).replace(os.sep, "/") + url[len(parts.path):]
+    return rewrite
+
+def _write_atomic(path, text):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with atomic_write(path) as f:
+        f.write(text)
+
+def render_page(output_path, template, values, section_texts, markdown_dir):
+    """
+    Render one page and write it; runs in a worker process for parallel builds
+    """
+    rewrite = _relative_url_rewriter(markdown_dir, os.path.dirname(os.path.abspath(output_path)))
+    content = "\n".join(markdown_to_html(text, rewrite) for text in section_texts)
+    _write_atomic(output_path, fill_template(template, dict(values, content=content)))
+    return output_path
+
+def _load_json(path, default):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+def _nav_html(pages, current):
+    items = []
+    for name, page in pages.items():
+        attributes = ' aria-current="page"' if name == current else ""
+        items.append(f'<li><a href="{html.escape(name)}"{attributes}>{html.escape(page.get("title", name))}</a></li>')
+    return "<ul>\n" + "\n".join(items) + "\n</ul>"
+
+def build_search(output_dir, page_names):
+    """
+    Index the built pages into output_dir/search and copy search.js beside them
+    """
+    # Imported here: search_index itself imports this module
+    import search_index
+
+    documents = []
+    for name in page_names:
+        documents.extend(search_index.html_documents(os.path.join(output_dir, name), name))
+    search_index.write_index(documents, os.path.join(output_dir, SEARCH_DIR))
+
+    with open(SEARCH_CLIENT, "r", encoding="utf-8") as f:
+        client = f.read()
+    client_path = os.path.join(output_dir, os.path.basename(SEARCH_CLIENT))
+    with contextlib.suppress(OSError):
+        with open(client_path, "r", encoding="utf-8") as f:
+            if f.read() == client:
+                return
+    _write_atomic(client_path, client)
+
+def build_site(config_path=DEFAULT_CONFIG, workers=None, force=False):
+    """
+    Build the pages described by a site config, rebuilding only what changed
+
+    Each page depends on the config, its template and partials, and the
+    digests of the Markdown sections it uses. Pages whose dependencies
+    all match the manifest from the last build, and whose output still
+    exists, are left alone. Unless the config sets "search" to false,
+    the search index is rebuilt whenever a page changes. Returns
+    (rebuilt page names, total pages).
+    """
+    config_dir = os.path.dirname(os.path.abspath(config_path))
+    with open(config_path, "r", encoding="utf-8") as f:
+        config_text = f.read()
+    config = json.loads(config_text)
+
+    markdown_path = os.path.join(config_dir, config.get("markdown", "eduphilo-website-requirements.md"))
+    templates_dir = os.path.join(config_dir, config.get("templates", "templates"))
+    output_dir = os.path.join(config_dir, config.get("output", "site"))
+    pages = config.get("pages", {})
+
+    with open(markdown_path, "r", encoding="utf-8") as f:
+        sections = split_markdown(f.read(), config.get("split_level", DEFAULT_SPLIT_LEVEL))
+
+    manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+    manifest = _load_json(manifest_path, {})
+    previous = manifest.get("pages", {}) if manifest.get("version") == BUILDER_VERSION else {}
+    config_digest = hashlib.sha256(config_text.encode("utf-8")).hexdigest()
+
+    templates = {}
+    keys = {}
+    jobs = []
+    for name, page in pages.items():
+        template_name = page.get("template", "page.html")
+        if template_name not in templates:
+            templates[template_name] = load_template(templates_dir, template_name)
+        template, template_digests = templates[template_name]
+        used = select_sections(sections, page.get("sections", []))
+
+        key = hashlib.sha256(json.dumps({
+            "builder": BUILDER_VERSION,
+            "config": config_digest,
+            "templates": template_digests,
+            "sections": [entry["digest"] for entry in used],
+        }, sort_keys=True).encode("utf-8")).hexdigest()
+        keys[name] = key
+
+        output_path = os.path.join(output_dir, name)
+        if not force and previous.get(name) == key and os.path.exists(output_path):
+            continue
+        # Config values are plain text; only nav and content are HTML
+        values = {
+            "title": html.escape(page.get("title", name)),
+            "site_title": html.escape(config.get("title", "")),
+            "page": html.escape(name),
+            "nav": _nav_html(pages, name),
+        }
+        jobs.append((output_path, template, values, [entry["markdown"] for entry in used],
+                     os.path.dirname(markdown_path)))
+
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(jobs) >= PARALLEL_MIN_PAGES:
+        with ProcessPoolExecutor(max_workers=min(workers, len(jobs))) as executor:
+            for future in [executor.submit(render_page, *job) for job in jobs]:
+                future.result()
+    else:
+        for job in jobs:
+            render_page(*job)
+
+    # Pages dropped from the config are removed along with their manifest entries
+    dropped = set(previous) - set(pages)
+    for name in dropped:
+        with contextlib.suppress(OSError):
+            os.remove(os.path.join(output_dir, name))
+
+    if config.get("search", True) and (jobs or dropped or force or
+                                       not os.path.exists(os.path.join(output_dir, SEARCH_DIR, "meta.json"))):
+        build_search(output_dir, list(pages))
+
+    _write_atomic(manifest_path, json.dumps({"version": BUILDER_VERSION, "pages": keys}, indent=1))
+    return [os.path.relpath(job[0], output_dir) for job in jobs], len(pages)
+
+def init_site(config_path=DEFAULT_CONFIG):
+    """
+    Write a starter config and templates, leaving existing files alone
+    """
+    config_dir = os.path.dirname(os.path.abspath(config_path))
+    starter = {
+        "title": "EduPhilo Consulting",
+        "markdown": "eduphilo-website-requirements.md",
+        "templates": "templates",
+        "output": "site",
+        "split_level": DEFAULT_SPLIT_LEVEL,
+        "search": True,
+        "pages": {name: {"title": title, "template": "page.html", "sections": []}
+                  for name, title in STARTER_PAGES},
+    }
+    starter["pages"]["index.html"]["sections"] = ["*"]
+    created = []
+    for path, text in ((config_path, json.dumps(starter, indent=2) + "\n"),
+                       (os.path.join(config_dir, "templates", "page.html"), DEFAULT_TEMPLATE),
+                       (os.path.join(config_dir, "templates", "nav.html"), DEFAULT_NAV)):
+        if not os.path.exists(path):
+            _write_atomic(path, text)
+            created.append(path)
+    return created
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the site pages from the converted Markdown")
+    parser.add_argument("-c", "--config", default=DEFAULT_CONFIG)
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count(), help="Worker processes")
+    parser.add_argument("--force", action="store_true", help="Rebuild every page")
+    parser.add_argument("--init", action="store_true", help="Write a starter config and templates")
+    args = parser.parse_args(argv)
+
+    if args.init:
+        created = init_site(args.config)
+        for path in created:
+            print(f"Created '{path}'")
+        if not created:
+            print("Nothing to do; the config and templates already exist")
+        return 0
+
+    started = time.perf_counter()
+    try:
+        rebuilt, total = build_site(args.config, args.workers, args.force)
+    except (OSError, ValueError) as e:
+        print(f"Error building site: {str(e)}")
+        return 1
+    elapsed = (time.perf_counter() - started) * 1000
+    for name in rebuilt:
+        print(f"✓ {name}")
+    print(f"Built {len(rebuilt)} of {total} pages in {elapsed:.1f} ms ({total - len(rebuilt)} unchanged)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,256 @@
+import argparse
+import random
+import sys
+import zipfile
+from xml.sax.saxutils import escape
+
+WORDS = ("education", "life", "training", "learning", "skills", "programme", "course", "qualification",
+         "human", "governance", "development", "career", "institution", "values", "employment", "business")
+
+DEFAULT_OPTIONS = {
+    "paragraphs": 1000,
+    "runs_per_paragraph": 3,
+    "words_per_run": 6,
+    "heading_every": 25,
+    "list_every": 8,
+    "list_length": 4,
+    "list_depth": 3,
+    "tables": 2,
+    "table_rows": 20,
+    "table_columns": 4,
+    "merged_cells": True,
+    "sections": 1,
+    "headers_footers": True,
+    "seed": 0,
+}
+
+_NS = ('xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main" '
+       'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"')
+_REL_BASE = "http://schemas.openxmlformats.org/officeDocument/2006/relationships/"
+_CT_BASE = "application/vnd.openxmlformats-officedocument.wordprocessingml."
+
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    f'<w:styles {_NS}>'
+    '<w:docDefaults><w:rPrDefault><w:rPr><w:sz w:val="22"/></w:rPr></w:rPrDefault></w:docDefaults>'
+    '<w:style w:type="paragraph" w:default="1" w:styleId="Normal"><w:name w:val="Normal"/></w:style>'
+    '<w:style w:type="paragraph" w:styleId="Title"><w:name w:val="Title"/><w:basedOn w:val="Normal"/>'
+    '<w:rPr><w:sz w:val="56"/></w:rPr></w:style>'
+    + "".join(
+        f'<w:style w:type="paragraph" w:styleId="Heading{level}"><w:name w:val="heading {level}"/>'
+        f'<w:basedOn w:val="Normal"/><w:pPr><w:outlineLvl w:val="{level - 1}"/></w:pPr>'
+        f'<w:rPr><w:b/><w:sz w:val="{36 - level * 4}"/></w:rPr></w:style>'
+        for level in (1, 2, 3)
+    )
+    + '<w:style w:type="paragraph" w:styleId="ListParagraph"><w:name w:val="List Paragraph"/>'
+    '<w:basedOn w:val="Normal"/></w:style>'
+    '<w:style w:type="paragraph" w:styleId="Header"><w:name w:val="header"/></w:style>'
+    '<w:style w:type="paragraph" w:styleId="Footer"><w:name w:val="footer"/></w:style>'
+    '</w:styles>'
+)
+
+def _numbering_xml(depth):
+    levels = {}
+    for num_id, fmt in ((1, "bullet"), (2, "decimal")):
+        levels[num_id] = "".join(
+            f'<w:lvl w:ilvl="{ilvl}"><w:start w:val="1"/><w:numFmt w:val="{fmt}"/>'
+            f'<w:lvlText w:val="{"•" if fmt == "bullet" else f"%{ilvl + 1}."}"/></w:lvl>'
+            for ilvl in range(max(1, depth))
+        )
+    return (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        f'<w:numbering {_NS}>'
+        + "".join(f'<w:abstractNum w:abstractNumId="{num_id}">{levels[num_id]}</w:abstractNum>'
+                  for num_id in (1, 2))
+        + "".join(f'<w:num w:numId="{num_id}"><w:abstractNumId w:val="{num_id}"/></w:num>'
+                  for num_id in (1, 2))
+        + '</w:numbering>'
+    )
+
+class _Writer:
+    """
+    Produces body XML from seeded random text
+    """
+    def __init__(self, options):
+        self.options = options
+        self.random = random.Random(options["seed"])
+
+    def words(self, count):
+        choice = self.random.choice
+        return " ".join(choice(WORDS) for _ in range(count))
+
+    def run(self, text, bold=False, italic=False, size=None):
+        properties = ""
+        if bold or italic or size:
+            properties = ("<w:rPr>" + ("<w:b/>" if bold else "") + ("<w:i/>" if italic else "")
+                          + (f'<w:sz w:val="{size * 2}"/>' if size else "") + "</w:rPr>")
+        return f'<w:r>{properties}<w:t xml:space="preserve">{escape(text)}</w:t></w:r>'
+
+    def paragraph(self, style=None, num=None, runs=None):
+        properties = ""
+        if style or num:
+            properties = ("<w:pPr>" + (f'<w:pStyle w:val="{style}"/>' if style else "")
+                          + (f'<w:numPr><w:ilvl w:val="{num[1]}"/><w:numId w:val="{num[0]}"/></w:numPr>'
+                             if num else "")
+                          + "</w:pPr>")
+        if runs is None:
+            runs = "".join(
+                self.run(self.words(self.options["words_per_run"]) + " ",
+                         bold=self.random.random() < 0.1, italic=self.random.random() < 0.1,
+                         size=14 if self.random.random() < 0.02 else None)
+                for _ in range(self.options["runs_per_paragraph"])
+            )
+        return f"<w:p>{properties}{runs}</w:p>"
+
+    def table(self):
+        rows = self.options["table_rows"]
+        columns = self.options["table_columns"]
+        merged = self.options["merged_cells"] and rows >= 3 and columns >= 2
+        parts = ["<w:tbl><w:tblGrid>", '<w:gridCol w:w="2000"/>' * columns, "</w:tblGrid>"]
+        for row in range(rows):
+            parts.append("<w:tr>")
+            column = 0
+            while column < columns:
+                properties = ""
+                span = 1
+                if merged and row == 0 and column == 0:
+                    # Header cell spanning the first two columns
+                    span = 2
+                    properties = '<w:gridSpan w:val="2"/>'
+                elif merged and column == columns - 1 and 1 <= row <= 2:
+                    # Last column merged vertically across rows 1 and 2
+                    properties = '<w:vMerge w:val="restart"/>' if row == 1 else "<w:vMerge/>"
+                text = "" if properties == "<w:vMerge/>" else self.words(2)
+                parts.append(f"<w:tc><w:tcPr>{properties}</w:tcPr>"
+                             f"{self.paragraph(runs=self.run(text) if text else '')}</w:tc>")
+                column += span
+            parts.append("</w:tr>")
+        parts.append("</w:tbl>")
+        return "".join(parts)
+
+    def list_items(self):
+        depth = max(1, self.options["list_depth"])
+        num_id = self.random.choice((1, 2))
+        for index in range(self.options["list_length"]):
+            yield self.paragraph("ListParagraph", (num_id, index % depth))
+
+def _section_properties(index, with_references):
+    references = ""
+    if with_references:
+        references = (f'<w:headerReference w:type="default" r:id="rIdHeader{index}"/>'
+                      f'<w:footerReference w:type="default" r:id="rIdFooter{index}"/>')
+    return f"<w:sectPr>{references}</w:sectPr>"
+
+def iter_document_xml(options):
+    """
+    Yield word/document.xml in pieces, one block at a time
+    """
+    writer = _Writer(options)
+    paragraph_count = options["paragraphs"]
+    sections = max(1, options["sections"])
+    headers = options["headers_footers"]
+    table_positions = set()
+    if options["tables"]:
+        step = max(1, paragraph_count // (options["tables"] + 1))
+        table_positions = {step * (i + 1) for i in range(options["tables"])}
+    section_breaks = {paragraph_count * (i + 1) // sections for i in range(sections - 1)}
+
+    yield f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?><w:document {_NS}><w:body>'
+    yield writer.paragraph("Title", runs=writer.run("Synthetic benchmark document"))
+    section = 0
+    for index in range(paragraph_count):
+        if index in table_positions:
+            yield writer.table()
+        if options["heading_every"] and index % options["heading_every"] == 0:
+            yield writer.paragraph(f"Heading{1 + (index // options['heading_every']) % 3}",
+                                   runs=writer.run(writer.words(4)))
+        elif options["list_every"] and index % options["list_every"] == 0:
+            yield "".join(writer.list_items())
+        else:
+            yield writer.paragraph()
+        if index + 1 in section_breaks:
+            # A section break lives in the pPr of the section's last paragraph
+            yield f"<w:p><w:pPr>{_section_properties(section, headers)}</w:pPr></w:p>"
+            section += 1
+    yield _section_properties(section, headers)
+    yield "</w:body></w:document>"
+
+def generate_docx(path, **options):
+    """
+    Write a synthetic .docx file built directly from OOXML parts
+
+    Options override DEFAULT_OPTIONS; the same options and seed always give
+    the same document. Returns the options used.
+    """
+    unknown = set(options) - set(DEFAULT_OPTIONS)
+    if unknown:
+        raise ValueError(f"Unknown options: {', '.join(sorted(unknown))}")
+    options = {**DEFAULT_OPTIONS, **options}
+    sections = max(1, options["sections"])
+    headers = options["headers_footers"]
+
+    overrides = [("/word/document.xml", "document.main+xml"), ("/word/styles.xml", "styles+xml"),
+                 ("/word/numbering.xml", "numbering+xml")]
+    relationships = [("rIdStyles", "styles", "styles.xml"), ("rIdNumbering", "numbering", "numbering.xml")]
+    if headers:
+        for index in range(sections):
+            overrides.append((f"/word/header{index}.xml", "header+xml"))
+            overrides.append((f"/word/footer{index}.xml", "footer+xml"))
+            relationships.append((f"rIdHeader{index}", "header", f"header{index}.xml"))
+            relationships.append((f"rIdFooter{index}", "footer", f"footer{index}.xml"))
+
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as package:
+        package.writestr("[Content_Types].xml", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+            '<Default Extension="xml" ContentType="application/xml"/>'
+            + "".join(f'<Override PartName="{name}" ContentType="{_CT_BASE}{kind}"/>' for name, kind in overrides)
+            + '</Types>'))
+        package.writestr("_rels/.rels", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            f'<Relationship Id="rId1" Type="{_REL_BASE}officeDocument" Target="word/document.xml"/>'
+            '</Relationships>'))
+        package.writestr("word/_rels/document.xml.rels", (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+            + "".join(f'<Relationship Id="{rid}" Type="{_REL_BASE}{kind}" Target="{target}"/>'
+                      for rid, kind, target in relationships)
+            + '</Relationships>'))
+        package.writestr("word/styles.xml", _STYLES)
+        package.writestr("word/numbering.xml", _numbering_xml(options["list_depth"]))
+        if headers:
+            for index in range(sections):
+                for part, style in (("header", "Header"), ("footer", "Footer")):
+                    package.writestr(f"word/{part}{index}.xml", (
+                        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                        f'<w:{"hdr" if part == "header" else "ftr"} {_NS}>'
+                        f'<w:p><w:pPr><w:pStyle w:val="{style}"/></w:pPr>'
+                        f'<w:r><w:t>{part.capitalize()} {index + 1}</w:t></w:r></w:p>'
+                        f'</w:{"hdr" if part == "header" else "ftr"}>'))
+
+        # The body is streamed into the archive so large documents never sit in memory
+        with package.open("word/document.xml", "w") as document:
+            for piece in iter_document_xml(options):
+                document.write(piece.encode("utf-8"))
+    return options
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate a synthetic .docx file for benchmarking")
+    parser.add_argument("output")
+    for name, default in DEFAULT_OPTIONS.items():
+        flag = "--" + name.replace("_", "-")
+        if isinstance(default, bool):
+            parser.add_argument(flag, type=lambda value: value.lower() in ("1", "true", "yes", "on"),
+                                default=default, metavar="BOOL")
+        else:
+            parser.add_argument(flag, type=int, default=default)
+    args = vars(parser.parse_args(argv))
+    output = args.pop("output")
+    generate_docx(output, **args)
+    print(f"Wrote '{output}'")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,21 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from html_markdown import HTMLMarkdown, html_to_markdown
+
+def test_html_starting_with_table():
+    markdown = html_to_markdown("<table><tr><td>a</td><td>b</td></tr><tr><td>1</td><td>2</td></tr></table><p>after</p>")
+    assert markdown == "| a | b |\n| --- | --- |\n| 1 | 2 |\n\nafter"
+
+def test_html_starting_with_empty_list():
+    assert html_to_markdown("<ul></ul><p>text</p>") == "text"
+
+def test_streamed_lines_match_html_to_markdown():
+    html = "<h1>Title</h1><p>One <strong>bold</strong></p><ol><li>first</li><li>second</li></ol><p></p><p></p>"
+    lines = []
+    content = HTMLMarkdown(html)
+    content.write_to(lines.append)
+    assert "\n".join(lines) == html_to_markdown(html)
+    assert lines[-1] and content.html is None
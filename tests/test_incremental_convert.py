@@ -0,0 +1,52 @@
+import os
+import sys
+import zipfile
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from convert_docx_to_md import convert_docx_to_markdown
+from incremental_convert import convert_docx_to_markdown_incremental
+from synthetic_docx import generate_docx
+
+def _edit_body(source, target, edit):
+    # Copy a package, passing word/document.xml through edit
+    with zipfile.ZipFile(source) as original, zipfile.ZipFile(target, "w", zipfile.ZIP_DEFLATED) as edited:
+        for item in original.infolist():
+            data = original.read(item)
+            if item.filename == "word/document.xml":
+                data = edit(data.decode("utf-8")).encode("utf-8")
+            edited.writestr(item, data)
+
+def _delete_first_list_item(xml):
+    # Later items keep their XML but follow a different list state
+    start = xml.rindex("<w:p>", 0, xml.index('w:val="ListParagraph"'))
+    end = xml.index("</w:p>", start) + len("</w:p>")
+    return xml[:start] + xml[end:]
+
+EDITS = {
+    "text": lambda xml: xml.replace('<w:t xml:space="preserve">', '<w:t xml:space="preserve">edited ', 1),
+    "insert": lambda xml: xml.replace("<w:body>", "<w:body><w:p><w:r><w:t>New opening</w:t></w:r></w:p>", 1),
+    "delete_table": lambda xml: xml[:xml.index("<w:tbl>")] + xml[xml.index("</w:tbl>") + len("</w:tbl>"):],
+    "delete_list_item": _delete_first_list_item,
+}
+
+@pytest.mark.parametrize("edit", sorted(EDITS))
+def test_incremental_output_matches_full_conversion(edit, tmp_path, capsys):
+    original = str(tmp_path / "original.docx")
+    generate_docx(original, paragraphs=150, tables=2, table_rows=5, list_every=6)
+    output = str(tmp_path / "incremental.md")
+    assert convert_docx_to_markdown_incremental(original, output)
+
+    edited = str(tmp_path / "edited.docx")
+    _edit_body(original, edited, EDITS[edit])
+    capsys.readouterr()
+    result = convert_docx_to_markdown_incremental(edited, output)
+    # The second run must actually reuse blocks, or this compares two full conversions
+    assert ", reused 0" not in capsys.readouterr().out
+    full = convert_docx_to_markdown(edited, str(tmp_path / "full.md"))
+    assert result and full
+    with open(output, "rb") as f, open(tmp_path / "full.md", "rb") as g:
+        assert f.read() == g.read()
+    assert result.chars == full.chars
@@ -0,0 +1,84 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import search_index
+from convert_docx_to_md import convert_docx_to_markdown
+from synthetic_docx import generate_docx
+
+NODE = shutil.which("node")
+pytestmark = pytest.mark.skipif(NODE is None, reason="node is not installed")
+
+# Reads a JSON request from stdin and answers it with search.js; fetch is served from the index directory
+NODE_SCRIPT = """
+const fs = require('fs');
+const path = require('path');
+const search = require(process.argv[1]);
+const request = JSON.parse(fs.readFileSync(0, 'utf8'));
+global.fetch = async (url) => {
+    const file = path.join(request.index || '', url.split('?')[0]);
+    if (!fs.existsSync(file)) {
+        return { ok: false, status: 404 };
+    }
+    return { ok: true, json: async () => JSON.parse(fs.readFileSync(file, 'utf8')) };
+};
+(async () => {
+    const result = {
+        tokens: request.texts.map(search.tokenize),
+        shards: request.terms.map((term) => search.shardName(term, request.prefix_length)),
+        results: [],
+    };
+    if (request.index) {
+        const client = new search.SiteSearch('');
+        for (const query of request.queries) {
+            result.results.push(await client.search(query, request.limit));
+        }
+    }
+    process.stdout.write(JSON.stringify(result));
+})();
+"""
+
+TEXTS = [
+    "Education IS Life: training, learning & qualifications",
+    "The nationalities' relations were rationally organised; classes, buses, basis",
+    "ﬁnance Ｆｕｌｌｗｉｄｔｈ Ünïcödé naïve café Straße",
+    "Ελληνικά мировые 教育 程序 ١٢٣ 42nd snake_case CamelCase",
+    "emoji 🎓 stops here, a be an it, ox x1",
+    "",
+]
+
+def _run_node(request):
+    completed = subprocess.run([NODE, "-e", NODE_SCRIPT, os.path.join(ROOT, "search.js")],
+                               input=json.dumps(request), capture_output=True, text=True, check=True)
+    return json.loads(completed.stdout)
+
+def test_tokenizer_and_shard_names_match_search_js():
+    tokens = [search_index.tokenize(text) for text in TEXTS]
+    terms = sorted({term for terms in tokens for term in terms} | {"a", "é", "教育", "🎓x"})
+    answer = _run_node({"texts": TEXTS, "terms": terms, "prefix_length": search_index.PREFIX_LENGTH})
+    assert answer["tokens"] == tokens
+    assert answer["shards"] == [search_index.shard_name(term) for term in terms]
+
+def test_search_results_match_search_js(tmp_path):
+    docx_path = str(tmp_path / "site.docx")
+    generate_docx(docx_path, paragraphs=200, heading_every=10, tables=2)
+    markdown_path = str(tmp_path / "site.md")
+    assert convert_docx_to_markdown(docx_path, markdown_path)
+    index_dir = str(tmp_path / "search")
+    search_index.write_index(search_index.markdown_documents(markdown_path), index_dir)
+
+    queries = ["education", "training skills", "career gov", "human values ", "nothingmatches", "the"]
+    limit = 5
+    answer = _run_node({"texts": [], "terms": [], "index": index_dir, "queries": queries, "limit": limit})
+    index = search_index.SearchIndex(index_dir)
+    for query, results in zip(queries, answer["results"]):
+        expected = index.search(query, limit)
+        assert [(r["url"], r["title"]) for r in results] == [(r["url"], r["title"]) for r in expected]
+        assert [round(r["score"], 4) for r in results] == [r["score"] for r in expected]
@@ -0,0 +1,41 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import docx_ir
+from convert_docx_to_md import convert_docx_to_markdown, convert_docx_to_markdown_streaming
+from synthetic_docx import generate_docx
+
+DOCUMENTS = {
+    "default": {"paragraphs": 120},
+    "lists": {"paragraphs": 80, "list_every": 3, "list_depth": 4, "heading_every": 0},
+    "tables": {"paragraphs": 40, "tables": 4, "table_rows": 6, "table_columns": 3},
+    "plain_tables": {"paragraphs": 40, "tables": 3, "merged_cells": False},
+    "sections": {"paragraphs": 60, "sections": 3, "seed": 7},
+}
+
+@pytest.fixture(params=sorted(DOCUMENTS))
+def docx_path(request, tmp_path):
+    path = tmp_path / f"{request.param}.docx"
+    generate_docx(str(path), **DOCUMENTS[request.param])
+    return str(path)
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+def test_streaming_output_matches_convert_docx_to_markdown(docx_path, tmp_path):
+    full = convert_docx_to_markdown(docx_path, str(tmp_path / "full.md"))
+    streamed = convert_docx_to_markdown_streaming(docx_path, str(tmp_path / "streamed.md"))
+    assert full and streamed
+    assert _read(tmp_path / "streamed.md") == _read(tmp_path / "full.md")
+    assert streamed.chars == full.chars
+
+def test_paragraph_text_matches_python_docx(docx_path):
+    docx = pytest.importorskip("docx")
+    document = docx_ir.load_document(docx_path)
+    paragraphs = [block.text for block in document.blocks if not isinstance(block, docx_ir.Table)]
+    assert paragraphs == [paragraph.text for paragraph in docx.Document(docx_path).paragraphs]
@@ -0,0 +1,52 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import docx_ir
+import docx_package
+from synthetic_docx import generate_docx
+
+docx = pytest.importorskip("docx")
+
+@pytest.fixture(params=[(True, 4), (True, 2), (False, 3)], ids=["merged", "merged-narrow", "plain"])
+def docx_path(request, tmp_path):
+    merged, columns = request.param
+    path = tmp_path / "tables.docx"
+    generate_docx(str(path), paragraphs=20, tables=3, table_rows=5, table_columns=columns, merged_cells=merged)
+    return str(path)
+
+def _python_docx_tables(docx_path):
+    # Rows as row.cells texts, and the grid cells repeating a merged cell to their left or above
+    tables = []
+    for table in docx.Document(docx_path).tables:
+        rows = [row.cells for row in table.rows]
+        merged = 0
+        for r, cells in enumerate(rows):
+            for c, cell in enumerate(cells):
+                left = c and cells[c - 1]._tc is cell._tc
+                above = r and c < len(rows[r - 1]) and rows[r - 1][c]._tc is cell._tc
+                if left or above:
+                    merged += 1
+        tables.append(([[cell.text for cell in cells] for cells in rows], merged))
+    return tables
+
+def test_streamed_grid_matches_row_cells(docx_path):
+    tables = []
+    with docx_package.open_package(docx_path) as package:
+        for event, value in docx_package.iter_body(package, docx_package.find_document_part(package)):
+            if event == "table":
+                grid = docx_package.TableGrid(value)
+                rows = []
+            elif event == "row":
+                rows.append(grid.add_row(value))
+            elif event == "end_table":
+                tables.append((rows, grid.merged_cells))
+    assert tables == _python_docx_tables(docx_path)
+
+def test_ir_tables_match_row_cells(docx_path):
+    document = docx_ir.load_document(docx_path)
+    tables = [(block.rows, block.merged_cells) for block in document.blocks if isinstance(block, docx_ir.Table)]
+    assert tables == _python_docx_tables(docx_path)
@@ -0,0 +1,296 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import sys
+import unicodedata
+from html.parser import HTMLParser
+
+import docx_ir
+
+DEFAULT_NGRAM = 8
+DEFAULT_PAGES = ["index.html", "about.html", "services.html", "programs.html",
+                 "institutions.html", "training.html", "contact.html"]
+
+# Elements whose text is not page content: invisible, or site chrome repeated on every page
+SKIPPED_TAGS = {"head", "script", "style", "noscript", "template", "svg", "nav", "footer"}
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta",
+             "source", "track", "wbr"}
+
+SNIPPET_WORDS = 16
+
+_WORD = re.compile(r"[^\W_]+")
+_MARKDOWN_LINK_TARGET = re.compile(r"\]\([^)\s]*(?:\s+\"[^\"]*\")?\)")
+_HTML_TAG = re.compile(r"<[^>\n]+>")
+# Markers the converters put in front of list items; like search_index, they are markup, not content
+_LIST_MARKER = re.compile(r"^\s*(?:[-+*]|\d+\.)\s+")
+
+_MODULUS = (1 << 61) - 1
+_BASE = 0x5BD1E995
+
+class TokenizedText:
+    """
+    Normalized words of one source, each with the line it came from
+    """
+    def __init__(self, name):
+        self.name = name
+        self.words = []
+        self.lines = []
+
+    def add(self, text, line=1):
+        """
+        Append the words of text, which starts at the given line
+        """
+        text = unicodedata.normalize("NFKC", text).lower()
+        position = 0
+        for match in _WORD.finditer(text):
+            line += text.count("\n", position, match.start())
+            position = match.start()
+            self.words.append(match.group())
+            self.lines.append(line)
+
+class VisibleTextParser(HTMLParser):
+    """
+    Collect the text a browser would show, with its source line numbers
+    """
+    def __init__(self, tokens):
+        HTMLParser.__init__(self, convert_charrefs=True)
+        self.tokens = tokens
+        self.skipping = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in SKIPPED_TAGS and tag not in VOID_TAGS:
+            self.skipping.append(tag)
+
+    def handle_endtag(self, tag):
+        if self.skipping and self.skipping[-1] == tag:
+            self.skipping.pop()
+
+    def handle_data(self, data):
+        if not self.skipping:
+            self.tokens.add(data, self.getpos()[0])
+
+def tokenize_html(path):
+    tokens = TokenizedText(path)
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        parser = VisibleTextParser(tokens)
+        parser.feed(f.read())
+        parser.close()
+    return tokens
+
+def tokenize_markdown(path):
+    tokens = TokenizedText(path)
+    with open(path, "r", encoding="utf-8") as f:
+        for number, line in enumerate(f, 1):
+            # Link and image targets are not content; their text and alt text are
+            line = _LIST_MARKER.sub("", _MARKDOWN_LINK_TARGET.sub("] ", line))
+            tokens.add(_HTML_TAG.sub(" ", line), number)
+    return tokens
+
+def tokenize_docx(path):
+    """
+    Words of a document's paragraphs and table cells, in document order
+
+    Each paragraph and each table row counts as one line. The paragraphs
+    are the text extract_raw_text returns; table cells are added because
+    every converter writes them.
+    """
+    tokens = TokenizedText(path)
+    try:
+        document = docx_ir.load_document(path)
+    except Exception as e:
+        raise ValueError(f"Could not read '{path}': {str(e)}")
+    lines = []
+    for block in document.blocks:
+        if isinstance(block, docx_ir.Table):
+            lines.extend(" ".join(row) for row in block.rows)
+        else:
+            # Typed list markers are stripped here as they are from the Markdown
+            lines.append(_LIST_MARKER.sub("", block.text))
+    tokens.add("\n".join(lines))
+    return tokens
+
+def tokenize(path):
+    """
+    TokenizedText for a .docx, .html or Markdown/plain text file
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".docx":
+        return tokenize_docx(path)
+    if extension in (".html", ".htm"):
+        return tokenize_html(path)
+    return tokenize_markdown(path)
+
+class _WordIds(dict):
+    # Stable 61-bit value per distinct word, computed once
+    def __missing__(self, word):
+        value = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "big") % _MODULUS
+        self[word] = value
+        return value
+
+_word_ids = _WordIds()
+
+def ngram_hashes(words, n):
+    """
+    Rolling polynomial hashes of every n-word window, in O(len(words))
+
+    Texts shorter than n words yield one hash of the whole text.
+    """
+    ids = [_word_ids[word] for word in words]
+    if not ids:
+        return []
+    n = min(n, len(ids))
+    top = pow(_BASE, n - 1, _MODULUS)
+    value = 0
+    for word_id in ids[:n]:
+        value = (value * _BASE + word_id) % _MODULUS
+    hashes = [value]
+    for i in range(n, len(ids)):
+        value = ((value - ids[i - n] * top) * _BASE + ids[i]) % _MODULUS
+        hashes.append(value)
+    return hashes
+
+def uncovered_spans(tokens, hashes, n, known, min_words=1):
+    """
+    Runs of words not covered by any n-gram found in the known hash set
+
+    Returns (spans, covered word count); each span is a dict with the
+    source, line, word count and a normalized snippet.
+    """
+    count = len(tokens.words)
+    n = min(n, count)
+    # Difference array: each matching window covers words i .. i+n-1
+    delta = [0] * (count + 1)
+    for i, value in enumerate(hashes):
+        if value in known:
+            delta[i] += 1
+            delta[i + n] -= 1
+
+    spans = []
+    covered = 0
+    depth = 0
+    start = None
+    for i in range(count + 1):
+        if i < count:
+            depth += delta[i]
+        if i < count and depth > 0:
+            covered += 1
+        if i < count and depth <= 0:
+            if start is None:
+                start = i
+            continue
+        if start is not None:
+            if i - start >= min_words:
+                words = tokens.words[start:i]
+                snippet = " ".join(words[:SNIPPET_WORDS]) + (" ..." if len(words) > SNIPPET_WORDS else "")
+                spans.append({"source": tokens.name, "line": tokens.lines[start], "words": i - start,
+                              "text": snippet})
+            start = None
+    return spans, covered
+
+def compare(reference, targets, n=DEFAULT_NGRAM, min_words=1):
+    """
+    Compare a reference text against one or more target texts
+
+    Missing spans are reference words found in none of the targets; extra
+    spans are target words not found in the reference. Every text is
+    hashed once and membership tests are set lookups, so the comparison
+    is linear in the total number of words. A reference shorter than n
+    words is compared at its own length, targets included.
+    """
+    if reference.words:
+        n = min(n, len(reference.words))
+    reference_hashes = ngram_hashes(reference.words, n)
+    target_hashes = [ngram_hashes(target.words, n) for target in targets]
+
+    target_known = set()
+    for hashes in target_hashes:
+        target_known.update(hashes)
+    reference_known = set(reference_hashes)
+
+    # A target shorter than n words only has a whole-text hash; compare at its length too
+    for target, hashes in zip(targets, target_hashes):
+        if 0 < len(target.words) < n:
+            reference_known.update(ngram_hashes(reference.words, len(target.words)))
+
+    missing, covered = uncovered_spans(reference, reference_hashes, n, target_known, min_words)
+    result = {
+        "reference": reference.name,
+        "reference_words": len(reference.words),
+        "covered_words": covered,
+        "coverage": round(covered / len(reference.words), 4) if reference.words else 1.0,
+        "missing": missing,
+        "extra": [],
+    }
+    for target, hashes in zip(targets, target_hashes):
+        extra, _ = uncovered_spans(target, hashes, n, reference_known, min_words)
+        result["extra"].extend(extra)
+    return result
+
+def print_result(result, title, limit=20):
+    missing_words = sum(span["words"] for span in result["missing"])
+    extra_words = sum(span["words"] for span in result["extra"])
+    print(f"\n=== {title} ===")
+    print(f"Reference: {result['reference']} ({result['reference_words']} words, "
+          f"{result['coverage']:.1%} found)")
+    print(f"Missing: {len(result['missing'])} spans, {missing_words} words")
+    for span in result["missing"][:limit]:
+        print(f"  - {span['source']}:{span['line']} ({span['words']} words): {span['text']}")
+    print(f"Extra: {len(result['extra'])} spans, {extra_words} words")
+    for span in result["extra"][:limit]:
+        print(f"  + {span['source']}:{span['line']} ({span['words']} words): {span['text']}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Check that the Markdown and HTML pages contain exactly the requirements document's content")
+    parser.add_argument("pages", nargs="*", help=f"HTML pages (default: {', '.join(DEFAULT_PAGES)})")
+    parser.add_argument("--reference", default="eduphilo-website-requirements.docx",
+                        help="Source of truth: a .docx file, or Markdown/plain text")
+    parser.add_argument("--markdown", default="eduphilo-website-requirements.md",
+                        help="Generated Markdown to check against the reference ('' to skip)")
+    parser.add_argument("-n", "--ngram", type=int, default=DEFAULT_NGRAM, help="Words per fingerprint")
+    parser.add_argument("--min-words", type=int, default=1, help="Shortest span worth reporting")
+    parser.add_argument("--max-missing", type=int, default=0,
+                        help="Missing words tolerated before the check fails")
+    parser.add_argument("--strict", action="store_true", help="Fail on extra words as well")
+    parser.add_argument("--json", metavar="PATH", help="Also write the full report as JSON")
+    args = parser.parse_args(argv)
+
+    pages = []
+    for item in args.pages or DEFAULT_PAGES:
+        pages.extend(sorted(glob.glob(item)) if glob.has_magic(item) else [item])
+
+    try:
+        reference = tokenize(args.reference)
+        if not reference.words:
+            # Every target would trivially "cover" an empty reference, so the check could never fail
+            print(f"Error: '{args.reference}' has no text to compare against")
+            return 2
+        report = {}
+        if args.markdown:
+            report["markdown"] = compare(reference, [tokenize(args.markdown)], args.ngram, args.min_words)
+            print_result(report["markdown"], "DOCUMENT -> MARKDOWN")
+        if pages:
+            report["pages"] = compare(reference, [tokenize(page) for page in pages], args.ngram, args.min_words)
+            print_result(report["pages"], "DOCUMENT -> HTML PAGES")
+    except (OSError, ValueError) as e:
+        print(f"Error reading content: {str(e)}")
+        return 2
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    failed = False
+    for result in report.values():
+        if sum(span["words"] for span in result["missing"]) > args.max_missing:
+            failed = True
+        if args.strict and result["extra"]:
+            failed = True
+    print(f"\n{'✗ Content check failed' if failed else '✓ Content check passed'}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+import argparse
+import contextlib
+import glob
+import io
+import os
+import sys
+import time
+from pathlib import Path
+
+from batch_convert import find_docx_files
+from improved_converter import convert_docx_to_markdown_improved
+from incremental_convert import WarmDocument
+
+DEFAULT_INTERVAL = 0.5
+DEFAULT_DEBOUNCE = 1.0
+
+def file_signature(path):
+    """
+    (mtime_ns, size) of a file, or None if it cannot be read
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+def _input_base(item):
+    # The directory every file an input can match lies below: for a glob, its leading non-pattern part
+    path = os.path.abspath(item)
+    if os.path.isdir(path):
+        return path
+    if glob.has_magic(item):
+        parts = path.split(os.sep)
+        static = next(i for i, part in enumerate(parts) if glob.has_magic(part))
+        return os.sep.join(parts[:static]) or os.sep
+    return os.path.dirname(path)
+
+def output_root(inputs):
+    """
+    Directory below which watched files are mirrored into an output directory
+
+    Like batch_convert.plan_outputs, it is the common directory of the
+    files, but it comes from the inputs themselves, so files that appear
+    later under a glob such as docs/**/*.docx do not move it.
+    """
+    return os.path.commonpath([_input_base(item) for item in inputs])
+
+class DocxWatcher:
+    """
+    Poll files, directories and glob patterns and reconvert changed .docx files
+
+    A file is converted once its size and modification time have stayed
+    the same for debounce seconds, so a burst of saves costs one conversion.
+    Word lock files are skipped. Each file keeps a WarmDocument, so an
+    update only parses the paragraphs and tables that actually changed.
+    """
+    def __init__(self, inputs, output_dir=None, debounce=DEFAULT_DEBOUNCE):
+        self.inputs = inputs
+        self.output_dir = output_dir
+        self.root = output_root(inputs)
+        self.debounce = debounce
+        self.signatures = {}
+        self.pending = {}
+        self.documents = {}
+        self.conversions = 0
+        self.failures = 0
+
+    def output_path(self, docx_path):
+        if self.output_dir is None:
+            return str(Path(docx_path).with_suffix(".md"))
+        relative = Path(os.path.relpath(docx_path, self.root)).with_suffix(".md")
+        return os.path.join(self.output_dir, str(relative))
+
+    def is_current(self, docx_path, signature):
+        """
+        Whether the Markdown output is newer than the document
+        """
+        output = file_signature(self.output_path(docx_path))
+        return output is not None and output[0] >= signature[0]
+
+    def scan(self, now=None):
+        """
+        Record new, changed and removed files; returns the paths now due
+        """
+        now = time.monotonic() if now is None else now
+        seen = set()
+        for path in find_docx_files(self.inputs):
+            signature = file_signature(path)
+            if signature is None:
+                continue
+            seen.add(path)
+            if path not in self.signatures:
+                # Files present at startup are only converted if their output is stale
+                self.signatures[path] = signature
+                if not self.is_current(path, signature):
+                    self.pending[path] = now
+            elif signature != self.signatures[path]:
+                self.signatures[path] = signature
+                self.pending[path] = now
+
+        for path in set(self.signatures) - seen:
+            del self.signatures[path]
+            self.pending.pop(path, None)
+            self.documents.pop(path, None)
+
+        return sorted(path for path, changed in self.pending.items() if now - changed >= self.debounce)
+
+    def convert(self, docx_path):
+        """
+        Convert one file from its warm state; returns True on success
+        """
+        output_path = self.output_path(docx_path)
+        document = self.documents.get(docx_path)
+        if document is None:
+            document = self.documents[docx_path] = WarmDocument(docx_path)
+
+        captured = io.StringIO()
+        started = time.perf_counter()
+        try:
+            os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+            with contextlib.redirect_stdout(captured):
+                ok = bool(convert_docx_to_markdown_improved(docx_path, output_path, document.load()))
+        except Exception as e:
+            # Typically a save still in progress; the next change retries
+            print(f"✗ {docx_path}: {str(e)}")
+            self.documents.pop(docx_path, None)
+            self.failures += 1
+            return False
+        elapsed = (time.perf_counter() - started) * 1000
+
+        if not ok:
+            print(f"✗ {docx_path}: {captured.getvalue().strip() or 'Converter reported failure'}")
+            self.failures += 1
+            return False
+        self.conversions += 1
+        print(f"✓ {docx_path} -> {output_path} in {elapsed:.1f} ms "
+              f"({document.parsed} blocks parsed, {document.reused} reused)")
+        return True
+
+    def poll(self):
+        """
+        One scan, converting every file whose changes have settled
+        """
+        for path in self.scan():
+            # A file that changed again during the scan waits for the next poll
+            if file_signature(path) == self.signatures.get(path):
+                del self.pending[path]
+                self.convert(path)
+
+    def run(self, interval=DEFAULT_INTERVAL):
+        """
+        Poll until interrupted
+        """
+        try:
+            while True:
+                self.poll()
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            print(f"\nStopped after {self.conversions} conversions, {self.failures} failures")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Watch .docx files and reconvert them to Markdown when they change")
+    parser.add_argument("inputs", nargs="*", default=["eduphilo-website-requirements.docx"],
+                        help="Files, directories or glob patterns")
+    parser.add_argument("-o", "--output-dir", help="Directory for the .md files (default: next to each input)")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL, help="Seconds between polls")
+    parser.add_argument("--debounce", type=float, default=DEFAULT_DEBOUNCE,
+                        help="Seconds a file must stay unchanged before it is converted")
+    parser.add_argument("--once", action="store_true", help="Convert stale files once and exit")
+    args = parser.parse_args(argv)
+
+    watcher = DocxWatcher(args.inputs, args.output_dir, 0.0 if args.once else args.debounce)
+    if args.once:
+        watcher.poll()
+        return 1 if watcher.failures else 0
+
+    print(f"Watching {', '.join(args.inputs)} (Ctrl+C to stop)...")
+    watcher.run(args.interval)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())